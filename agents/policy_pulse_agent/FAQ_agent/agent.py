@@ -14,7 +14,7 @@
 
 from google.adk.agents import Agent
 from google.genai import types
-from ..tools import RetrieveContextTool
+from ..tools import RETRIEVAL_INSTRUCTION, RetrieveContextTool
 
 
 INSTRUCTION = (
@@ -50,7 +50,7 @@ FAQ_agent = Agent(
     description=(
         "Agent which answers FAQ questions on the subject of reproductive and fertility health."
     ),
-    instruction=INSTRUCTION,
+    instruction=INSTRUCTION + RETRIEVAL_INSTRUCTION,
     generate_content_config=types.GenerateContentConfig(
         temperature=0.3,  # Adjust as needed (0.0-1.0)
     ),
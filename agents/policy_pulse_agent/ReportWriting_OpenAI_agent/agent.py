@@ -15,7 +15,7 @@
 import os
 from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
-from ..tools import RetrieveContextTool
+from ..tools import RETRIEVAL_INSTRUCTION, RetrieveContextTool
 
 INSTRUCTION = (
   "You are a very knowledgeable compliance assistant specializing in workplace reproductive and fertility health.\n\n"
@@ -58,6 +58,6 @@ ReportWriting_OpenAI_agent = Agent(
     description=(
         "Agent which long-form and research type writing in prder to draft reports, policies etc."
     ),
-    instruction=INSTRUCTION,
+    instruction=INSTRUCTION + RETRIEVAL_INSTRUCTION,
     tools=[RetrieveContextTool],
 )
\ No newline at end of file
@@ -14,7 +14,7 @@
 
 
 from google.adk.agents import Agent
-from ..tools import RetrieveContextTool
+from ..tools import RETRIEVAL_INSTRUCTION, RetrieveContextTool
 
 INSTRUCTION = (
   "You are a very knowledgeable compliance assistant specializing in workplace reproductive and fertility health.\n\n"
@@ -51,6 +51,6 @@ ReportWriting_agent = Agent(
     description=(
         "Agent which long-form and research type writing in prder to draft reports, policies etc."
     ),
-    instruction=INSTRUCTION,
+    instruction=INSTRUCTION + RETRIEVAL_INSTRUCTION,
     tools=[RetrieveContextTool]
 )
\ No newline at end of file
@@ -1,6 +1,6 @@
 import os
 import sys
-from google.adk.tools import FunctionTool, agent_tool
+from google.adk.tools import FunctionTool, ToolContext, agent_tool
 from google.adk.tools.agent_tool import AgentTool
 
 
@@ -10,29 +10,82 @@ project_root = os.path.join(current_dir, '..' , '..')
 sys.path.insert(0, os.path.abspath(project_root))
 
 
-from src_pulse.ai_agent import retrieve_relevant_chunks
+from src_pulse.ai_agent import aretrieve_relevant_chunks_batch
+from src_pulse.vector_store import DEFAULT_INDEX_NAME
+from src_pulse.context_packer import CONTEXT_TOKEN_BUDGET, pack_context
 
-def _retrieve_context(query: str) -> str:
+# Search breadth per calling agent: FAQ answers favour latency, reports favour recall
+AGENT_SEARCH_PROFILES = {
+    "FAQ_agent": "faq",
+    "ReportWriting_agent": "report",
+    "ReportWriting_OpenAI_agent": "report",
+}
+
+# Token budget for the retrieved context per calling agent: short for FAQ answers, long for reports
+AGENT_CONTEXT_BUDGETS = {
+    "FAQ_agent": 1200,
+    "ReportWriting_agent": 6000,
+    "ReportWriting_OpenAI_agent": 6000,
+}
+
+# Appended to the instructions of every agent that uses RetrieveContextTool
+RETRIEVAL_INSTRUCTION = (
+    "\n\nWhen you call RetrieveContextTool:\n"
+    "- Pass several related queries in one call rather than calling the tool repeatedly\n"
+    "- Set jurisdiction (e.g. \"uk\", \"us\", \"eu\") only when the question is clearly about one jurisdiction; otherwise leave it empty to search every jurisdiction\n"
+    "- Set doc_type (one of \"legislation\", \"case-law\", \"guidance\", \"policy\", \"research\") only when the user asks for that kind of document; otherwise leave it empty\n"
+    "- If a narrowed search returns little, search again without jurisdiction and doc_type\n"
+)
+
+async def _retrieve_context(queries: list[str], tool_context: ToolContext, jurisdiction: str = "", doc_type: str = "") -> str:
     """
     Retrieve relevant policy document chunks from Pinecone to ground the agent's reasoning.
     
-    This tool fetches relevant policy document chunks from Pinecone based on the user's 
-    query text to provide context for generating accurate responses.
+    This tool fetches relevant policy document chunks from Pinecone based on one or
+    more query texts to provide context for generating accurate responses. Pass
+    several related queries at once (e.g. different angles of a report section)
+    rather than calling the tool repeatedly: they are searched together and the
+    results are merged without duplicates. The search is awaited, so other
+    sessions on the runner's event loop keep running meanwhile.
+    
+    Narrow the search with jurisdiction (e.g. "uk", "us", "eu") and doc_type (one of
+    "legislation", "case-law", "guidance", "policy", "research") when the question
+    is clearly about one; leave either empty (the default) to search everything.
     
     Args:
-        query (str): The user's query text to search for relevant context
+        queries (list[str]): One or more query texts to search for relevant context
+        tool_context (ToolContext): Supplied by ADK; the calling agent selects the search profile
+        jurisdiction (str): Jurisdiction to restrict the search to; empty (the default) for any
+        doc_type (str): Document type to restrict the search to; empty (the default) for any
         
     Returns:
-        str: Combined text from relevant document chunks
+        str: Combined text from relevant document chunks, trimmed to the agent's token budget
     """
 
-    chunks = retrieve_relevant_chunks(
-        text=query,
-        index_name="policypulse",
+    chunks = await aretrieve_relevant_chunks_batch(
+        texts=queries,
+        index_name=DEFAULT_INDEX_NAME,
         api_key= os.environ.get("PINECONE_API_KEY"),
-        top_k=5,
+        top_k=None,  # Adaptive depth: fewer chunks for easy queries
+        profile=AGENT_SEARCH_PROFILES.get(tool_context.agent_name),
+        # The tenant comes from the session, never from the model
+        filters={"tenant": tool_context.state.get("tenant"), "jurisdiction": jurisdiction, "doc_type": doc_type},
+    )
+    chunks, packing_stats = pack_context(
+        chunks,
+        token_budget=AGENT_CONTEXT_BUDGETS.get(tool_context.agent_name, CONTEXT_TOKEN_BUDGET),
+        presorted=True,  # Keep the retrieval ranking, including any MMR re-ordering
     )
+    tool_context.state["context_packing"] = packing_stats
         
+    # Recorded in session state so the front-end can cite the sources of the final answer,
+    # and only caches answers whose search was not narrowed by the model
+    tool_context.state["retrieval_filters"] = {"jurisdiction": jurisdiction, "doc_type": doc_type}
+    tool_context.state["retrieved_sources"] = [
+        {"id": hit["id"], "source_files": hit.get("metadata", {}).get("source_files", [])}
+        for hit in chunks
+    ]
+    
     result = "\n\n".join(hit["text"] for hit in chunks)
     print(f"📝 Combined result length: {len(result)} characters")
     
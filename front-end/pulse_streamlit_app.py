@@ -23,8 +23,17 @@ sys.path.insert(0, project_root)
 
 from auth import authenticate_user, create_user, hash_password
 from session_utils import get_user_conversations, save_conversation, create_new_session, get_conversation_messages, delete_conversation
-from agents.policy_pulse_agent.agent import root_agent, runner, session_service
+from agents.policy_pulse_agent.agent import APP_NAME, root_agent, runner, session_service
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.events import Event
 from google.genai import types
+from src_pulse.answer_cache import answer_cache_scope, get_answer_cache
+from src_pulse.pinecone_registry import get_pinecone_registry
+from src_pulse.stream_metrics import atimed_stream, get_latency_recorder
+from src_pulse.vector_store import DEFAULT_INDEX_NAME
+
+# Usernames allowed to inspect and purge the answer cache
+ADMIN_USERS = {name.strip() for name in os.environ.get("ADMIN_USERS", "").split(",") if name.strip()}
 
 def show_landing_page():
     """Display the landing page"""
@@ -160,29 +169,142 @@ def load_conversation(session_id: str):
     
     st.rerun()
 
-async def get_agent_response(user_message):
-    """Get response from the agent"""
+async def session_tenant():
+    """Get the tenant stored in the agent session's state (None means the default tenant)"""
+    session = await session_service.get_session(
+        app_name=APP_NAME,
+        user_id=st.session_state.user_id,
+        session_id=st.session_state.current_session_id
+    )
+    return session.state.get("tenant") if session is not None else None
+
+async def record_cached_exchange(message_content, answer):
+    """Append a question answered from the cache to the agent session so follow-ups keep their context"""
+    session = await session_service.get_session(
+        app_name=APP_NAME,
+        user_id=st.session_state.user_id,
+        session_id=st.session_state.current_session_id
+    )
+    if session is None:
+        return
+    invocation_id = Event.new_id()
+    await session_service.append_event(session, Event(invocation_id=invocation_id, author="user", content=message_content))
+    await session_service.append_event(session, Event(
+        invocation_id=invocation_id,
+        author=root_agent.name,
+        content=types.Content(role='model', parts=[types.Part(text=answer)])
+    ))
+
+async def _agent_text_chunks(message_content, result):
+    """
+    Run the agent with SSE streaming and yield its text as it is generated
+    
+    Partial events carry the model's text deltas. The complete event that
+    closes each model turn repeats that text, so it is only used when nothing
+    was streamed for the turn (e.g. a model without streaming support).
+    """
+    streamed = False
+    async for event in runner.run_async(
+        user_id=st.session_state.user_id,
+        session_id=st.session_state.current_session_id,
+        new_message=message_content,
+        run_config=RunConfig(streaming_mode=StreamingMode.SSE)
+    ):
+        if event.actions and event.actions.state_delta and "retrieved_sources" in event.actions.state_delta:
+            result["citations"].extend(event.actions.state_delta["retrieved_sources"])
+            result["filters"].append(event.actions.state_delta.get("retrieval_filters") or {})
+        if not (event.content and event.content.parts):
+            continue
+        text = "".join(part.text for part in event.content.parts if getattr(part, "text", None))
+        if event.partial:
+            streamed = streamed or bool(text)
+        elif streamed:
+            streamed = False
+            continue
+        if text:
+            result["text"] += text
+            yield text
+
+async def stream_agent_response(user_message, result, use_cache=True):
+    """
+    Stream the response from the agent
+    
+    The semantic answer cache is consulted before running the agent; follow-up
+    questions (use_cache=False) always go to the agent. The agent picks the
+    jurisdiction and document type filters of its searches itself, which is not
+    known before it runs, so answers are only cached when every search covered
+    the whole tenant. Time to first token and
+    total latency of agent responses are recorded under "agent" in the latency
+    recorder.
+    
+    Parameters:
+    user_message (str): The user's message
+    result (dict): Receives "text", "citations", "filters" (of each agent search) and "cached" (True if served from the answer cache)
+    use_cache (bool): Look up and store the answer in the answer cache
+    
+    Yields:
+    str: Text chunks of the response
+    """
+    result.update(text="", citations=[], filters=[], cached=False)
     try:
         message_content = types.Content(
             role='user',
             parts=[types.Part(text=user_message)]
         )
         
-        response_text = ""
-        async for event in runner.run_async(
-            user_id=st.session_state.user_id,
-            session_id=st.session_state.current_session_id,
-            new_message=message_content
-        ):
-            if hasattr(event, 'content') and hasattr(event.content, 'parts'):
-                for part in event.content.parts:
-                    if hasattr(part, 'text') and part.text is not None:
-                        response_text += part.text
+        answer_cache = get_answer_cache() if use_cache else None
+        if answer_cache is not None:
+            # The retrieval tool searches the session's tenant, so answers are only shared within it;
+            # cached answers all come from searches without jurisdiction or doc_type filters
+            cache_scope = answer_cache_scope(APP_NAME, {"tenant": await session_tenant()})
+            question_vector = answer_cache.embed_question(user_message)
+            cached = answer_cache.lookup(user_message, scope=cache_scope, index_name=DEFAULT_INDEX_NAME, vector=question_vector)
+            if cached is not None:
+                await record_cached_exchange(message_content, cached["answer"])
+                result.update(text=cached["answer"], citations=cached["citations"], cached=True)
+                yield cached["answer"]
+                return
+        
+        async for chunk in atimed_stream(_agent_text_chunks(message_content, result), "agent"):
+            yield chunk
+        
+        if not result["text"]:
+            result["text"] = "I'm sorry, I couldn't generate a response."
+            yield result["text"]
+            return
         
-        # Return only the text content, not a structured object
-        return response_text if response_text else "I'm sorry, I couldn't generate a response."
+        narrowed = any(filters.get("jurisdiction") or filters.get("doc_type") for filters in result["filters"])
+        if answer_cache is not None and not narrowed:
+            answer_cache.put(user_message, result["text"], citations=result["citations"], scope=cache_scope,
+                             index_name=DEFAULT_INDEX_NAME, vector=question_vector)
     except Exception as e:
-        return f"Error: {str(e)}"
+        error = f"Error: {str(e)}"
+        if result["text"]:
+            error = "\n\n" + error
+        result["text"] += error
+        yield error
+
+def iterate_in_new_loop(async_iterable):
+    """
+    Iterate an async generator from synchronous code, e.g. to feed st.write_stream
+    
+    Like asyncio.run, each call gets its own event loop, which is closed once
+    the generator is exhausted. The loop's pooled Pinecone HTTP client is
+    closed first so its connections are not leaked with the loop.
+    """
+    loop = asyncio.new_event_loop()
+    iterator = async_iterable.__aiter__()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(iterator.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(iterator.aclose())
+        loop.run_until_complete(get_pinecone_registry().aclose_async_client())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
 
 def chat_interface():
     """Main chat interface"""
@@ -237,6 +359,22 @@ def chat_interface():
                             st.error("Failed to delete conversation")
         else:
             st.write("No previous conversations")
+        
+        # Answer cache administration
+        answer_cache = get_answer_cache()
+        if answer_cache is not None and st.session_state.username in ADMIN_USERS:
+            st.divider()
+            with st.expander("Answer Cache"):
+                st.json(answer_cache.stats())
+                purge_filter = st.text_input("Only questions containing (optional):", key="purge_filter")
+                if st.button("Purge cached answers", use_container_width=True):
+                    removed = answer_cache.purge(question_contains=purge_filter or None)
+                    st.success(f"Purged {removed} cached answers")
+        
+        # Streaming latency per response source
+        if st.session_state.username in ADMIN_USERS:
+            with st.expander("Response Latency"):
+                st.json(get_latency_recorder().stats())
     
     # Main chat area
     if not st.session_state.current_session_id:
@@ -266,11 +404,23 @@ def chat_interface():
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Get agent response
+        # Stream the agent response as it is generated; only opening questions are answered from the cache
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = asyncio.run(get_agent_response(prompt))
-                st.markdown(response)
+            thinking = st.empty()
+            thinking.caption("Thinking...")
+            use_cache = len(st.session_state.messages) == 1
+            result = {}
+            
+            def _response_chunks():
+                for chunk in iterate_in_new_loop(stream_agent_response(prompt, result, use_cache=use_cache)):
+                    thinking.empty()
+                    yield chunk
+            
+            st.write_stream(_response_chunks())
+            response, citations, cached = result["text"], result["citations"], result["cached"]
+            if cached:
+                sources = sorted({source for citation in citations for source in citation.get("source_files", [])})
+                st.caption("Answered from cache" + (f" · Sources: {', '.join(sources)}" if sources else ""))
                 
         # Add assistant message
         st.session_state.messages.append({"role": "assistant", "content": response})
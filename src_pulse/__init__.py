@@ -1,3 +1,19 @@
 from .ai_agent import *
+from .answer_cache import *
+from .context_packer import *
+from .dedup import *
+from .document_metadata import *
 from .embedding_utils import *
-from .session_manager import *
\ No newline at end of file
+from .extraction_cache import *
+from .ingestion_manifest import *
+from .ivf_index import *
+from .lexical_index import *
+from .local_index import *
+from .mmr import *
+from .pinecone_registry import *
+from .quantization import *
+from .query_cache import *
+from .session_manager import *
+from .stream_metrics import *
+from .upsert_engine import *
+from .vector_store import *
\ No newline at end of file
@@ -1,6 +1,8 @@
-from pinecone import Pinecone
 import requests
 import os
+import time
+import asyncio
+import json
 import datetime
 
 # Load environment variables
@@ -9,11 +11,43 @@ load_dotenv()
 
 # Import session manager
 from .session_manager import SessionManager
+from .vector_store import DEFAULT_INDEX_NAME, get_vector_store
+from .lexical_index import get_lexical_index, reciprocal_rank_fusion
+from .dedup import chunk_content_id
+from .query_cache import get_query_cache
+from .answer_cache import answer_cache_scope, get_answer_cache
+from .context_packer import pack_context
+from .mmr import MMR_FETCH_FACTOR, MMR_LAMBDA, MMR_RERANK, mmr_rerank
+from .document_metadata import matches_filters, normalize_filters, residual_filters, select_namespaces
+from .stream_metrics import timed_stream
 
 # Get API keys from environment variables
 PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
 SONAR_API_KEY = os.environ.get("SONAR_API_KEY")
 
+# Fuse BM25 lexical results with vector results when a lexical index exists (set to 0 to disable)
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+# Candidates taken from each retriever before fusion, as a multiple of top_k
+HYBRID_CANDIDATE_FACTOR = 2
+
+# Adaptive retrieval depth, used when top_k is None (set ADAPTIVE_RETRIEVAL=0 for a fixed DEFAULT_TOP_K)
+ADAPTIVE_RETRIEVAL = os.environ.get("ADAPTIVE_RETRIEVAL", "1") == "1"
+DEFAULT_TOP_K = 5
+# First-stage depth, and the depth used when the first stage looks uncertain
+ADAPTIVE_INITIAL_K = int(os.environ.get("ADAPTIVE_INITIAL_K", "4"))
+ADAPTIVE_MAX_K = int(os.environ.get("ADAPTIVE_MAX_K", "12"))
+# Fewest chunks kept when cutting at a score gap
+ADAPTIVE_MIN_K = 2
+# Top vector similarity below which the first stage is widened. Depends on the embedding model:
+# multilingual-e5-large rarely scores a relevant chunk below 0.75, the hashing embedder often does
+ADAPTIVE_SCORE_THRESHOLD = float(os.environ.get("ADAPTIVE_SCORE_THRESHOLD", "0.5"))
+# Relative spread (best minus worst, over best) of first-stage scores at or below which they count as flat
+# and the first stage is widened. Off (0) by default: e5 similarities sit in a narrow band, so the first
+# few hits of most queries lie within a few percent of each other and would all be widened
+ADAPTIVE_FLAT_SPREAD = float(os.environ.get("ADAPTIVE_FLAT_SPREAD", "0"))
+# Drop in vector similarity, relative to the top score, that ends the result list
+ADAPTIVE_GAP = 0.15
+
 def get_system_prompt(retrieved_chunks):
     system_prompt = (
         "You are an expert compliance assistant specializing in workplace reproductive and fertility health policies.\n\n"
@@ -49,59 +83,421 @@ def get_system_prompt(retrieved_chunks):
     
     return system_prompt
 
-def retrieve_relevant_chunks(text, index_name, api_key, top_k=5):
+def retrieve_relevant_chunks(text, index_name, api_key, top_k=DEFAULT_TOP_K, profile=None, hybrid=None, use_cache=True, diversify=None,
+                             filters=None):
     """
-    Retrieve relevant text chunks from Pinecone based on a query
+    Retrieve relevant text chunks from the configured vector store (Pinecone, or
+    the local index when VECTOR_STORE_BACKEND is "local") based on a query
+    
+    When a BM25 index was built for the index during ingestion, lexical and vector
+    results are merged with reciprocal rank fusion so exact terms (statute names,
+    acronyms, employer names) are not lost by dense search.
     
     Parameters:
     text (str): The user's query text
     index_name (str): Name of Pinecone index
     api_key (str): Pinecone API key
-    top_k (int): Number of relevant chunks to retrieve
+    top_k (int): Number of relevant chunks to retrieve; None picks the depth adaptively (see retrieve_relevant_chunks_batch)
+    profile (str): Search breadth profile ("faq" or "report") used by the local approximate index
+    hybrid (bool): Fuse lexical results; defaults to HYBRID_SEARCH
+    use_cache (bool): Serve repeated queries from the query cache (see QUERY_CACHE_BACKEND)
+    diversify (bool): Re-rank with maximal marginal relevance; defaults to MMR_RERANK
+    filters (dict): Metadata filters, e.g. {"jurisdiction": "uk"} (see retrieve_relevant_chunks_batch)
     
     Returns:
     list: List of relevant document chunks
     """
-    from pinecone import Pinecone
+    return retrieve_relevant_chunks_batch([text], index_name, api_key, top_k, profile, hybrid, use_cache, merge=False,
+                                          diversify=diversify, filters=filters)[0]
+
+async def aretrieve_relevant_chunks(text, index_name, api_key, top_k=DEFAULT_TOP_K, profile=None, hybrid=None, use_cache=True, diversify=None,
+                                    filters=None):
+    """
+    Async version of retrieve_relevant_chunks for use inside an event loop
     
-    # Initialize Pinecone
-    pc = Pinecone(api_key=api_key)
+    Vector searches and fetches go through the store's non-blocking aquery and
+    afetch, so concurrent sessions served by one event loop (e.g. the ADK
+    runner) overlap their retrieval I/O instead of stalling each other.
     
-    # Get the index
-    index = pc.Index(index_name)
- 
-    # Use the search method with proper format
-    response = index.search(
-        namespace="",
-        query={
-            "inputs": {"text": text},
-            "top_k": top_k
-        },
-        fields=["ID", "text", "metadata"],  # Specify the fields you want to retrieve
-    )
-        
-    print(f"Search response received")
+    Parameters and return value are the same as retrieve_relevant_chunks.
+    """
+    return (await aretrieve_relevant_chunks_batch([text], index_name, api_key, top_k, profile, hybrid, use_cache, merge=False,
+                                                  diversify=diversify, filters=filters))[0]
+
+def retrieve_relevant_chunks_batch(texts, index_name, api_key, top_k=DEFAULT_TOP_K, profile=None, hybrid=None, use_cache=True, merge=True,
+                                   diversify=None, filters=None):
+    """
+    Retrieve chunks for several related queries in one call
+    
+    Uncached queries are searched together: one batched vector search
+    (concurrent requests for Pinecone, one matrix product for the local index)
+    and one fetch for every lexical-only hit.
+    
+    With top_k None the depth is chosen per query in two stages. The first
+    stage retrieves ADAPTIVE_INITIAL_K chunks; queries whose top vector
+    similarity is below ADAPTIVE_SCORE_THRESHOLD, or whose scores are flat when
+    ADAPTIVE_FLAT_SPREAD is set, are searched again with ADAPTIVE_MAX_K. Each
+    list is then cut at the first clear similarity gap, so easy questions send
+    fewer chunks to the model. Hybrid results are judged by their vector
+    similarities, not their fused rank scores.
+    
+    With diversify, each query over-fetches MMR_FETCH_FACTOR times its depth (or
+    uses the uncut adaptive candidates) and keeps a diverse subset chosen by
+    maximal marginal relevance, so adjacent chunks repeating each other do not
+    crowd out other evidence.
+    
+    Filters restrict the search to chunks whose tenant, jurisdiction and
+    document type match. Every search is scoped to one tenant (DEFAULT_TENANT
+    unless the filters name another); fields in NAMESPACE_FIELDS select the
+    namespaces searched, and the rest are applied by the vector store.
+    
+    Parameters:
+    texts (list): Query texts
+    index_name (str): Name of Pinecone index
+    api_key (str): Pinecone API key
+    top_k (int): Number of chunks to retrieve per query; None picks the depth adaptively
+    profile (str): Search breadth profile ("faq" or "report") used by the local approximate index
+    hybrid (bool): Fuse lexical results; defaults to HYBRID_SEARCH
+    use_cache (bool): Serve repeated queries from the query cache
+    merge (bool): Merge and deduplicate the hits of all queries (see merge_retrieved_chunks)
+    diversify (bool): Re-rank with maximal marginal relevance (see mmr_rerank); defaults to MMR_RERANK
+    filters (dict): Field -> value or list of values for "tenant", "jurisdiction" and "doc_type"
     
-    # Extract and return the retrieved chunks
-    retrieved_chunks = []
+    Returns:
+    list: Merged chunks, or one list of chunks per query if merge is False
+    """
+    hybrid = HYBRID_SEARCH if hybrid is None else hybrid
+    diversify = MMR_RERANK if diversify is None else diversify
+    filters = normalize_filters(filters)
+    if top_k is not None or not ADAPTIVE_RETRIEVAL:
+        top_k = top_k or DEFAULT_TOP_K
+        fetch_k = top_k * MMR_FETCH_FACTOR if diversify else top_k
+        results = _retrieve_batch(texts, index_name, api_key, fetch_k, profile, hybrid, use_cache, filters)
+        depths = [top_k] * len(results)
+    else:
+        results = _retrieve_batch(texts, index_name, api_key, ADAPTIVE_INITIAL_K, profile, hybrid, use_cache, filters)
+        widen = [i for i, hits in enumerate(results) if _needs_widening(hits)]
+        if widen:
+            widened = _retrieve_batch([texts[i] for i in widen], index_name, api_key, ADAPTIVE_MAX_K, profile, hybrid,
+                                      use_cache, filters)
+            for i, hits in zip(widen, widened):
+                results[i] = hits
+        depths = _adaptive_depths(results, widen)
+    results = _finish_results(results, depths, diversify, index_name, api_key)
+    return merge_retrieved_chunks(results) if merge else results
+
+def _retrieve_batch(texts, index_name, api_key, top_k, profile, hybrid, use_cache, filters):
+    results, pending = _cached_chunks_batch(texts, index_name, top_k, profile, hybrid, use_cache, filters)
+    if pending:
+        searched = _search_chunks_batch([texts[i] for i, _ in pending], index_name, api_key, top_k, profile, hybrid, filters)
+        _store_chunks_batch(results, pending, searched)
+    return results
 
-    # Force it into a dict if needed
-    if not isinstance(response, dict) and hasattr(response, "to_dict"):
-        response = response.to_dict()
+async def aretrieve_relevant_chunks_batch(texts, index_name, api_key, top_k=DEFAULT_TOP_K, profile=None, hybrid=None, use_cache=True, merge=True,
+                                          diversify=None, filters=None):
+    """
+    Async version of retrieve_relevant_chunks_batch; the vector searches run concurrently
+    
+    Parameters and return value are the same as retrieve_relevant_chunks_batch.
+    """
+    hybrid = HYBRID_SEARCH if hybrid is None else hybrid
+    diversify = MMR_RERANK if diversify is None else diversify
+    filters = normalize_filters(filters)
+    if top_k is not None or not ADAPTIVE_RETRIEVAL:
+        top_k = top_k or DEFAULT_TOP_K
+        fetch_k = top_k * MMR_FETCH_FACTOR if diversify else top_k
+        results = await _aretrieve_batch(texts, index_name, api_key, fetch_k, profile, hybrid, use_cache, filters)
+        depths = [top_k] * len(results)
+    else:
+        results = await _aretrieve_batch(texts, index_name, api_key, ADAPTIVE_INITIAL_K, profile, hybrid, use_cache, filters)
+        widen = [i for i, hits in enumerate(results) if _needs_widening(hits)]
+        if widen:
+            widened = await _aretrieve_batch([texts[i] for i in widen], index_name, api_key, ADAPTIVE_MAX_K, profile, hybrid,
+                                             use_cache, filters)
+            for i, hits in zip(widen, widened):
+                results[i] = hits
+        depths = _adaptive_depths(results, widen)
+    results = _finish_results(results, depths, diversify, index_name, api_key)
+    return merge_retrieved_chunks(results) if merge else results
 
-    hits = response.get("result", {}).get("hits", [])
-    print(f"Found {len(hits)} hits")
+async def _aretrieve_batch(texts, index_name, api_key, top_k, profile, hybrid, use_cache, filters):
+    results, pending = _cached_chunks_batch(texts, index_name, top_k, profile, hybrid, use_cache, filters)
+    if pending:
+        searched = await _asearch_chunks_batch([texts[i] for i, _ in pending], index_name, api_key, top_k, profile, hybrid, filters)
+        _store_chunks_batch(results, pending, searched)
+    return results
 
-    retrieved_chunks = []
+def _relevance_scores(hits):
+    """
+    Vector similarities of the hits, in rank order
+    
+    Hybrid hits carry their fused rank score in "score" and the similarity in
+    "vector_score"; lexical-only hits have none and inherit the previous value.
+    Fused rankings are not ordered by similarity, so the scores need not descend.
+    """
+    scores, previous = [], None
     for hit in hits:
-        retrieved_chunks.append({
-            "id":       hit.get("_id", "unknown"),
-            "score":    hit.get("_score", 0),
-            "text":     hit.get("fields", {}).get("text", ""),
-            "metadata": hit.get("metadata", {})  # if you stored metadata
-        })
-    return retrieved_chunks
+        score = hit.get("vector_score", hit.get("score"))
+        score = previous if score is None else score
+        if score is not None:
+            scores.append(score)
+            previous = score
+    return scores
+
+def _needs_widening(hits):
+    """
+    Check whether a first-stage result is uncertain enough to search deeper
+    """
+    scores = _relevance_scores(hits)
+    if len(scores) < ADAPTIVE_INITIAL_K:
+        # The index had no more matches to give
+        return False
+    top = max(scores)
+    if top < ADAPTIVE_SCORE_THRESHOLD:
+        return True
+    return top - min(scores) <= ADAPTIVE_FLAT_SPREAD * abs(top)
+
+def _cut_at_gap(hits):
+    """
+    Truncate hits at the first clear drop in relevance, keeping at least ADAPTIVE_MIN_K
+    
+    The list is cut before position i when every later hit scores at least
+    ADAPTIVE_GAP (relative to the top score) below every earlier one. For
+    scores in descending order that is a drop between neighbours; in a fused
+    ranking it never drops a chunk more similar than one that is kept.
+    """
+    scores = _relevance_scores(hits)
+    if len(scores) < len(hits):
+        return hits
+    gap = ADAPTIVE_GAP * abs(max(scores))
+    for i in range(ADAPTIVE_MIN_K, len(scores)):
+        if min(scores[:i]) - max(scores[i:]) >= gap:
+            return hits[:i]
+    return hits
+
+def _adaptive_depths(results, widened):
+    depths = [len(_cut_at_gap(hits)) for hits in results]
+    print(f"Adaptive retrieval kept {depths} chunks "
+          f"({len(widened)} of {len(results)} queries widened to {ADAPTIVE_MAX_K})")
+    return depths
+
+def _finish_results(results, depths, diversify, index_name, api_key):
+    """
+    Trim each query's candidates to its depth, diversifying with MMR if requested
+    """
+    if not diversify:
+        return [hits[:depth] for hits, depth in zip(results, depths)]
+    store = get_vector_store(index_name, api_key)
+    return [
+        mmr_rerank(hits, depth, embeddings=_hit_embeddings(store, hits) if len(hits) > depth else None,
+                   lambda_mult=MMR_LAMBDA)
+        for hits, depth in zip(results, depths)
+    ]
+
+def _hit_embeddings(store, hits):
+    # Stored embeddings can only be looked up when every hit comes from one namespace
+    namespaces = {hit.get("namespace", "") for hit in hits}
+    if len(namespaces) != 1:
+        return None
+    return store.get_embeddings([hit["id"] for hit in hits], namespace=namespaces.pop())
+
+def merge_retrieved_chunks(results):
+    """
+    Merge the chunks retrieved for several queries into one ranking
+    
+    Rankings are combined with reciprocal rank fusion, so chunks found by more
+    than one query rise to the top. Chunks are deduplicated by ID and by
+    normalized text.
+    
+    Parameters:
+    results (list): One list of chunks per query, best first
+    
+    Returns:
+    list: Unique chunks, best first, with the fused score
+    """
+    if len(results) == 1:
+        return list(results[0])
+    
+    chunks = {}
+    for hits in results:
+        for hit in hits:
+            chunks.setdefault(hit["id"], hit)
+    
+    merged, seen_texts = [], set()
+    for chunk_id, score in reciprocal_rank_fusion([[hit["id"] for hit in hits] for hits in results]):
+        content_id = chunk_content_id(chunks[chunk_id].get("text", ""))
+        if content_id in seen_texts:
+            continue
+        seen_texts.add(content_id)
+        merged.append({**chunks[chunk_id], "score": score})
+    return merged
+
+def _cached_chunks_batch(texts, index_name, top_k, profile, hybrid, use_cache, filters):
+    """
+    Look up each query in the query cache
+    
+    Returns:
+    tuple: (results with cached chunks filled in and None elsewhere, [(position, cache key)] of the misses)
+    """
+    cache = get_query_cache() if use_cache else None
+    results, pending = [None] * len(texts), []
+    for i, text in enumerate(texts):
+        cache_key = cache.make_key(text, index_name, top_k, profile=profile, hybrid=hybrid, filters=filters) if cache is not None else None
+        cached_chunks = cache.get(cache_key) if cache is not None else None
+        if cached_chunks is None:
+            pending.append((i, cache_key))
+        else:
+            print(f"Found {len(cached_chunks)} cached hits for index '{index_name}'")
+            results[i] = [dict(hit) for hit in cached_chunks]
+    return results, pending
+
+def _store_chunks_batch(results, pending, searched):
+    """
+    Fill in searched results and add them to the query cache
+    """
+    cache = get_query_cache()
+    for (i, cache_key), chunks in zip(pending, searched):
+        results[i] = chunks
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, [dict(hit) for hit in chunks])
+
+def _search_namespaces(store, filters):
+    """
+    Namespaces a filtered search has to cover, listing the store's namespaces only when needed
+    """
+    namespaces = select_namespaces(filters)
+    return namespaces if namespaces is not None else select_namespaces(filters, store.list_namespaces())
+
+def _merge_namespace_results(namespaces, namespace_results, top_k):
+    """
+    Combine per-namespace vector results into one ranking per query, tagging each hit with its namespace
+    
+    Parameters:
+    namespaces (list): Namespaces searched
+    namespace_results (list): For each namespace, one list of hits per query
+    top_k (int): Hits kept per query
+    
+    Returns:
+    list: One list of hits per query, best score first
+    """
+    results = []
+    for query_hits in zip(*namespace_results):
+        hits = [{**hit, "namespace": namespace} for namespace, hits in zip(namespaces, query_hits) for hit in hits]
+        if len(namespaces) > 1:
+            hits = sorted(hits, key=lambda hit: -(hit.get("score") or 0))[:top_k]
+        results.append(hits)
+    return results
+
+def _matching_records(fetched, namespace, filters):
+    # The lexical index is shared by all namespaces, so lexical-only hits are checked against the filters
+    return {chunk_id: {**record, "namespace": namespace} for chunk_id, record in fetched.items()
+            if matches_filters(record.get("metadata", {}), filters)}
+
+def _search_chunks_batch(texts, index_name, api_key, top_k, profile, hybrid, filters=None):
+    """
+    Run the vector (and, when available, lexical) searches behind retrieve_relevant_chunks_batch
+    """
+    store = get_vector_store(index_name, api_key)
+    namespaces = _search_namespaces(store, filters)
+    store_filters = residual_filters(filters)
+    lexical_index = get_lexical_index(index_name) if hybrid else None
+    num_results = top_k if lexical_index is None or not len(lexical_index) else top_k * HYBRID_CANDIDATE_FACTOR
+    vector_results = _merge_namespace_results(namespaces, [
+        store.query_batch(texts, num_results, namespace=namespace, profile=profile, filters=store_filters) for namespace in namespaces
+    ], num_results)
+    if lexical_index is None or not len(lexical_index):
+        print(f"Found {sum(len(hits) for hits in vector_results)} hits{_queries_label(texts)} in {store.backend} index '{index_name}'")
+        return vector_results
+    
+    lexical_results, missing = _lexical_candidates_batch(texts, vector_results, lexical_index, num_results)
+    fetched = {}
+    for namespace in namespaces:
+        remaining = [chunk_id for chunk_id in missing if chunk_id not in fetched]
+        if remaining:
+            fetched.update(_matching_records(store.fetch(remaining, namespace=namespace), namespace, filters))
+    fusions = _fuse_hits_batch(vector_results, lexical_results, fetched, top_k)
+    return _fused_chunks_batch(fusions, fetched, store, index_name)
+
+async def _asearch_chunks_batch(texts, index_name, api_key, top_k, profile, hybrid, filters=None):
+    """
+    Async counterpart of _search_chunks_batch
+    """
+    store = get_vector_store(index_name, api_key)
+    namespaces = await asyncio.to_thread(_search_namespaces, store, filters)
+    store_filters = residual_filters(filters)
+    lexical_index = get_lexical_index(index_name) if hybrid else None
+    num_results = top_k if lexical_index is None or not len(lexical_index) else top_k * HYBRID_CANDIDATE_FACTOR
+    flat_results = await asyncio.gather(*(store.aquery(text, num_results, namespace=namespace, profile=profile, filters=store_filters)
+                                          for namespace in namespaces for text in texts))
+    namespace_results = [flat_results[i * len(texts):(i + 1) * len(texts)] for i in range(len(namespaces))]
+    vector_results = _merge_namespace_results(namespaces, namespace_results, num_results)
+    if lexical_index is None or not len(lexical_index):
+        print(f"Found {sum(len(hits) for hits in vector_results)} hits{_queries_label(texts)} in {store.backend} index '{index_name}'")
+        return vector_results
+    
+    # BM25 runs in memory over compact arrays and is cheap enough to score on the loop
+    lexical_results, missing = _lexical_candidates_batch(texts, vector_results, lexical_index, num_results)
+    fetched = {}
+    for namespace in namespaces:
+        remaining = [chunk_id for chunk_id in missing if chunk_id not in fetched]
+        if remaining:
+            fetched.update(_matching_records(await store.afetch(remaining, namespace=namespace), namespace, filters))
+    fusions = _fuse_hits_batch(vector_results, lexical_results, fetched, top_k)
+    return _fused_chunks_batch(fusions, fetched, store, index_name)
+
+def _lexical_candidates_batch(texts, vector_results, lexical_index, num_results):
+    """
+    Run the BM25 search for each query
+    
+    Returns:
+    tuple: (per query lexical (id, score) hits, IDs not among the vector hits of their query)
+    """
+    lexical_results, missing = [], {}
+    for text, vector_hits in zip(texts, vector_results):
+        lexical_hits = lexical_index.search(text, num_results)
+        vector_ids = {hit["id"] for hit in vector_hits}
+        # Chunks found only by BM25 need their text (and metadata, to apply the filters) from the vector store
+        missing.update((chunk_id, None) for chunk_id, _ in lexical_hits if chunk_id not in vector_ids)
+        lexical_results.append(lexical_hits)
+    return lexical_results, list(missing)
+
+def _fuse_hits_batch(vector_results, lexical_results, fetched, top_k):
+    """
+    Merge each query's vector and lexical rankings with reciprocal rank fusion
+    
+    The BM25 index is shared by all namespaces and knows nothing about the
+    filters, so lexical candidates are kept only if they are also vector hits
+    or were fetched from a searched namespace and passed the filters. This
+    happens before the fused list is cut to top_k, so rejected candidates
+    never take the place of matching chunks.
     
+    Returns:
+    list: Per query (fused (id, score) pairs, vector hits by ID, accepted lexical IDs)
+    """
+    fusions = []
+    for vector_hits, lexical_hits in zip(vector_results, lexical_results):
+        hits = {hit["id"]: hit for hit in vector_hits}
+        lexical_ids = [chunk_id for chunk_id, _ in lexical_hits if chunk_id in hits or chunk_id in fetched]
+        fused = reciprocal_rank_fusion([[hit["id"] for hit in vector_hits], lexical_ids])[:top_k]
+        fusions.append((fused, hits, lexical_ids))
+    return fusions
+
+def _queries_label(queries):
+    return f" for {len(queries)} queries" if len(queries) > 1 else ""
+
+def _fused_chunks_batch(fusions, fetched, store, index_name):
+    results = [
+        [{**(hits.get(chunk_id) or fetched[chunk_id]), "score": score,
+          "vector_score": hits[chunk_id]["score"] if chunk_id in hits else None}
+         for chunk_id, score in fused]
+        for fused, hits, _ in fusions
+    ]
+    lexical_only = sum(1 for fused, hits, _ in fusions for chunk_id, _ in fused if chunk_id not in hits)
+    print(f"Found {sum(len(chunks) for chunks in results)} hits{_queries_label(fusions)} in {store.backend} index '{index_name}' "
+          f"(hybrid: {sum(len(hits) for _, hits, _ in fusions)} vector, {sum(len(lexical) for _, _, lexical in fusions)} lexical, "
+          f"{lexical_only} lexical-only)")
+    return results
+
 def query_sonar(system_prompt, user_query):
     """
     Query the SONAR API with system prompt and user query
@@ -156,16 +552,33 @@ def query_sonar(system_prompt, user_query):
     else:
         return f"Error calling SONAR API: {response.status_code} - {response.text}"
 
-def query_sonar_with_history(messages):
+def query_sonar_with_history(messages, metrics=None):
     """
     Query the SONAR API with full message history
     
     Parameters:
     messages (list): List of message objects with role and content
+    metrics (dict): Optional dictionary receiving "time_to_first_token" and "total" in seconds
     
     Returns:
     str: Response from SONAR
     """
+    return "".join(timed_stream(stream_sonar_with_history(messages), "sonar", metrics))
+
+def stream_sonar_with_history(messages):
+    """
+    Stream the SONAR answer to a message history as it is generated
+    
+    The request asks for server-sent events; each "data:" line carries a
+    chat completion chunk whose delta text is yielded straight away, so the
+    first words reach the user long before the answer is complete.
+    
+    Parameters:
+    messages (list): List of message objects with role and content
+    
+    Yields:
+    str: Text chunks of the answer, or a single error message if the request fails
+    """
     # SONAR API endpoint and key
     SONAR_API_URL = "https://api.perplexity.ai/chat/completions"
     SONAR_API_KEY = os.environ.get("SONAR_API_KEY")
@@ -182,38 +595,189 @@ def query_sonar_with_history(messages):
         "temperature": 0.0,
         "web_search_options": {
             "search_context_size": "low"
-        }
+        },
+        "stream": True
     }
     
-    # Make the API call
-    response = requests.post(SONAR_API_URL, headers=headers, json=payload)
+    # Make the API call and read the event stream as it arrives
+    with requests.post(SONAR_API_URL, headers=headers, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            yield f"Error calling SONAR API: {response.status_code} - {response.text}"
+            return
+        
+        for line in response.iter_lines():
+            # Decode explicitly: event streams carry no charset, and requests would assume latin-1
+            line = line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except ValueError:
+                print(f"Skipping malformed SONAR stream event: {data[:100]}")
+                continue
+            for choice in event.get("choices", []):
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    yield text
+
+def get_citations(retrieved_chunks):
+    """
+    Summarize retrieved chunks as citations for an answer
     
-    if response.status_code == 200:
-        return response.json()["choices"][0]["message"]["content"]
-    else:
-        return f"Error calling SONAR API: {response.status_code} - {response.text}"
+    Parameters:
+    retrieved_chunks (list): Hits from retrieve_relevant_chunks
+    
+    Returns:
+    list: One {"id", "source_files"} dictionary per chunk
+    """
+    citations = []
+    for chunk in retrieved_chunks:
+        metadata = chunk.get("metadata", {})
+        source_files = metadata.get("source_files") or [metadata.get("file_path", "unknown")]
+        citations.append({"id": chunk["id"], "source_files": source_files})
+    return citations
+
+class RetrievalContext:
+    """
+    Request-scoped retrieval state for one question
+    
+    Holds the hits of a single search, the packed chunks and system prompt built
+    from them, and per-stage timings, so the UI (evidence panel), the prompt
+    builder and the logs share one search instead of each running their own.
+    """
+    
+    def __init__(self, query, index_name, top_k=None, profile=None, filters=None):
+        """
+        Initialize an empty context; nothing is searched until retrieve() is called
+        
+        Parameters:
+        query (str): The user's question
+        index_name (str): Name of Pinecone index
+        top_k (int): Number of relevant chunks to retrieve; None picks the depth adaptively
+        profile (str): Search breadth profile for the local approximate index
+        filters (dict): Metadata filters (see retrieve_relevant_chunks_batch)
+        """
+        self.query = query
+        self.index_name = index_name
+        self.top_k = top_k
+        self.profile = profile
+        self.filters = normalize_filters(filters)
+        self.hits = None
+        self.chunks = None
+        self.packing_stats = None
+        self.system_prompt = None
+        self.answer_from_cache = False
+        # Citations stored with a cached answer; no search runs for those
+        self.cached_citations = None
+        self.timings = {}
+    
+    def retrieve(self, api_key):
+        """
+        Search once; later calls return the same hits
+        
+        Parameters:
+        api_key (str): Pinecone API key
+        
+        Returns:
+        list: Retrieved chunks, best first
+        """
+        if self.hits is None:
+            start = time.perf_counter()
+            self.hits = retrieve_relevant_chunks(self.query, self.index_name, api_key, self.top_k, profile=self.profile,
+                                                 filters=self.filters)
+            self.timings["retrieval"] = time.perf_counter() - start
+        return self.hits
+    
+    def pack(self, api_key, token_budget=None):
+        """
+        Fit the retrieved chunks to the context token budget (see pack_context)
+        
+        Returns:
+        list: Chunks to put in the prompt
+        """
+        if self.chunks is None:
+            hits = self.retrieve(api_key)
+            start = time.perf_counter()
+            # Hits are already ranked (and MMR-ordered when diversified), so keep their order
+            self.chunks, self.packing_stats = pack_context(hits, token_budget, presorted=True)
+            self.timings["packing"] = time.perf_counter() - start
+        return self.chunks
+    
+    def summary(self):
+        """
+        Describe the request for logs
+        
+        Returns:
+        str: Hit counts, tokens saved and stage timings
+        """
+        timings = ", ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in self.timings.items())
+        saved = self.packing_stats["tokens_saved"] if self.packing_stats else 0
+        return (f"{len(self.hits or [])} hits, {len(self.chunks or [])} chunks in prompt, "
+                f"{saved} tokens saved, {'cached answer, ' if self.answer_from_cache else ''}{timings}")
 
-def answer_question(user_query, index_name, api_key=PINECONE_API_KEY, top_k=5, conversation_history=None):
+def answer_question(user_query, index_name, api_key=PINECONE_API_KEY, top_k=None, conversation_history=None, use_answer_cache=True,
+                    retrieval_context=None, return_context=False, filters=None, stream=False):
     """
     Main function to answer a user question using RAG approach with conversation history
     
+    Questions without conversation history are first looked up in the semantic
+    answer cache, so a paraphrase of an earlier question skips retrieval and the
+    SONAR call. Follow-up questions always go to the model because their meaning
+    depends on the history.
+    
+    With stream, retrieval and prompt building still happen before the call
+    returns, but the answer is returned as a generator of text chunks that
+    follows the SONAR event stream. The time to first token and total
+    generation time are recorded in the retrieval context's timings either way.
+    
     Parameters:
     user_query (str): User's question
     index_name (str): Name of Pinecone index
     api_key (str): Pinecone API key
-    top_k (int): Number of relevant chunks to retrieve
+    top_k (int): Number of relevant chunks to retrieve; None picks the depth adaptively
     conversation_history (list): List of previous exchanges in the conversation
+    use_answer_cache (bool): Look up and store answers in the semantic answer cache
+    retrieval_context (RetrievalContext): Context whose search is reused if it already ran
+    return_context (bool): Also return the retrieval context
+    filters (dict): Metadata filters (see retrieve_relevant_chunks_batch); ignored when retrieval_context is given
+    stream (bool): Return a generator of text chunks instead of the complete response
     
     Returns:
-    str: Response from SONAR
+    str: Response from SONAR (a generator of text chunks if stream is True), or
+         (response, RetrievalContext) if return_context is True
     """
-    # Retrieve relevant chunks
+    context = retrieval_context or RetrievalContext(user_query, index_name, top_k, filters=filters)
+    # Answers grounded in another tenant's or differently filtered documents must not be shared
+    cache_scope = answer_cache_scope("sonar", context.filters)
+    
+    def _result(response):
+        return (response, context) if return_context else response
+    
+    answer_cache = get_answer_cache() if use_answer_cache and not conversation_history else None
+    question_vector = None
+    if answer_cache is not None:
+        # Embedded once; the vector is reused to store the answer after a miss
+        question_vector = answer_cache.embed_question(user_query)
+        cached = answer_cache.lookup(user_query, scope=cache_scope, index_name=index_name, vector=question_vector)
+        if cached is not None:
+            print(f"Answer cache hit (similarity {cached['similarity']:.3f}) for: {cached['question']}")
+            context.answer_from_cache = True
+            context.cached_citations = cached["citations"]
+            return _result(iter([cached["answer"]]) if stream else cached["answer"])
+    
+    # Retrieve relevant chunks (reused if the caller already searched)
     print(f"Retrieving relevant chunks for query: {user_query}")
-    retrieved_chunks = retrieve_relevant_chunks(user_query, index_name, api_key, top_k)
+    retrieved_chunks = context.retrieve(api_key)
     print(f"Retrieved {len(retrieved_chunks)} relevant chunks")
     
+    # Drop overlapping text and fit the chunks to the context token budget
+    retrieved_chunks = context.pack(api_key)
+    
     # Generate system prompt with retrieved chunks
-    system_prompt = get_system_prompt(retrieved_chunks)
+    system_prompt = context.system_prompt = get_system_prompt(retrieved_chunks)
     
     # Prepare messages including conversation history
     messages = [
@@ -240,9 +804,28 @@ def answer_question(user_query, index_name, api_key=PINECONE_API_KEY, top_k=5, c
     
     # Query SONAR API with the full message history
     print("Querying SONAR API...")
-    response = query_sonar_with_history(messages)
-    
-    return response
+    cache_entry = {"question": user_query, "citations": get_citations(retrieved_chunks), "scope": cache_scope, "index_name": index_name,
+                   "vector": question_vector}
+    answer_stream = _stream_answer(messages, context, answer_cache, cache_entry)
+    return _result(answer_stream if stream else "".join(answer_stream))
+
+def _stream_answer(messages, context, answer_cache, cache_entry):
+    """
+    Stream the SONAR answer, then record its timings and cache the complete answer
+    """
+    metrics, parts = {}, []
+    for chunk in timed_stream(stream_sonar_with_history(messages), "sonar", metrics):
+        parts.append(chunk)
+        yield chunk
+    if metrics["time_to_first_token"] is not None:
+        context.timings["first token"] = metrics["time_to_first_token"]
+    context.timings["generation"] = metrics["total"]
+    print(f"Answered query: {context.summary()}")
+    
+    response = "".join(parts)
+    if answer_cache is not None and not response.startswith("Error calling SONAR API"):
+        answer_cache.put(cache_entry["question"], response, citations=cache_entry["citations"], scope=cache_entry["scope"],
+                         index_name=cache_entry["index_name"], vector=cache_entry["vector"])
 
 def process_command(command, args, session_manager, index_name, api_key):
     """
@@ -292,6 +875,13 @@ def process_command(command, args, session_manager, index_name, api_key):
         
         return response
     
+    elif command == "purgecache":
+        answer_cache = get_answer_cache()
+        if answer_cache is None:
+            return "The answer cache is disabled."
+        removed = answer_cache.purge(question_contains=args.strip() if args else None)
+        return f"Purged {removed} cached answers."
+    
     elif command == "help":
         return (
             "Available commands:\n"
@@ -299,6 +889,7 @@ def process_command(command, args, session_manager, index_name, api_key):
             "/save [name] - Save current conversation with optional name\n"
             "/load [id|name] - Load a specific conversation\n"
             "/list - Show available saved conversations\n"
+            "/purgecache [text] - Purge cached answers, optionally only questions containing text\n"
             "/exit - Exit the program\n"
             "/help - Show this help message"
         )
@@ -306,7 +897,7 @@ def process_command(command, args, session_manager, index_name, api_key):
     else:
         return f"Unknown command: {command}. Type /help for available commands."
 
-def interactive_qa(index_name="policypulse", api_key=PINECONE_API_KEY):
+def interactive_qa(index_name=DEFAULT_INDEX_NAME, api_key=PINECONE_API_KEY):
     """
     Interactive Q&A loop with session management
     """
@@ -348,16 +939,21 @@ def interactive_qa(index_name="policypulse", api_key=PINECONE_API_KEY):
             continue
         
         # Process regular questions
-        response = answer_question(
+        answer_stream = answer_question(
             user_input, 
             index_name, 
             api_key, 
-            conversation_history=session_manager.get_conversation_history()
+            conversation_history=session_manager.get_conversation_history(),
+            stream=True
         )
         
-        # Display the response
+        # Display the response as it is generated
         print("\nCompliance Bot Response:")
-        print(response)
+        response = ""
+        for chunk in answer_stream:
+            print(chunk, end="", flush=True)
+            response += chunk
+        print()
         
         # Add this exchange to the session
         session_manager.add_message(user_input, response)
@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import time
+import threading
+import numpy as np
+
+from .document_metadata import JURISDICTION_ALIASES, normalize_filters
+from .local_index import normalize_rows
+from .pinecone_registry import get_pinecone_registry
+from .query_cache import QUERY_CACHE_BACKEND, get_query_cache, normalize_query
+
+# Minimum cosine similarity between questions for a cached answer to be reused. Calibrated for
+# multilingual-e5-large, whose question similarities cluster between 0.8 and 1.0; questions that only
+# differ in a jurisdiction, number or name score above it and are told apart by question_entities
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", "0.93"))
+# Seconds a cached answer stays valid
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", str(24 * 3600)))
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+# Pinecone-hosted model used to embed questions
+ANSWER_CACHE_EMBED_MODEL = os.environ.get("ANSWER_CACHE_EMBED_MODEL", "multilingual-e5-large")
+# The cache is opt-in: set ANSWER_CACHE_ENABLED=1 to turn it on
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "0") == "1"
+
+
+class PineconeInferenceEmbedder:
+    """
+    Embedding function backed by Pinecone's hosted inference API
+    """
+
+    def __init__(self, api_key, model=ANSWER_CACHE_EMBED_MODEL):
+        """
+        Initialize the embedder
+
+        Parameters:
+        api_key (str): Pinecone API key
+        model (str): Hosted embedding model name
+        """
+        self.api_key = api_key
+        self.model = model
+
+    def __call__(self, texts):
+        client = get_pinecone_registry().get_client(self.api_key)
+        response = client.inference.embed(
+            model=self.model,
+            inputs=list(texts),
+            parameters={"input_type": "query", "truncate": "END"},
+        )
+        return normalize_rows([item["values"] for item in response])
+
+
+class SemanticAnswerCache:
+    """
+    Cache of final answers looked up by question similarity
+
+    Questions are embedded and compared by cosine similarity, so paraphrases
+    such as "Do we have to offer fertility leave?" and "is fertility leave
+    mandatory" can share one answer. Dense embeddings barely separate
+    "... in the UK?" from "... in the US?", so a hit also requires both
+    questions to name the same entities (see question_entities). Entries are scoped (by app, tenant and
+    retrieval filters, see answer_cache_scope), expire after their TTL, and are
+    ignored once the scope's index has been re-ingested.
+
+    Re-ingestion is detected through the query cache's index generation. With
+    the memory query cache backend the generation only changes in the process
+    that ran the ingestion, so other workers keep serving answers grounded in
+    the old documents until they expire (ANSWER_CACHE_TTL). Deployments with
+    several workers or a separate ingestion job should use
+    QUERY_CACHE_BACKEND=redis.
+    """
+
+    def __init__(self, embed_fn, threshold=ANSWER_CACHE_THRESHOLD, ttl=ANSWER_CACHE_TTL, max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        """
+        Initialize an empty cache
+
+        Parameters:
+        embed_fn (callable): Semantic embedding model mapping a list of texts to a 2-D array
+        threshold (float): Minimum cosine similarity for a hit
+        ttl (float): Default seconds an entry stays valid
+        max_entries (int): Maximum entries; the oldest are dropped first
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = []
+        self._embeddings = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _generation(self, index_name):
+        query_cache = get_query_cache()
+        return query_cache.generation(index_name) if query_cache is not None and index_name else 0
+
+    def embed_question(self, question):
+        """
+        Embed a question for lookup and put
+
+        Callers that look an answer up and store it after a miss can embed the
+        question once and pass the vector to both calls.
+
+        Parameters:
+        question (str): Question text
+
+        Returns:
+        numpy.ndarray: Normalized question embedding, or None if embedding failed
+        """
+        try:
+            return normalize_rows(self.embed_fn([normalize_query(question)]))[0]
+        except Exception as e:
+            print(f"Error embedding question for answer cache: {e}")
+            return None
+
+    def lookup(self, question, scope="", index_name=None, vector=None):
+        """
+        Find a cached answer for a similar question
+
+        Parameters:
+        question (str): Incoming question
+        scope (str): Cache scope; only entries stored with the same scope match
+        index_name (str): Index the answer was grounded in; entries from before its last ingestion are skipped
+        vector (numpy.ndarray): Question embedding from embed_question; computed if not given
+
+        Returns:
+        dict: Entry with question, answer, citations and similarity, or None on a miss
+        """
+        if vector is None:
+            vector = self.embed_question(question)
+        if vector is None:
+            return None
+        entities = question_entities(question)
+        generation = self._generation(index_name)
+        now = time.time()
+        with self._lock:
+            best, best_similarity = None, self.threshold
+            if self.entries:
+                similarities = self._embeddings @ vector
+                for row in np.argsort(-similarities):
+                    if similarities[row] < best_similarity:
+                        break
+                    entry = self.entries[row]
+                    if (entry["scope"] == scope and entry["entities"] == entities and entry["expires"] > now
+                            and entry["generation"] == generation):
+                        best, best_similarity = entry, float(similarities[row])
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {**best, "similarity": best_similarity}
+
+    def put(self, question, answer, citations=None, scope="", index_name=None, ttl=None, vector=None):
+        """
+        Store an answer
+
+        Parameters:
+        question (str): Question that was answered
+        answer (str): Final answer text
+        citations (list): Sources supporting the answer
+        scope (str): Cache scope
+        index_name (str): Index the answer was grounded in
+        ttl (float): Seconds the entry stays valid; defaults to the cache TTL
+        vector (numpy.ndarray): Question embedding from embed_question; computed if not given
+        """
+        if vector is None:
+            vector = self.embed_question(question)
+        if vector is None:
+            return
+        entry = {
+            "question": question,
+            "answer": answer,
+            "citations": citations or [],
+            "scope": scope,
+            "entities": question_entities(question),
+            "index_name": index_name,
+            "generation": self._generation(index_name),
+            "created": time.time(),
+            "expires": time.time() + (self.ttl if ttl is None else ttl),
+        }
+        with self._lock:
+            self._drop(lambda e: e["expires"] <= entry["created"])
+            self.entries.append(entry)
+            self._embeddings = vector[None, :] if self._embeddings is None else np.vstack([self._embeddings, vector])
+            if len(self.entries) > self.max_entries:
+                excess = len(self.entries) - self.max_entries
+                self.entries = self.entries[excess:]
+                self._embeddings = self._embeddings[excess:]
+
+    def _drop(self, predicate):
+        keep = [i for i, entry in enumerate(self.entries) if not predicate(entry)]
+        removed = len(self.entries) - len(keep)
+        if removed:
+            self.entries = [self.entries[i] for i in keep]
+            self._embeddings = self._embeddings[keep] if keep else None
+        return removed
+
+    def purge(self, scope=None, question_contains=None):
+        """
+        Remove cached answers (admin operation)
+
+        Parameters:
+        scope (str): Only purge this scope; all scopes if None
+        question_contains (str): Only purge entries whose question contains this text
+
+        Returns:
+        int: Number of entries removed
+        """
+        needle = question_contains.lower() if question_contains else None
+        with self._lock:
+            removed = self._drop(lambda e: (scope is None or e["scope"] == scope)
+                                 and (needle is None or needle in e["question"].lower()))
+        print(f"Purged {removed} cached answers")
+        return removed
+
+    def stats(self):
+        """
+        Get cache statistics
+
+        Returns:
+        dict: Entry count, hits, misses and hit rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Function to find the entities a question is about
+def question_entities(question):
+    """
+    Get the jurisdictions, numbers and capitalized names mentioned in a question
+
+    Two questions only share a cached answer when these match, so "Is fertility
+    leave mandatory in the UK?" never answers the same question about the US,
+    another year or another employer. Extra words only cause misses, never
+    wrong answers.
+
+    Parameters:
+    question (str): Question text
+
+    Returns:
+    list: Sorted canonical entities
+    """
+    words = re.findall(r"[A-Za-z0-9]+", question)
+    lower = [word.lower() for word in words]
+    entities, used = set(), set()
+    # Longest alias first, so "northern ireland" is not also read as Ireland
+    for size in (3, 2, 1):
+        for start in range(len(words) - size + 1):
+            span = range(start, start + size)
+            alias = "-".join(lower[start:start + size])
+            # Two-letter codes only in capitals, so "us" and "ie" stay ordinary words
+            if len(alias) <= 2 and not words[start].isupper():
+                continue
+            if alias in JURISDICTION_ALIASES and not used.intersection(span):
+                entities.add(JURISDICTION_ALIASES[alias])
+                used.update(span)
+    for position, word in enumerate(words):
+        if position in used:
+            continue
+        if word.isdigit():
+            entities.add(word)
+        # The first word is capitalized anyway, and "I" is not a name
+        elif position > 0 and len(word) > 1 and word[0].isupper():
+            entities.add(word.lower())
+    return sorted(entities)
+
+# Function to build the scope answers are cached under
+def answer_cache_scope(name, filters=None):
+    """
+    Build an answer cache scope from an app name and the retrieval filters
+
+    Answers are only shared between questions asked by the same tenant with the
+    same filters, since they are grounded in different documents otherwise.
+
+    Parameters:
+    name (str): Name of the app or answering pipeline
+    filters (dict): Retrieval filters, normalized with normalize_filters (so the tenant defaults to DEFAULT_TENANT)
+
+    Returns:
+    str: Cache scope
+    """
+    return f"{name}:" + json.dumps(normalize_filters(filters), sort_keys=True)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Function to get the process-wide answer cache
+def get_answer_cache():
+    """
+    Get the process-wide semantic answer cache, created on first use
+
+    Questions are embedded with Pinecone's hosted model. Without PINECONE_API_KEY
+    there is no semantic embedder and the cache stays disabled: a lexical
+    embedding cannot match paraphrases and only adds false hits. Without the
+    redis query cache backend, re-ingestion only invalidates answers in the
+    ingesting process (see SemanticAnswerCache).
+
+    Returns:
+    SemanticAnswerCache: The cache, or None when ANSWER_CACHE_ENABLED is off or no embedder is available
+    """
+    global _default_cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            api_key = os.environ.get("PINECONE_API_KEY")
+            if not api_key:
+                print("Answer cache disabled: PINECONE_API_KEY is not set, so questions cannot be embedded")
+                _default_cache = False
+            else:
+                _default_cache = SemanticAnswerCache(PineconeInferenceEmbedder(api_key))
+                if QUERY_CACHE_BACKEND != "redis":
+                    print(f"Answer cache: re-ingestion by another process is not seen with the {QUERY_CACHE_BACKEND} "
+                          f"query cache backend; cached answers may be up to {ANSWER_CACHE_TTL / 3600:g} hours stale")
+        return _default_cache or None
@@ -0,0 +1,128 @@
+import os
+import re
+import math
+import threading
+
+from .dedup import normalize_chunk_text
+
+# Default token budget for the retrieved context handed to a model
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "3000"))
+# tiktoken encoding used to count tokens; without tiktoken, tokens are estimated from characters
+CONTEXT_TOKEN_ENCODING = os.environ.get("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+# Sentences shorter than this are never treated as duplicated spans (headings, "Yes.", ...)
+MIN_OVERLAP_CHARS = 40
+# A chunk is only cut to fit the remaining budget if at least this many tokens of it fit
+MIN_PARTIAL_TOKENS = 50
+
+_SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+|\n+|$)")
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+# Function to count tokens
+def count_tokens(text):
+    """
+    Count the tokens of a text with tiktoken, or estimate them at four
+    characters per token when tiktoken is not installed
+
+    Parameters:
+    text (str): Text to count
+
+    Returns:
+    int: Number of tokens
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(CONTEXT_TOKEN_ENCODING)
+                except Exception as e:
+                    print(f"tiktoken unavailable ({e}); estimating token counts from characters")
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+# Function to split text into sentence spans
+def _sentences(text):
+    return [match.group(0) for match in _SENTENCE_PATTERN.finditer(text) if match.group(0).strip()]
+
+# Function to pack retrieved chunks into a token budget
+def pack_context(chunks, token_budget=None, presorted=False):
+    """
+    Assemble retrieved chunks into a context that fits a token budget
+
+    Chunks are taken best score first, or in the given order if presorted
+    (e.g. after MMR re-ranking, whose order is not the score order). Sentences
+    already present in a higher-ranked chunk (the overlap between neighbouring
+    chunks of a document, or near-duplicate chunks) are removed; chunks with
+    nothing new are dropped.
+    Chunks are added until the budget is reached, and the chunk that crosses it
+    is cut at a sentence boundary.
+
+    Parameters:
+    chunks (list): Retrieved chunks with "text" and "score"
+    token_budget (int): Maximum tokens of chunk text; defaults to CONTEXT_TOKEN_BUDGET
+    presorted (bool): Keep the input order instead of sorting by score
+
+    Returns:
+    tuple: (packed chunks with trimmed "text" and a "tokens" count, stats dictionary)
+    """
+    token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    ordered = chunks if presorted else sorted(chunks, key=lambda chunk: -(chunk.get("score") or 0))
+
+    packed, seen, used = [], set(), 0
+    tokens_in = 0
+    for chunk in ordered:
+        text = chunk.get("text", "")
+        tokens_in += count_tokens(text)
+        if used >= token_budget:
+            continue
+
+        kept, removed_overlap = [], False
+        for sentence in _sentences(text):
+            key = normalize_chunk_text(sentence)
+            if len(key) >= MIN_OVERLAP_CHARS:
+                if key in seen:
+                    removed_overlap = True
+                    continue
+                seen.add(key)
+            kept.append(sentence)
+        if not any(sentence.strip() for sentence in kept):
+            continue
+
+        packed_text = "".join(kept).strip() if removed_overlap else text
+        tokens = count_tokens(packed_text)
+        if used + tokens > token_budget:
+            # Cut the chunk at the last sentence that still fits
+            remaining, partial = token_budget - used, []
+            for sentence in kept:
+                sentence_tokens = count_tokens(sentence)
+                if sentence_tokens > remaining:
+                    break
+                partial.append(sentence)
+                remaining -= sentence_tokens
+            packed_text = "".join(partial).strip()
+            tokens = count_tokens(packed_text) if packed_text else 0
+            if tokens < MIN_PARTIAL_TOKENS:
+                # Budget is effectively spent; lower-ranked chunks are skipped
+                used = token_budget
+                continue
+
+        packed.append({**chunk, "text": packed_text, "tokens": tokens})
+        used += tokens
+
+    stats = {
+        "chunks_in": len(chunks),
+        "chunks_out": len(packed),
+        "tokens_in": tokens_in,
+        "tokens_out": sum(chunk["tokens"] for chunk in packed),
+        "token_budget": token_budget,
+    }
+    stats["tokens_saved"] = stats["tokens_in"] - stats["tokens_out"]
+    print(f"Packed {stats['chunks_out']}/{stats['chunks_in']} chunks into {stats['tokens_out']} tokens "
+          f"(saved {stats['tokens_saved']} tokens, budget {token_budget})")
+    return packed, stats
@@ -0,0 +1,197 @@
+import re
+import zlib
+import hashlib
+import numpy as np
+
+# Mersenne prime used by the MinHash permutations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+# Function to normalize chunk text before hashing
+def normalize_chunk_text(text):
+    """
+    Normalize chunk text so that trivial whitespace and case differences hash the same
+
+    Parameters:
+    text (str): Chunk text
+
+    Returns:
+    str: Lower-cased text with collapsed whitespace
+    """
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+# Function to build a content-addressed chunk ID
+def chunk_content_id(text):
+    """
+    Build a chunk ID from the chunk's normalized content
+
+    Identical text always gets the same ID, so duplicates collapse on upsert and
+    files with the same name in different folders no longer overwrite each other.
+
+    Parameters:
+    text (str): Chunk text
+
+    Returns:
+    str: Chunk ID
+    """
+    return "chunk_" + hashlib.sha256(normalize_chunk_text(text).encode("utf-8")).hexdigest()[:32]
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles, with deterministic hashing across processes
+    """
+
+    def __init__(self, num_perm=128, shingle_size=5, seed=1):
+        """
+        Initialize the hash permutations
+
+        Parameters:
+        num_perm (int): Number of permutations (signature length)
+        shingle_size (int): Number of words per shingle
+        seed (int): Seed for the permutation coefficients
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        """
+        Compute the MinHash signature of a text
+
+        Parameters:
+        text (str): Text to sign (normalized or not)
+
+        Returns:
+        numpy.ndarray: uint32 signature of length num_perm
+        """
+        words = normalize_chunk_text(text).split()
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # (a * x + b) mod p, truncated to 32 bits; uint64 wrap-around keeps this deterministic
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+class ChunkDeduplicator:
+    """
+    Exact and near-duplicate filter for document chunks
+
+    Exact duplicates are detected by content-hash ID. Near duplicates are found with
+    MinHash signatures and locality-sensitive hashing, then confirmed by estimated
+    Jaccard similarity. Duplicated text is kept once and its metadata lists every
+    source file it appears in.
+    """
+
+    def __init__(self, threshold=0.85, num_perm=128, bands=16):
+        """
+        Initialize the deduplicator
+
+        Parameters:
+        threshold (float): Minimum estimated Jaccard similarity for a near duplicate
+        num_perm (int): MinHash signature length
+        bands (int): Number of LSH bands; num_perm must be divisible by bands
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = {}
+        # Chunk ID -> list of source files (shared with the kept document's metadata)
+        self.sources = {}
+        # IDs whose source list grew after they were first seen
+        self.updated_ids = set()
+        # Chunk ID -> source files of chunks stored by an earlier run and not seen yet in this one
+        self._stored_sources = {}
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def add(self, doc):
+        """
+        Register a chunk and decide whether it should be kept
+
+        Parameters:
+        doc (dict): Document chunk with id, text and metadata (including source_files)
+
+        Returns:
+        tuple: (canonical chunk ID, True if the chunk is new and should be uploaded)
+        """
+        source = doc["metadata"]["file_path"]
+
+        # Exact duplicate: same content hash
+        if doc["id"] in self.sources:
+            self.exact_duplicates += 1
+            self._add_source(doc["id"], source)
+            return doc["id"], False
+
+        signature = self.hasher.signature(doc["text"])
+        band_keys = [signature[b * self.rows:(b + 1) * self.rows].tobytes() for b in range(self.bands)]
+        stored_sources = self._stored_sources.pop(doc["id"], None)
+
+        # Near duplicate: shares an LSH band with a chunk of high estimated similarity.
+        # A chunk that is already stored keeps its own record.
+        candidates = set()
+        if stored_sources is None:
+            for bucket, key in zip(self._buckets, band_keys):
+                candidates.update(bucket.get(key, ()))
+        best_id, best_similarity = None, 0.0
+        for candidate_id in candidates:
+            similarity = float(np.mean(self._signatures[candidate_id] == signature))
+            if similarity > best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+        if best_id is not None and best_similarity >= self.threshold:
+            self.near_duplicates += 1
+            self._add_source(best_id, source)
+            return best_id, False
+
+        # New chunk, or the first copy of a stored chunk, uploaded again with the merged source list
+        self._signatures[doc["id"]] = signature
+        for bucket, key in zip(self._buckets, band_keys):
+            bucket.setdefault(key, []).append(doc["id"])
+        sources = doc["metadata"].setdefault("source_files", [source])
+        if stored_sources:
+            sources[:0] = [stored for stored in stored_sources if stored not in sources]
+        self.sources[doc["id"]] = sources
+        return doc["id"], True
+
+    def seed(self, chunk_id, sources):
+        """
+        Register a chunk stored by an earlier run, so that a copy found in this run
+        is uploaded with its existing source files as well as the new one
+
+        Only exact copies of a stored chunk are recognised, since its text is not known.
+
+        Parameters:
+        chunk_id (str): ID of the stored chunk
+        sources (list): Files the chunk is stored for and that are not re-processed in this run
+        """
+        if chunk_id not in self.sources:
+            self._stored_sources[chunk_id] = list(sources)
+
+    def _add_source(self, chunk_id, source):
+        sources = self.sources[chunk_id]
+        if source not in sources:
+            sources.append(source)
+            self.updated_ids.add(chunk_id)
+
+    def summary(self):
+        """
+        Get deduplication statistics
+
+        Returns:
+        dict: Number of unique chunks and of exact and near duplicates dropped
+        """
+        return {
+            "unique": len(self.sources),
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+        }
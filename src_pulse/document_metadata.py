@@ -0,0 +1,276 @@
+import os
+import re
+import json
+from pathlib import Path
+
+# Tenant of documents whose metadata.json does not name one, and of searches without a tenant
+DEFAULT_TENANT = os.environ.get("DEFAULT_TENANT", "default")
+# Document fields that choose the namespace a chunk is stored in, e.g. "tenant,jurisdiction"
+NAMESPACE_FIELDS = tuple(field.strip() for field in os.environ.get("NAMESPACE_FIELDS", "tenant").split(",") if field.strip())
+# Structured fields written on every chunk and accepted as retrieval filters
+FILTER_FIELDS = ("tenant", "jurisdiction", "doc_type")
+# Value of a field that could not be determined
+UNKNOWN = "unknown"
+# Per-directory metadata file; its fields apply to every document below the directory
+DIRECTORY_METADATA_FILE = "metadata.json"
+# Suffix of a per-document metadata file, e.g. report.pdf.meta.json
+DOCUMENT_METADATA_SUFFIX = ".meta.json"
+
+# Path words that identify a jurisdiction
+JURISDICTION_ALIASES = {
+    "uk": "uk", "united-kingdom": "uk", "gb": "uk", "great-britain": "uk", "britain": "uk",
+    "england": "uk", "scotland": "uk", "wales": "uk", "northern-ireland": "uk",
+    "us": "us", "usa": "us", "united-states": "us",
+    "eu": "eu", "european-union": "eu",
+    "ie": "ie", "ireland": "ie",
+    "au": "au", "australia": "au",
+    "ca": "ca", "canada": "ca",
+    "nz": "nz", "new-zealand": "nz",
+}
+
+# Path words that identify a document type
+DOC_TYPE_KEYWORDS = {
+    "legislation": ("legislation", "act", "acts", "regulation", "regulations", "statute", "directive", "law", "bill"),
+    "case-law": ("case-law", "judgment", "judgement", "tribunal", "ruling"),
+    "guidance": ("guidance", "guide", "guidelines", "code-of-practice", "toolkit", "faq"),
+    "policy": ("policy", "policies", "handbook", "procedure", "procedures"),
+    "research": ("research", "report", "study", "survey", "whitepaper", "briefing", "paper"),
+}
+_DOC_TYPE_ALIASES = {keyword: doc_type for doc_type, keywords in DOC_TYPE_KEYWORDS.items() for keyword in keywords}
+
+
+# Function to normalize a metadata value
+def normalize_value(field, value):
+    """
+    Normalize a field value to its canonical lower-case slug
+
+    Jurisdiction and document type aliases map to one canonical value, so
+    "United Kingdom", "england" and "UK" all become "uk".
+
+    Parameters:
+    field (str): Field name
+    value (str): Raw value
+
+    Returns:
+    str: Canonical value, or UNKNOWN if empty
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", str(value).lower()).strip("-")
+    if not slug:
+        return UNKNOWN
+    if field == "jurisdiction":
+        return JURISDICTION_ALIASES.get(slug, slug)
+    if field == "doc_type":
+        return _DOC_TYPE_ALIASES.get(slug, slug)
+    return slug
+
+# Function to read a metadata file, ignoring missing or invalid files
+def _read_metadata_file(path):
+    if not path.is_file():
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception as e:
+        print(f"Error reading metadata file {path}: {e}")
+        return {}
+
+# Function to split a path into lower-case words and word pairs
+def _path_tokens(relative_path):
+    words = re.findall(r"[a-z0-9]+", str(relative_path).lower())
+    return words + [f"{a}-{b}" for a, b in zip(words, words[1:])]
+
+# Function to work out the structured metadata of a document
+def infer_document_metadata(file_path, root=None):
+    """
+    Determine a document's tenant, jurisdiction and document type
+
+    Values come from metadata.json files in the directories between the corpus
+    root and the document (the nearest directory wins), then from an optional
+    <file>.meta.json next to the document. Fields still missing are inferred
+    from words in the path relative to the root, e.g. uk/guidance/leave.pdf, and
+    the tenant defaults to DEFAULT_TENANT. Directories above the root never
+    affect the result.
+
+    Parameters:
+    file_path (str or Path): Path to the document
+    root (str or Path): Corpus root directory; defaults to the document's own directory
+
+    Returns:
+    dict: Canonical values for every field in FILTER_FIELDS
+    """
+    file_path = Path(file_path).resolve()
+    root = file_path.parent if root is None else Path(root).resolve()
+    try:
+        relative_path = file_path.relative_to(root)
+    except ValueError:
+        # Outside the root: only the document's own directory and name count
+        root, relative_path = file_path.parent, Path(file_path.name)
+
+    metadata = {}
+    directories = [root.joinpath(*relative_path.parts[:depth]) for depth in range(len(relative_path.parts))]
+    for directory in directories:
+        metadata.update(_read_metadata_file(directory / DIRECTORY_METADATA_FILE))
+    metadata.update(_read_metadata_file(file_path.with_name(file_path.name + DOCUMENT_METADATA_SUFFIX)))
+
+    tokens = _path_tokens(relative_path)
+    if "jurisdiction" not in metadata:
+        metadata["jurisdiction"] = next((JURISDICTION_ALIASES[t] for t in tokens if t in JURISDICTION_ALIASES), UNKNOWN)
+    if "doc_type" not in metadata:
+        metadata["doc_type"] = next((_DOC_TYPE_ALIASES[t] for t in tokens if t in _DOC_TYPE_ALIASES), UNKNOWN)
+    metadata.setdefault("tenant", DEFAULT_TENANT)
+    return {field: normalize_value(field, metadata[field]) for field in FILTER_FIELDS}
+
+# Function to get the namespace a chunk belongs in
+def build_namespace(metadata):
+    """
+    Build the namespace for a chunk from its NAMESPACE_FIELDS values
+
+    The namespace is a "."-joined list of "<field>-<value>" parts. The default
+    tenant is left out, so a single-tenant deployment keeps using the default
+    namespace "".
+
+    Parameters:
+    metadata (dict): Chunk metadata or record fields
+
+    Returns:
+    str: Namespace name
+    """
+    parts = []
+    for field in NAMESPACE_FIELDS:
+        value = normalize_value(field, metadata.get(field) or (DEFAULT_TENANT if field == "tenant" else UNKNOWN))
+        if field == "tenant" and value == DEFAULT_TENANT:
+            continue
+        parts.append(f"{field}-{value}")
+    return ".".join(parts)
+
+# Function to read the field values encoded in a namespace
+def parse_namespace(namespace):
+    """
+    Inverse of build_namespace
+
+    Parameters:
+    namespace (str): Namespace name
+
+    Returns:
+    dict: Field -> value for every field in NAMESPACE_FIELDS, or None if the
+          name was not produced by build_namespace with the current fields
+    """
+    values = {"tenant": DEFAULT_TENANT} if "tenant" in NAMESPACE_FIELDS else {}
+    for part in namespace.split(".") if namespace else []:
+        field, _, value = part.partition("-")
+        if field not in NAMESPACE_FIELDS or not value:
+            return None
+        values[field] = value
+    # Namespaces written before a field was added to NAMESPACE_FIELDS cannot be filtered on it
+    if any(field not in values for field in NAMESPACE_FIELDS):
+        return None
+    return values
+
+# Function to validate and normalize retrieval filters
+def normalize_filters(filters):
+    """
+    Normalize retrieval filters to field -> sorted list of accepted values
+
+    Every search is scoped to one tenant, DEFAULT_TENANT unless the filters name
+    another, so results never mix tenants.
+
+    Parameters:
+    filters (dict): Field -> value or list of values, e.g. {"jurisdiction": "UK"};
+                    empty values are ignored
+
+    Returns:
+    dict: Normalized filters
+    """
+    normalized = {}
+    for field, values in (filters or {}).items():
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown filter field: {field}")
+        if values is None or values == "":
+            continue
+        if isinstance(values, str):
+            values = [values]
+        values = sorted({normalize_value(field, value) for value in values if value})
+        if values:
+            normalized[field] = values
+    if len(normalized.get("tenant", [DEFAULT_TENANT])) != 1:
+        raise ValueError("Searches must be scoped to a single tenant")
+    normalized.setdefault("tenant", [normalize_value("tenant", DEFAULT_TENANT)])
+    return normalized
+
+# Function to check a chunk's metadata against filters
+def matches_filters(metadata, filters):
+    """
+    Check whether metadata satisfies normalized filters
+
+    Parameters:
+    metadata (dict): Chunk metadata
+    filters (dict): Filters from normalize_filters
+
+    Returns:
+    bool: True if every filtered field has an accepted value
+    """
+    for field, values in (filters or {}).items():
+        default = DEFAULT_TENANT if field == "tenant" else UNKNOWN
+        if normalize_value(field, metadata.get(field) or default) not in values:
+            return False
+    return True
+
+# Function to drop the filters that namespace selection already applies
+def residual_filters(filters):
+    """
+    Get the filters a search still has to apply inside the selected namespaces
+
+    Fields in NAMESPACE_FIELDS are enforced by select_namespaces, so the
+    backend does not need to check them on every record.
+
+    Parameters:
+    filters (dict): Filters from normalize_filters
+
+    Returns:
+    dict: Remaining filters, or None when nothing is left to filter
+    """
+    remaining = {field: values for field, values in (filters or {}).items() if field not in NAMESPACE_FIELDS}
+    return remaining or None
+
+# Function to translate filters into Pinecone's filter language
+def to_pinecone_filter(filters):
+    """
+    Translate normalized filters into a Pinecone metadata filter
+
+    Parameters:
+    filters (dict): Filters from residual_filters
+
+    Returns:
+    dict: Pinecone filter, or None when nothing is filtered
+    """
+    conditions = {}
+    for field, values in (filters or {}).items():
+        conditions[field] = {"$eq": values[0]} if len(values) == 1 else {"$in": values}
+    return conditions or None
+
+# Function to choose the namespaces a filtered search has to cover
+def select_namespaces(filters, available=None):
+    """
+    Choose the namespaces that can hold chunks matching the filters
+
+    Parameters:
+    filters (dict): Filters from normalize_filters
+    available (list): Namespaces in the index; needed only when the filters do
+                      not pin every namespace field to a single value
+
+    Returns:
+    list: Namespaces to search, or None if the available namespaces are needed
+    """
+    filters = filters or {}
+    if all(len(filters.get(field, [])) == 1 for field in NAMESPACE_FIELDS):
+        return [build_namespace({field: filters[field][0] for field in NAMESPACE_FIELDS})]
+    if available is None:
+        return None
+
+    selected = []
+    for namespace in available:
+        values = parse_namespace(namespace)
+        if values is not None and all(value in filters.get(field, [value]) for field, value in values.items()):
+            selected.append(namespace)
+    return selected
@@ -1,7 +1,7 @@
 import fitz  # PyMuPDF
 import docx
 import pytesseract
-from pdf2image import convert_from_path
+from PIL import Image
 from pptx import Presentation
 from odf import text, teletype
 from odf.opendocument import load
@@ -9,7 +9,32 @@ import os
 from pathlib import Path
 from tqdm.notebook import tqdm
 import datetime
-from pinecone import Pinecone
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from .ingestion_manifest import IngestionManifest, hash_file, get_splitter_settings
+from .upsert_engine import UpsertCheckpoint, iter_record_batches, upsert_batches
+from .extraction_cache import get_extraction_cache
+from .dedup import ChunkDeduplicator, chunk_content_id
+from .document_metadata import DEFAULT_TENANT, FILTER_FIELDS, UNKNOWN, build_namespace, infer_document_metadata
+from .vector_store import get_vector_store
+from .lexical_index import get_lexical_index, save_lexical_index
+
+# Number of worker processes used by process_directory (1 = sequential)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "1"))
+
+# OCR settings for scanned PDFs
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "4"))
+
+# Bump whenever extraction output changes so cached text is not reused
+EXTRACTOR_VERSION = "2"
+
+# Supported document extensions
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.pptx', '.odp']
+
+# Records per upsert request (Pinecone appears to have limit of 96)
+UPSERT_BATCH_SIZE = 64
 
 
 # Function to extract text from DOCX
@@ -34,73 +59,142 @@ def extract_text_from_odp(file_path):
     text_elements = doc.getElementsByType(text.P)
     return "\n".join([teletype.extractText(element) for element in text_elements])
 
-# Function to check if a PDF is scanned and extract text accordingly
-def extract_text_from_pdf(file_path):
+# OCR a single page rendered by PyMuPDF (grayscale raw samples)
+def _ocr_pixmap_samples(width, height, samples):
+    image = Image.frombytes("L", (width, height), samples)
+    try:
+        return pytesseract.image_to_string(image)
+    finally:
+        image.close()
+
+# Function to extract text from a PDF, OCRing only the pages that have no text layer
+def extract_text_from_pdf(file_path, dpi=None, max_workers=None):
+    """
+    Extract text from a PDF in a single PyMuPDF pass
+    
+    Each page is classified on its own: pages with a text layer are read directly,
+    pages with (almost) no text but with embedded images are treated as scanned and
+    rendered from the already-open document for OCR. Blank pages are skipped. OCR
+    runs on a thread pool with at most max_workers rendered pages in flight, so
+    peak memory depends on the number of workers, not on the page count.
+    
+    Parameters:
+    file_path (str or Path): Path to the PDF file
+    dpi (int): Render resolution for scanned pages; defaults to OCR_DPI
+    max_workers (int): Number of pages OCR'd concurrently; defaults to OCR_WORKERS
+    
+    Returns:
+    str: Text of all pages in page order
+    """
+    dpi = dpi or OCR_DPI
+    max_workers = max_workers or OCR_WORKERS
+    
     # Open the PDF
     doc = fitz.open(file_path)
     
-    # Check if the PDF has text
-    text = ""
-    text_found = False
+    # One entry per page: either the page text or a Future for its OCR result
+    page_texts = []
+    in_flight = []
+    scanned_pages = 0
     
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        page_text = page.get_text()
-        
-        # If page has more than 10 characters, consider it a text PDF
-        if len(page_text.strip()) > 10:
-            text_found = True
-            text += page_text + "\n"
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page in doc:
+                page_text = page.get_text()
+                
+                # If page has more than 10 characters, consider it a text page
+                if len(page_text.strip()) > 10:
+                    page_texts.append(page_text)
+                    continue
+                
+                # No text layer and no images: nothing to recognise
+                if not page.get_images():
+                    continue
+                
+                # Bound the number of rendered pages held in memory
+                if len(in_flight) >= max_workers:
+                    in_flight.pop(0).result()
+                
+                pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+                future = executor.submit(_ocr_pixmap_samples, pix.width, pix.height, pix.samples)
+                del pix
+                page_texts.append(future)
+                in_flight.append(future)
+                scanned_pages += 1
+            
+            text = ""
+            for page_text in page_texts:
+                if not isinstance(page_text, str):
+                    page_text = page_text.result()
+                text += page_text + "\n"
+    finally:
+        doc.close()
     
-    # If no significant text found, it's likely a scanned PDF
-    if not text_found:
-        print(f"PDF appears to be scanned, applying OCR: {file_path}")
-        return extract_text_from_scanned_pdf(file_path)
+    if scanned_pages:
+        print(f"Applied OCR to {scanned_pages} of {len(page_texts)} pages: {file_path}")
     
     return text
 
-# Function to extract text from scanned PDFs using OCR
-def extract_text_from_scanned_pdf(file_path):
-    # Convert PDF to images
-    images = convert_from_path(file_path)
+# Main function to extract text based on file extension
+def extract_text(file_path, use_cache=True):
+    """
+    Extract text from a supported document, checking the extraction cache first
     
-    # Apply OCR to each image
-    text = []
-    for i, image in enumerate(images):
-        text.append(pytesseract.image_to_string(image))
+    Parameters:
+    file_path (str or Path): Path to the document
+    use_cache (bool): Read from and write to the content-addressed extraction cache
     
-    return "\n".join(text)
-
-# Main function to extract text based on file extension
-def extract_text(file_path):
+    Returns:
+    str: Extracted text, or None if the file is unsupported or extraction failed
+    """
     file_path = Path(file_path)
     extension = file_path.suffix.lower()
     
+    if extension not in SUPPORTED_EXTENSIONS:
+        print(f"Unsupported file type: {extension}")
+        return None
+    
+    cache = None
+    if use_cache:
+        try:
+            cache = get_extraction_cache()
+            cache_key = cache.make_key(file_path, f"{EXTRACTOR_VERSION}:ocr_dpi={OCR_DPI}")
+            cached_text = cache.get(cache_key)
+            if cached_text is not None:
+                return cached_text
+        except Exception as e:
+            print(f"Extraction cache unavailable for {file_path}: {e}")
+            cache = None
+    
     try:
         if extension == '.pdf':
-            return extract_text_from_pdf(file_path)
+            text = extract_text_from_pdf(file_path)
         elif extension == '.docx':
-            return extract_text_from_docx(file_path)
+            text = extract_text_from_docx(file_path)
         elif extension == '.pptx':
-            return extract_text_from_pptx(file_path)
-        elif extension == '.odp':
-            return extract_text_from_odp(file_path)
+            text = extract_text_from_pptx(file_path)
         else:
-            print(f"Unsupported file type: {extension}")
-            return None
+            text = extract_text_from_odp(file_path)
     except Exception as e:
         print(f"Error extracting text from {file_path}: {e}")
         return None
+    
+    if cache is not None and text:
+        cache.put(cache_key, text)
+    
+    return text
 
 
 # Function to process a file: extract text and split into chunks
-def process_file(file_path, text_splitter):
+def process_file(file_path, text_splitter, root=None):
     """
     Process a single file: extract text and split into chunks
     
     Parameters:
     file_path (str or Path): Path to the file to process
     text_splitter: Initialized text splitter object
+    root (str or Path): Corpus root the document metadata is inferred relative to
+                        (see infer_document_metadata); defaults to the file's directory
     
     Returns:
     list: List of document dictionaries with text and metadata
@@ -123,6 +217,8 @@ def process_file(file_path, text_splitter):
         "created_at": datetime.datetime.fromtimestamp(os.path.getctime(file_path)).isoformat(),
         "modified_at": datetime.datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat(),
     }
+    # Tenant, jurisdiction and document type, used for namespaces and retrieval filters
+    metadata.update(infer_document_metadata(file_path, root))
     
     # Create document objects
     documents = []
@@ -131,45 +227,220 @@ def process_file(file_path, text_splitter):
         chunk_metadata = metadata.copy()
         chunk_metadata["chunk_id"] = i
         chunk_metadata["chunk_text"] = chunk[:100] + "..."  # Preview of the chunk
+        chunk_metadata["source_files"] = [str(file_path)]
         
         documents.append({
-            "id": f"{file_path.stem}_chunk_{i}",
+            "id": chunk_content_id(chunk),  # Content-addressed, so duplicates share an ID
             "text": chunk,  # This is now the raw text, not vectors
             "metadata": chunk_metadata
         })
     
     return documents
 
-# Main function to process all supported documents in a directory
-def process_directory(directory_path, text_splitter):
+# Worker entry point for parallel ingestion: isolates per-file errors
+def _process_file_safe(file_path, text_splitter, root=None):
+    print(f"Processing: {file_path}")
+    try:
+        return process_file(file_path, text_splitter, root)
+    except Exception as e:
+        print(f"Error processing {file_path}: {e}")
+        return []
+
+# Function to list all supported documents in a directory
+def find_supported_files(directory_path):
     """
-    Process all supported documents in a directory
+    List all supported documents under a directory
     
     Parameters:
     directory_path (str or Path): Path to directory containing documents
-    text_splitter: Initialized text splitter object
     
     Returns:
-    list: Combined list of document objects from all processed files
+    list: Sorted list of file paths, so that chunk order does not depend on the filesystem
     """
-    # Supported extensions
-    supported_extensions = ['.pdf', '.docx', '.pptx', '.odp']
-    
-    # Get all files
     directory = Path(directory_path)
-    all_files = [p for p in directory.glob('**/*') if p.is_file() and p.suffix.lower() in supported_extensions]
+    return sorted(p for p in directory.glob('**/*') if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS)
+
+# Function to filter a file list down to new or changed files
+def _plan_incremental(all_files, text_splitter, manifest, root=None):
+    """
+    Drop files that are unchanged since the last ingestion and forget removed files
+    
+    Returns:
+    tuple: (files to process, {file_path: content hash}, splitter settings)
+    """
+    splitter_settings = get_splitter_settings(text_splitter)
+    removed = manifest.remove_missing(all_files)
+    file_hashes = {file_path: hash_file(file_path) for file_path in all_files}
+    # Files moved to another namespace (e.g. a new metadata.json) are re-ingested there
+    namespaces = {file_path: build_namespace(infer_document_metadata(file_path, root)) for file_path in all_files}
+    files = [p for p in all_files if manifest.needs_processing(p, file_hashes[p], splitter_settings, namespaces[p])]
+    print(f"{len(files)} new or changed documents, {len(removed)} removed since last ingestion")
+    return files, file_hashes, splitter_settings
+
+# Function to create deduplicators that know the chunks already stored
+def _seed_deduplicators(manifest, files):
+    """
+    Create per-namespace deduplicators seeded with the chunks of files this run leaves untouched
+    
+    A chunk shared by a changed file and unchanged ones is then uploaded again
+    with every source file, instead of only the changed file.
+    
+    Parameters:
+    manifest (IngestionManifest): Manifest of the previous runs
+    files (list): Paths of the files about to be processed
+    
+    Returns:
+    dict: Namespace -> ChunkDeduplicator
+    """
+    deduplicators = {}
+    for namespace, sources in manifest.get_chunk_sources(exclude=files).items():
+        deduplicator = deduplicators[namespace] = ChunkDeduplicator()
+        for chunk_id, chunk_sources in sources.items():
+            deduplicator.seed(chunk_id, chunk_sources)
+    return deduplicators
+
+# Function to drop released files from the source lists of chunks other files still produce
+def _patch_released_sources(store, manifest):
+    released = manifest.get_released_sources_by_namespace()
+    for namespace, sources in released.items():
+        for chunk_id, chunk_sources in sources.items():
+            store.update_metadata(chunk_id, {"source_files": chunk_sources}, namespace=namespace)
+    return sum(len(sources) for sources in released.values())
+
+# Function to get the namespace a file's chunks are stored in
+def _file_namespace(file_documents):
+    # Every chunk of a file carries the same document metadata
+    return build_namespace(file_documents[0]["metadata"]) if file_documents else ""
+
+# Function to drop duplicate chunks of a file
+def _deduplicate_file_documents(deduplicators, file_documents):
+    """
+    Filter a file's chunks through the deduplicator of their namespace
+    
+    Chunks are only deduplicated against chunks in the same namespace, so
+    each tenant keeps its own copy of shared content.
+    
+    Parameters:
+    deduplicators (dict): Namespace -> ChunkDeduplicator, filled on demand; None disables deduplication
+    file_documents (list): Chunks of one file
     
+    Returns:
+    tuple: (chunks to upload, canonical chunk IDs referenced by the file)
+    """
+    if deduplicators is None:
+        return file_documents, [doc["id"] for doc in file_documents]
+    
+    namespace = _file_namespace(file_documents)
+    deduplicator = deduplicators.get(namespace)
+    if deduplicator is None:
+        deduplicator = deduplicators[namespace] = ChunkDeduplicator()
+    kept = []
+    chunk_ids = []
+    for doc in file_documents:
+        canonical_id, is_new = deduplicator.add(doc)
+        chunk_ids.append(canonical_id)
+        if is_new:
+            kept.append(doc)
+    return kept, chunk_ids
+
+# Function to report deduplication results per namespace
+def _print_deduplication_summary(deduplicators):
+    for namespace, deduplicator in sorted(deduplicators.items()):
+        label = f" [{namespace}]" if namespace else ""
+        print(f"Deduplication{label}: {deduplicator.summary()}")
+
+# Generator that processes files and yields their chunks as each file completes
+def iter_processed_files(files, text_splitter, num_workers=None, root=None):
+    """
+    Process files and yield (file_path, documents) in input order
+    
+    With several workers only a bounded window of files is in flight at once, so
+    memory stays constant however many files there are.
+    
+    Parameters:
+    files (list): Paths of the files to process
+    text_splitter: Initialized text splitter object (must be picklable when num_workers > 1)
+    num_workers (int): Number of worker processes; defaults to INGEST_WORKERS,
+                       0 uses every available core, 1 processes files sequentially
+    root (str or Path): Corpus root passed to process_file
+    
+    Yields:
+    tuple: (file_path, list of document dictionaries)
+    """
+    if num_workers is None:
+        num_workers = INGEST_WORKERS
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(files)))
+    
+    if num_workers == 1:
+        for file_path in files:
+            yield file_path, _process_file_safe(file_path, text_splitter, root)
+        return
+    
+    print(f"Processing files with {num_workers} worker processes")
+    max_in_flight = num_workers * 2
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = deque()
+        files_iter = iter(files)
+        for file_path in files_iter:
+            in_flight.append((file_path, executor.submit(_process_file_safe, file_path, text_splitter, root)))
+            if len(in_flight) >= max_in_flight:
+                break
+        
+        # Yield in submission order, topping the window up as each file is consumed
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            next_file = next(files_iter, None)
+            if next_file is not None:
+                in_flight.append((next_file, executor.submit(_process_file_safe, next_file, text_splitter, root)))
+            yield file_path, future.result()
+
+# Main function to process all supported documents in a directory
+def process_directory(directory_path, text_splitter, num_workers=None, manifest=None, deduplicate=True, lexical_index=None):
+    """
+    Process all supported documents in a directory
+    
+    Parameters:
+    directory_path (str or Path): Path to directory containing documents
+    text_splitter: Initialized text splitter object (must be picklable when num_workers > 1)
+    num_workers (int): Number of worker processes; defaults to INGEST_WORKERS,
+                       0 uses every available core, 1 processes files sequentially
+    manifest (IngestionManifest): Optional manifest; when given only new or changed
+                                  files are processed and the manifest is updated
+    deduplicate (bool): Drop exact and near-duplicate chunks, keeping one copy whose
+                        metadata lists every source file
+    lexical_index (BM25Index): Optional BM25 index that the kept chunks are added to
+    
+    Returns:
+    list: Combined list of document objects from all processed files, in sorted file order
+    """
+    all_files = find_supported_files(directory_path)
     print(f"Found {len(all_files)} supported documents to process")
     
+    if manifest is not None:
+        all_files, file_hashes, splitter_settings = _plan_incremental(all_files, text_splitter, manifest, directory_path)
+    
+    deduplicators = None
+    if deduplicate:
+        deduplicators = {} if manifest is None else _seed_deduplicators(manifest, all_files)
     all_documents = []
     
     # Process each file
-    for file_path in tqdm(all_files, desc="Processing files"):
-        print(f"Processing: {file_path}")
-        file_documents = process_file(file_path, text_splitter)
-        all_documents.extend(file_documents)
-        print(f"Created {len(file_documents)} chunks for {file_path}")
+    results = iter_processed_files(all_files, text_splitter, num_workers, root=directory_path)
+    for file_path, file_documents in tqdm(results, desc="Processing files", total=len(all_files)):
+        kept_documents, chunk_ids = _deduplicate_file_documents(deduplicators, file_documents)
+        all_documents.extend(kept_documents)
+        if lexical_index is not None:
+            lexical_index.add([doc["id"] for doc in kept_documents], [doc["text"] for doc in kept_documents])
+        print(f"Created {len(file_documents)} chunks for {file_path} ({len(kept_documents)} unique)")
+        
+        # Files that produced no chunks are left out so they are retried next run
+        if manifest is not None and file_documents:
+            manifest.update_file(file_path, file_hashes[file_path], chunk_ids, splitter_settings, _file_namespace(file_documents))
     
+    if deduplicators is not None:
+        _print_deduplication_summary(deduplicators)
     print(f"Total document chunks created: {len(all_documents)}")
     return all_documents
 
@@ -185,11 +456,8 @@ def upload_to_pinecone_old(documents, index_name, api_key):
     """
 
     
-    # Initialize Pinecone
-    pc = Pinecone(api_key=api_key)
-    
-    # Get the index
-    index = pc.Index(index_name)
+    # Get the configured vector store
+    store = get_vector_store(index_name, api_key)
     
     # Calculate number of batches
     batch_size = 64 # Pinecone appears to have limit of 96
@@ -222,66 +490,254 @@ def upload_to_pinecone_old(documents, index_name, api_key):
        
         if i == 0:  # Print sample of first batch only
             print("Sample record format:", upsert_batch[0])
-        # Upsert to Pinecone
-        index.upsert_records("", upsert_batch)
+        # Upsert to the vector store
+        store.upsert(upsert_batch)
+    
+    store.flush()
+    print(f"Successfully uploaded {len(documents)} document chunks to {store.backend} index '{index_name}'")
+
+
+# Function to format a document chunk as a Pinecone text record
+def format_pinecone_record(doc):
+    """
+    Format a document chunk for text-based upsert with metadata as a single string
+    
+    The tenant, jurisdiction and document type are written as top-level fields
+    so Pinecone can filter on them.
+    
+    Parameters:
+    doc (dict): Document object with id, text and metadata
     
-    print(f"Successfully uploaded {len(documents)} document chunks to Pinecone index '{index_name}'")
+    Returns:
+    dict: Record ready for index.upsert_records
+    """
+    # Create a simplified metadata dictionary
+    metadata_dict = {
+        "filename": doc["metadata"]["filename"],
+        "file_type": doc["metadata"]["file_type"],
+        "chunk_id": str(doc["metadata"]["chunk_id"]),
+        "preview": doc["metadata"]["chunk_text"]
+    }
+    
+    # Create record with metadata as a serialized JSON string
+    return {
+        "id": doc["id"],
+        "text": doc["text"],  # The raw text
+        "metadata": json.dumps(metadata_dict),
+        # Every file this (deduplicated) chunk appears in
+        "source_files": list(doc["metadata"].get("source_files", [doc["metadata"]["file_path"]])),
+        **{field: doc["metadata"].get(field) or (DEFAULT_TENANT if field == "tenant" else UNKNOWN) for field in FILTER_FIELDS}
+    }
 
 
 # Function to upload embeddings to Pinecone
-def upload_to_pinecone(documents, index_name, api_key):
+def upload_to_pinecone(documents, index_name, api_key, max_in_flight=None, checkpoint_path=None):
     """
     Upload documents to Pinecone using text-based upsert
     
+    Each record is stored in the namespace given by its metadata (see
+    build_namespace). Batches are sent concurrently and transient errors are retried with backoff.
+    With a checkpoint file, a failed upload can be re-run and will skip the
+    batches that already completed; the checkpoint is removed on success.
+    
     Parameters:
     documents (list): List of document objects with text and metadata
     index_name (str): Name of Pinecone index
     api_key (str): Pinecone API key
+    max_in_flight (int): Concurrent upsert requests; defaults to UPSERT_MAX_IN_FLIGHT
+    checkpoint_path (str or Path): Optional path of a resumable upload checkpoint
     """
-    #from pinecone import Pinecone
-    import json
+    # Get the configured vector store
+    store = get_vector_store(index_name, api_key)
     
-    # Initialize Pinecone
-    pc = Pinecone(api_key=api_key)
+    if documents:  # Print sample of first record only
+        print("Sample record format:", format_pinecone_record(documents[0]))
     
-    # Get the index
-    index = pc.Index(index_name)
-    
-    # Calculate number of batches
-    batch_size = 64  # Pinecone appears to have limit of 96
-    num_batches = (len(documents) - 1) // batch_size + 1
+    checkpoint = UpsertCheckpoint(checkpoint_path) if checkpoint_path else None
+    records = (format_pinecone_record(doc) for doc in documents)
     
     # Upsert documents (Pinecone will handle the embedding generation)
-    for i in tqdm(range(0, len(documents), batch_size), desc="Uploading to Pinecone", total=num_batches):
-        batch = documents[i:i+batch_size]
-        
-        # Format for text-based upsert with metadata as a single string
-        upsert_batch = []
-        for doc in batch:
-            # Create a simplified metadata dictionary
-            metadata_dict = {
-                "filename": doc["metadata"]["filename"],
-                "file_type": doc["metadata"]["file_type"],
-                "chunk_id": str(doc["metadata"]["chunk_id"]),
-                "preview": doc["metadata"]["chunk_text"]
-            }
-            
-            # Convert metadata to a JSON string with triple quotes
-            metadata_str = json.dumps(metadata_dict)
-            
-            # Create record with metadata as a single string
-            record = {
-                "id": doc["id"],
-                "text": doc["text"],  # The raw text
-                "metadata": metadata_str  # Metadata as a serialized JSON string
-            }
-            
-            upsert_batch.append(record)
-        
-        if i == 0:  # Print sample of first batch only
-            print("Sample record format:", upsert_batch[0])
+    with tqdm(total=len(documents), desc="Uploading to Pinecone") as progress:
+        upsert_batches(
+            store,
+            iter_record_batches(records, UPSERT_BATCH_SIZE),
+            namespace=None,
+            max_in_flight=max_in_flight,
+            checkpoint=checkpoint,
+            progress=progress.update,
+        )
+    
+    store.flush()
+    if checkpoint is not None:
+        checkpoint.clear()
+    
+    print(f"Successfully uploaded {len(documents)} document chunks to {store.backend} index '{index_name}'")
+
+
+# Function to stream a directory into Pinecone as chunks are produced
+def stream_directory_to_pinecone(directory_path, text_splitter, index_name, api_key, batch_size=UPSERT_BATCH_SIZE, num_workers=None, manifest_path=None, max_in_flight=None, checkpoint_path=None, deduplicate=True):
+    """
+    Extract, chunk and upload a directory as a streaming pipeline
+    
+    Chunks flow from process_file into upsert batches as each file completes. The
+    upsert engine pulls batches lazily and keeps a bounded number of requests in
+    flight, so the network upload overlaps with extraction and memory stays
+    constant regardless of corpus size.
+    
+    Parameters:
+    directory_path (str or Path): Path to directory containing documents
+    text_splitter: Initialized text splitter object
+    index_name (str): Name of Pinecone index
+    api_key (str): Pinecone API key
+    batch_size (int): Records per upsert request
+    num_workers (int): Number of worker processes used for extraction
+    manifest_path (str or Path): Optional ingestion manifest for incremental runs
+    max_in_flight (int): Concurrent upsert requests; defaults to UPSERT_MAX_IN_FLIGHT
+    checkpoint_path (str or Path): Optional path of a resumable upload checkpoint
+    deduplicate (bool): Drop exact and near-duplicate chunks; source lists of chunks
+                        seen again after upload are patched at the end of the run
+    
+    Returns:
+    dict: Number of chunks uploaded and deleted
+    """
+    store = get_vector_store(index_name, api_key)
+    lexical_index = get_lexical_index(index_name)
+    
+    manifest = IngestionManifest(manifest_path) if manifest_path else None
+    checkpoint = UpsertCheckpoint(checkpoint_path) if checkpoint_path else None
+    
+    all_files = find_supported_files(directory_path)
+    print(f"Found {len(all_files)} supported documents to process")
+    if manifest is not None:
+        all_files, file_hashes, splitter_settings = _plan_incremental(all_files, text_splitter, manifest, directory_path)
+    
+    deduplicators = None
+    if deduplicate:
+        deduplicators = {} if manifest is None else _seed_deduplicators(manifest, all_files)
+    
+    def _records():
+        results = iter_processed_files(all_files, text_splitter, num_workers, root=directory_path)
+        for file_path, file_documents in tqdm(results, desc="Processing files", total=len(all_files)):
+            kept_documents, chunk_ids = _deduplicate_file_documents(deduplicators, file_documents)
+            lexical_index.add([doc["id"] for doc in kept_documents], [doc["text"] for doc in kept_documents])
+            for doc in kept_documents:
+                yield format_pinecone_record(doc)
+            print(f"Created {len(file_documents)} chunks for {file_path} ({len(kept_documents)} unique)")
             
-        # Upsert to Pinecone
-        index.upsert_records("", upsert_batch)
+            if manifest is not None and file_documents:
+                manifest.update_file(file_path, file_hashes[file_path], chunk_ids, splitter_settings, _file_namespace(file_documents))
+    
+    # Records are routed to the namespace given by their metadata
+    uploaded = upsert_batches(
+        store,
+        iter_record_batches(_records(), batch_size),
+        namespace=None,
+        max_in_flight=max_in_flight,
+        checkpoint=checkpoint,
+    )
+    
+    # Chunks found again after their record was formatted need their source list patched
+    if deduplicators is not None:
+        for namespace, deduplicator in deduplicators.items():
+            for chunk_id in sorted(deduplicator.updated_ids):
+                store.update_metadata(chunk_id, {"source_files": deduplicator.sources[chunk_id]}, namespace=namespace)
+        _print_deduplication_summary(deduplicators)
+        if manifest is not None:
+            _patch_released_sources(store, manifest)
+    
+    print(f"Successfully uploaded {uploaded} document chunks to {store.backend} index '{index_name}'")
+    
+    deleted = 0
+    if manifest is not None:
+        for namespace, stale_ids in manifest.get_stale_ids_by_namespace().items():
+            store.delete(stale_ids, namespace=namespace)
+            deleted += len(stale_ids)
+        lexical_index.delete(manifest.get_stale_ids())
+    store.flush()
+    save_lexical_index(index_name)
+    if checkpoint is not None:
+        checkpoint.clear()
+    if manifest is not None:
+        manifest.save()
+    
+    return {"uploaded": uploaded, "deleted": deleted}
+
+
+# Function to delete chunks from the vector store by ID
+def delete_from_pinecone(ids, index_name, api_key, namespace=""):
+    """
+    Delete document chunks from Pinecone (or the configured vector store)
+    
+    Parameters:
+    ids (list): IDs of the chunks to delete
+    index_name (str): Name of Pinecone index
+    api_key (str): Pinecone API key
+    namespace (str): Namespace holding the chunks
+    """
+    if not ids:
+        return
+    
+    store = get_vector_store(index_name, api_key)
+    store.delete(ids, namespace=namespace)
+    store.flush()
     
-    print(f"Successfully uploaded {len(documents)} document chunks to Pinecone index '{index_name}'")
\ No newline at end of file
+    print(f"Deleted {len(ids)} stale document chunks from {store.backend} index '{index_name}'")
+
+
+# Function to incrementally sync a directory into Pinecone
+def ingest_directory(directory_path, text_splitter, index_name, api_key, manifest_path="ingestion_manifest.json", num_workers=None):
+    """
+    Incrementally ingest a directory: process only new or changed files, upload
+    their chunks and delete vectors for removed files or chunks that no longer exist
+    
+    The manifest is only saved after the upload and deletes succeed, so a failed
+    run is simply repeated on the next invocation.
+    
+    Parameters:
+    directory_path (str or Path): Path to directory containing documents
+    text_splitter: Initialized text splitter object
+    index_name (str): Name of Pinecone index
+    api_key (str): Pinecone API key
+    manifest_path (str or Path): Path of the ingestion manifest file
+    num_workers (int): Number of worker processes used for extraction
+    
+    Returns:
+    dict: Number of chunks uploaded and deleted
+    """
+    manifest = IngestionManifest(manifest_path)
+    lexical_index = get_lexical_index(index_name)
+    
+    documents = process_directory(directory_path, text_splitter, num_workers=num_workers, manifest=manifest, lexical_index=lexical_index)
+    if documents:
+        upload_to_pinecone(documents, index_name, api_key)
+    # Chunks a changed or removed file no longer produces must stop listing it
+    store = get_vector_store(index_name, api_key)
+    if _patch_released_sources(store, manifest):
+        store.flush()
+    
+    deleted = 0
+    for namespace, stale_ids in manifest.get_stale_ids_by_namespace().items():
+        delete_from_pinecone(stale_ids, index_name, api_key, namespace=namespace)
+        deleted += len(stale_ids)
+    lexical_index.delete(manifest.get_stale_ids())
+    save_lexical_index(index_name)
+    
+    manifest.save()
+    return {"uploaded": len(documents), "deleted": deleted}
+
+
+# Function to upload documents to the local in-process index
+def upload_to_local_index(documents, index_name):
+    """
+    Embed documents with the local embedding function, add them to the local
+    index and persist it under LOCAL_INDEX_DIR
+    
+    Parameters:
+    documents (list): List of document objects with text and metadata
+    index_name (str): Name of the local index
+    """
+    store = get_vector_store(index_name, backend="local")
+    for i in tqdm(range(0, len(documents), UPSERT_BATCH_SIZE), desc="Indexing locally"):
+        store.upsert_records(None, [format_pinecone_record(doc) for doc in documents[i:i+UPSERT_BATCH_SIZE]])
+    store.flush()
+    print(f"Successfully indexed {len(documents)} document chunks in local index '{index_name}'")
@@ -0,0 +1,168 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+
+from .ingestion_manifest import hash_file
+
+# Cache location and size limit for extracted document text
+EXTRACTION_CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR", ".extraction_cache")
+EXTRACTION_CACHE_MAX_MB = int(os.environ.get("EXTRACTION_CACHE_MAX_MB", "2048"))
+
+
+class ExtractionCache:
+    """
+    Content-addressed on-disk cache of extracted document text
+
+    Entries are keyed by the file's content hash and the extractor version, so a
+    renamed or moved file still hits and a change to the extraction code misses.
+    The cache is bounded by total size and evicts least recently used entries;
+    an entry's modification time is refreshed on every hit. Writes are atomic, so
+    several ingestion worker processes can share one cache directory.
+    """
+
+    def __init__(self, cache_dir=EXTRACTION_CACHE_DIR, max_bytes=EXTRACTION_CACHE_MAX_MB * 1024 * 1024):
+        """
+        Initialize the cache
+
+        Parameters:
+        cache_dir (str or Path): Directory holding the cached text files
+        max_bytes (int): Maximum total size of the cache before eviction
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True, parents=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # Computed lazily on first write
+
+    def make_key(self, file_path, extractor_version):
+        """
+        Build the cache key for a file
+
+        Parameters:
+        file_path (str or Path): Path to the source document
+        extractor_version (str): Version string of the extraction code and settings
+
+        Returns:
+        str: Cache key
+        """
+        return hashlib.sha256(f"{hash_file(file_path)}:{extractor_version}".encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.txt"
+
+    def get(self, key):
+        """
+        Look up cached text
+
+        Parameters:
+        key (str): Cache key from make_key
+
+        Returns:
+        str: Cached text, or None on a miss
+        """
+        path = self._entry_path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return text
+
+    def put(self, key, text):
+        """
+        Store extracted text and evict old entries if the cache is over its limit
+
+        Parameters:
+        key (str): Cache key from make_key
+        text (str): Extracted text
+        """
+        path = self._entry_path(key)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            # The cache directory may have been removed since the cache was created
+            path.parent.mkdir(exist_ok=True, parents=True)
+            tmp_path.write_text(text, encoding="utf-8")
+            # A rewritten entry replaces the old file, whose size must not be counted twice
+            try:
+                old_size = path.stat().st_size
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing extraction cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            else:
+                self._size += path.stat().st_size - old_size
+            if self._size > self.max_bytes:
+                self._size = self.evict()
+
+    def size(self):
+        """
+        Get the total size of the cache in bytes
+        """
+        return sum(p.stat().st_size for p in self.cache_dir.glob("*/*.txt"))
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache is under its limit
+
+        Returns:
+        int: Size of the cache in bytes after eviction
+        """
+        entries = []
+        for p in self.cache_dir.glob("*/*.txt"):
+            try:
+                stat = p.stat()
+            except FileNotFoundError:
+                continue  # Removed by another process
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the limit so every write does not trigger a scan
+        target = self.max_bytes * 0.9
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def clear(self):
+        """
+        Remove every cached entry
+        """
+        for p in self.cache_dir.glob("*/*.txt"):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._size = 0
+
+
+_default_cache = None
+
+# Function to get the process-wide extraction cache
+def get_extraction_cache():
+    """
+    Get the process-wide extraction cache, created on first use
+
+    Returns:
+    ExtractionCache: Cache configured from EXTRACTION_CACHE_DIR and EXTRACTION_CACHE_MAX_MB
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
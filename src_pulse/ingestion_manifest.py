@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import datetime
+from pathlib import Path
+
+
+# Function to compute the content hash of a file
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    Compute the SHA-256 hash of a file's contents
+
+    Parameters:
+    file_path (str or Path): Path to the file
+    block_size (int): Number of bytes read at a time
+
+    Returns:
+    str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Function to describe the settings of a text splitter
+def get_splitter_settings(text_splitter):
+    """
+    Get the settings of a text splitter that affect chunk output
+
+    Parameters:
+    text_splitter: Initialized text splitter object
+
+    Returns:
+    dict: Splitter class name, chunk size and chunk overlap
+    """
+    return {
+        "splitter": type(text_splitter).__name__,
+        "chunk_size": getattr(text_splitter, "_chunk_size", None),
+        "chunk_overlap": getattr(text_splitter, "_chunk_overlap", None),
+    }
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has been ingested, used to make re-runs incremental
+
+    For every ingested file the manifest stores its content hash, the chunk IDs it
+    produced, the namespace they were stored in and the splitter settings used.
+    Files whose hash, namespace and settings are unchanged can be skipped, and
+    chunk IDs that are no longer produced by any file in a namespace are collected
+    so their vectors can be deleted from it.
+    """
+
+    def __init__(self, manifest_path="ingestion_manifest.json"):
+        """
+        Initialize the manifest, loading it from disk if it exists
+
+        Parameters:
+        manifest_path (str or Path): Path of the JSON manifest file
+        """
+        self.manifest_path = Path(manifest_path)
+        self.files = {}
+        # (namespace, chunk ID) pairs that were dropped from a file record since the last save
+        self._released_ids = set()
+
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    self.files = json.load(f).get("files", {})
+            except Exception as e:
+                print(f"Error loading ingestion manifest, starting fresh: {e}")
+                self.files = {}
+
+    def needs_processing(self, file_path, file_hash, splitter_settings, namespace=None):
+        """
+        Check whether a file is new or has changed since it was last ingested
+
+        Parameters:
+        file_path (str or Path): Path to the file
+        file_hash (str): Current content hash of the file
+        splitter_settings (dict): Current splitter settings
+        namespace (str): Namespace the file's chunks now belong in; None skips the check
+
+        Returns:
+        bool: True if the file must be (re)processed
+        """
+        record = self.files.get(str(file_path))
+        if record is None:
+            return True
+        if namespace is not None and record.get("namespace", "") != namespace:
+            return True
+        return record["hash"] != file_hash or record["splitter"] != splitter_settings
+
+    def update_file(self, file_path, file_hash, chunk_ids, splitter_settings, namespace=""):
+        """
+        Record the result of ingesting a file
+
+        Parameters:
+        file_path (str or Path): Path to the file
+        file_hash (str): Content hash of the file
+        chunk_ids (list): IDs of the chunks produced for the file
+        splitter_settings (dict): Splitter settings used
+        namespace (str): Namespace the chunks were stored in
+        """
+        key = str(file_path)
+        old_record = self.files.get(key)
+        if old_record:
+            old_namespace = old_record.get("namespace", "")
+            released = set(old_record["chunk_ids"])
+            if old_namespace == namespace:
+                released -= set(chunk_ids)
+            self._released_ids.update((old_namespace, chunk_id) for chunk_id in released)
+
+        self.files[key] = {
+            "hash": file_hash,
+            "chunk_ids": list(chunk_ids),
+            "namespace": namespace,
+            "splitter": splitter_settings,
+            "ingested_at": datetime.datetime.now().isoformat(),
+        }
+
+    def remove_missing(self, current_files):
+        """
+        Drop records for files that no longer exist in the corpus
+
+        Parameters:
+        current_files (list): Paths of the files currently in the corpus
+
+        Returns:
+        list: Paths of the removed files
+        """
+        current = {str(p) for p in current_files}
+        removed = [key for key in self.files if key not in current]
+        for key in removed:
+            record = self.files.pop(key)
+            self._released_ids.update((record.get("namespace", ""), chunk_id) for chunk_id in record["chunk_ids"])
+        return removed
+
+    def get_stale_ids(self):
+        """
+        Get chunk IDs that are no longer produced by any file
+
+        An ID is stale when it was released by a changed or removed file and is
+        not produced by any other file still in the manifest, in any namespace.
+        Use this for stores that are not namespaced, such as the lexical index.
+
+        Returns:
+        list: Sorted list of stale chunk IDs
+        """
+        referenced = set()
+        for record in self.files.values():
+            referenced.update(record["chunk_ids"])
+        return sorted({chunk_id for _, chunk_id in self._released_ids} - referenced)
+
+    def get_stale_ids_by_namespace(self):
+        """
+        Get chunk IDs that should be deleted from each namespace of the index
+
+        An ID is stale in a namespace when it was released from it and is not
+        produced by any other file stored in that namespace.
+
+        Returns:
+        dict: Namespace -> sorted list of stale chunk IDs
+        """
+        referenced = set()
+        for record in self.files.values():
+            namespace = record.get("namespace", "")
+            referenced.update((namespace, chunk_id) for chunk_id in record["chunk_ids"])
+        stale = {}
+        for namespace, chunk_id in sorted(self._released_ids - referenced):
+            stale.setdefault(namespace, []).append(chunk_id)
+        return stale
+
+    def get_chunk_sources(self, exclude=()):
+        """
+        Get the files that produce each chunk, per namespace
+
+        Parameters:
+        exclude (iterable): File paths to leave out, e.g. files about to be re-processed
+
+        Returns:
+        dict: Namespace -> {chunk ID: list of file paths}
+        """
+        exclude = {str(p) for p in exclude}
+        sources = {}
+        for key, record in self.files.items():
+            if key in exclude:
+                continue
+            namespace_sources = sources.setdefault(record.get("namespace", ""), {})
+            for chunk_id in record["chunk_ids"]:
+                chunk_sources = namespace_sources.setdefault(chunk_id, [])
+                if key not in chunk_sources:
+                    chunk_sources.append(key)
+        return sources
+
+    def get_released_sources_by_namespace(self):
+        """
+        Get chunks released by a changed or removed file that other files in the
+        namespace still produce
+
+        The stored source lists of these chunks still name the released file.
+
+        Returns:
+        dict: Namespace -> {chunk ID: list of the file paths that now produce it}
+        """
+        sources = self.get_chunk_sources()
+        released = {}
+        for namespace, chunk_id in sorted(self._released_ids):
+            chunk_sources = sources.get(namespace, {}).get(chunk_id)
+            if chunk_sources:
+                released.setdefault(namespace, {})[chunk_id] = chunk_sources
+        return released
+
+    def save(self):
+        """
+        Write the manifest to disk atomically and clear the pending stale IDs
+        """
+        self.manifest_path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.manifest_path.with_suffix(self.manifest_path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "files": self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._released_ids = set()
+        print(f"Ingestion manifest saved to {self.manifest_path} ({len(self.files)} files)")
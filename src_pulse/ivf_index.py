@@ -0,0 +1,243 @@
+import os
+import math
+import threading
+import numpy as np
+
+from .local_index import normalize_rows, resolve_index_directory
+
+# Approximate search structure for local retrieval: "none" (exact) or "ivf"
+LOCAL_INDEX_ANN = os.environ.get("LOCAL_INDEX_ANN", "none")
+
+# Search breadth per query type: nprobe is the number of partitions scanned
+# (None scans every partition, which is exact)
+SEARCH_PROFILES = {
+    "faq": {"nprobe": 4},
+    "default": {"nprobe": 12},
+    "report": {"nprobe": 32},
+    "exact": {"nprobe": None},
+}
+
+# File written next to a saved local index
+IVF_FILE_NAME = "ivf.npz"
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest neighbour index over a LocalVectorIndex
+
+    The corpus is partitioned by spherical k-means; each partition keeps the rows
+    closest to its centroid. A search ranks the centroids and scores only the rows
+    of the nprobe best partitions, so cost scales with nprobe / nlist of the corpus
+    instead of all of it. Vectors are not copied: partitions hold row numbers into
+    the underlying index, whose embeddings may be memory-mapped.
+
+    Rows added to the index are assigned to their nearest partition on the next
+    search; deleted rows are skipped. Once the index has grown to rebuild_factor
+    times the size it was trained on, the partitions are retrained.
+    """
+
+    def __init__(self, index, nlist=None, iterations=10, sample_size=65536, rebuild_factor=4, seed=0):
+        """
+        Initialize the index; partitions are built on first use
+
+        Parameters:
+        index (LocalVectorIndex): Index holding the vectors
+        nlist (int): Number of partitions; defaults to 2 * sqrt(rows)
+        iterations (int): k-means iterations
+        sample_size (int): Maximum number of rows used to train the centroids
+        rebuild_factor (int): Growth relative to the training size that triggers a rebuild
+        seed (int): Seed for sampling and centroid initialization
+        """
+        self.index = index
+        self.nlist = nlist
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.rebuild_factor = rebuild_factor
+        self.seed = seed
+        self.centroids = None
+        self.lists = []
+        self.num_indexed = 0
+        self.trained_rows = 0
+        self._lock = threading.Lock()
+
+    def build(self):
+        """
+        Train the centroids and assign every live row of the index to a partition
+        """
+        with self._lock:
+            self._build()
+
+    def _build(self):
+        vectors = self.index.embeddings
+        live = np.flatnonzero(~self.index.deleted)
+        self.centroids, self.lists, self.num_indexed, self.trained_rows = None, [], 0, 0
+        if not len(live):
+            return
+
+        nlist = self.nlist or max(1, int(2 * math.sqrt(len(live))))
+        nlist = min(nlist, len(live))
+        rng = np.random.default_rng(self.seed)
+        sample = live if len(live) <= self.sample_size else np.sort(rng.choice(live, self.sample_size, replace=False))
+        x = np.asarray(vectors[sample], dtype=np.float32)
+
+        # Spherical k-means: assign by cosine similarity, keep centroids unit length
+        centroids = x[rng.choice(len(x), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._assign(x, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, x)
+            filled = np.bincount(assignment, minlength=nlist) > 0
+            centroids[filled] = normalize_rows(sums[filled])
+
+        self.centroids = centroids
+        self.lists = [np.zeros(0, dtype=np.int64) for _ in range(nlist)]
+        self.trained_rows = len(live)
+        self._insert(live)
+        self.num_indexed = vectors.shape[0]
+        print(f"Built IVF index with {nlist} partitions over {len(live)} rows")
+
+    @staticmethod
+    def _assign(x, centroids, batch_size=16384):
+        assignment = np.empty(len(x), dtype=np.int64)
+        for start in range(0, len(x), batch_size):
+            assignment[start:start + batch_size] = (x[start:start + batch_size] @ centroids.T).argmax(axis=1)
+        return assignment
+
+    def _insert(self, rows):
+        if not len(rows):
+            return
+        assignment = self._assign(np.asarray(self.index.embeddings[rows], dtype=np.float32), self.centroids)
+        order = np.argsort(assignment, kind="stable")
+        partitions, starts = np.unique(assignment[order], return_index=True)
+        for partition, group in zip(partitions, np.split(rows[order], starts[1:])):
+            self.lists[partition] = np.concatenate([self.lists[partition], group])
+
+    def _sync(self):
+        # Index rows appended since the last search, rebuilding if the corpus outgrew the centroids
+        with self._lock:
+            num_rows = self.index.embeddings.shape[0]
+            if self.centroids is None or num_rows > self.rebuild_factor * max(1, self.trained_rows):
+                self._build()
+            elif num_rows > self.num_indexed:
+                new_rows = np.arange(self.num_indexed, num_rows)
+                self._insert(new_rows[~self.index.deleted[new_rows]])
+                self.num_indexed = num_rows
+            return self.centroids, self.lists
+
+    def search(self, query_vectors, top_k=5, nprobe=None, profile=None, filters=None):
+        """
+        Approximate cosine top-k for a batch of query vectors
+
+        Parameters:
+        query_vectors (numpy.ndarray): 2-D array of query embeddings
+        top_k (int): Number of results per query
+        nprobe (int): Partitions scanned per query; overrides the profile
+        profile (str): Key of SEARCH_PROFILES; defaults to "default"
+        filters (dict): Optional metadata filters; rows that do not match are skipped
+
+        Returns:
+        list: One list of (row, score) pairs per query, best first
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        if nprobe is None:
+            nprobe = SEARCH_PROFILES[profile or "default"]["nprobe"]
+        centroids, lists = self._sync()
+        if centroids is None:
+            return [[] for _ in range(len(queries))]
+        nprobe = len(lists) if nprobe is None else min(nprobe, len(lists))
+
+        embeddings = self.index.embeddings
+        deleted = self.index.filter_mask(filters) if filters else self.index.deleted
+        probes = np.argpartition(-(queries @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for q, probe in zip(queries, probes):
+            rows = np.sort(np.concatenate([lists[p] for p in probe]))
+            rows = rows[~deleted[rows]]
+            if not len(rows):
+                results.append([])
+                continue
+            scores = np.asarray(embeddings[rows], dtype=np.float32) @ q
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            results.append([(int(rows[i]), float(scores[i])) for i in best])
+        return results
+
+    def query(self, texts, top_k=5, nprobe=None, profile=None, filters=None):
+        """
+        Search with a batch of query texts
+
+        Parameters:
+        texts (list): Query texts
+        top_k (int): Number of results per query
+        nprobe (int): Partitions scanned per query; overrides the profile
+        profile (str): Key of SEARCH_PROFILES
+        filters (dict): Optional metadata filters
+
+        Returns:
+        list: One list of {"id", "score", "text", "metadata"} hits per query
+        """
+        query_vectors = self.index.embed_fn(list(texts))
+        return [
+            [self.index.get_hit(row, score) for row, score in hits]
+            for hits in self.search(query_vectors, top_k, nprobe=nprobe, profile=profile, filters=filters)
+        ]
+
+    def save(self, directory):
+        """
+        Persist the partitions next to an index saved with LocalVectorIndex.save
+
+        LocalVectorIndex.save drops deleted rows, so row numbers are remapped to
+        the compacted order and must be written right after the index itself.
+
+        Parameters:
+        directory (str or Path): Directory the index was saved to
+        """
+        # Stored in the index's current version, so the partitions always match its rows
+        directory = resolve_index_directory(directory)
+        with self._lock:
+            if self.centroids is None:
+                return
+            deleted = self.index.deleted
+            new_row = np.cumsum(~deleted) - 1
+            lists = [new_row[rows[~deleted[rows]]] for rows in self.lists]
+            tmp_path = directory / f"{IVF_FILE_NAME}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    list_rows=np.concatenate(lists),
+                    list_offsets=np.cumsum([0] + [len(rows) for rows in lists]),
+                    num_indexed=int(np.count_nonzero(~deleted[:self.num_indexed])),
+                    trained_rows=self.trained_rows,
+                )
+            os.replace(tmp_path, directory / IVF_FILE_NAME)
+
+    @classmethod
+    def load(cls, directory, index, **kwargs):
+        """
+        Open the partitions saved for an index, or build them if missing or out of date
+
+        Parameters:
+        directory (str or Path): Directory the index was loaded from
+        index (LocalVectorIndex): The loaded index
+        **kwargs: Passed to the constructor
+
+        Returns:
+        IVFIndex: The IVF index
+        """
+        ivf = cls(index, **kwargs)
+        path = resolve_index_directory(directory) / IVF_FILE_NAME
+        if path.exists():
+            data = np.load(path)
+            if int(data["num_indexed"]) == index.embeddings.shape[0]:
+                offsets = data["list_offsets"]
+                rows = data["list_rows"]
+                ivf.centroids = data["centroids"]
+                ivf.lists = [rows[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+                ivf.num_indexed = int(data["num_indexed"])
+                ivf.trained_rows = int(data["trained_rows"])
+                return ivf
+            print(f"IVF index in {directory} does not match the saved index; rebuilding")
+        ivf.build()
+        return ivf
@@ -0,0 +1,298 @@
+import os
+import re
+import math
+import threading
+from pathlib import Path
+from collections import Counter
+import numpy as np
+
+# Directory holding persisted BM25 indexes, one file per index name
+LEXICAL_INDEX_DIR = os.environ.get("LEXICAL_INDEX_DIR", "lexical_indexes")
+
+# Words too common to be worth a posting list
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+# Function to split text into BM25 terms
+def tokenize(text):
+    """
+    Lower-case alphanumeric tokens without stopwords
+
+    Parameters:
+    text (str): Text to tokenize
+
+    Returns:
+    list: Terms in order of occurrence
+    """
+    return [token for token in re.findall(r"[a-z0-9]+", text.lower()) if token not in STOPWORDS]
+
+# Function to merge several rankings
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Merge ranked ID lists with reciprocal rank fusion: score(d) = sum of 1 / (k + rank)
+
+    Parameters:
+    rankings (list): Lists of IDs, each best first
+    k (int): Damping constant; larger values flatten the contribution of top ranks
+
+    Returns:
+    list: (id, fused score) pairs, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class BM25Index:
+    """
+    BM25 lexical index over document chunks with compact array postings
+
+    Postings are stored in CSR form: for term t, doc_ids[offsets[t]:offsets[t+1]]
+    (int32) and term_freqs (uint16) hold the documents containing t, so the index
+    costs about six bytes per distinct term occurrence. Added and deleted chunks
+    are buffered and merged into the arrays before the next search or save.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        """
+        Initialize an empty index
+
+        Parameters:
+        k1 (float): Term frequency saturation
+        b (float): Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.terms = []
+        self.vocab = {}
+        self.ids = []
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.term_freqs = np.zeros(0, dtype=np.uint16)
+        self._length_norms = np.zeros(0, dtype=np.float32)
+        self._pending = {}
+        self._deleted = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._merge()
+            return len(self.ids)
+
+    def add(self, ids, texts):
+        """
+        Add or replace chunks
+
+        Parameters:
+        ids (list): Chunk IDs
+        texts (list): Chunk texts
+        """
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                self._pending[chunk_id] = Counter(tokenize(text))
+
+    def delete(self, ids):
+        """
+        Delete chunks by ID; unknown IDs are ignored
+
+        Parameters:
+        ids (list): Chunk IDs
+        """
+        with self._lock:
+            for chunk_id in ids:
+                self._pending.pop(chunk_id, None)
+                self._deleted.add(chunk_id)
+
+    def _merge(self):
+        # Rebuild the posting arrays with pending additions and deletions applied
+        if not self._pending and not self._deleted:
+            return
+
+        replaced = self._deleted | set(self._pending)
+        keep = np.array([chunk_id not in replaced for chunk_id in self.ids], dtype=bool)
+        new_doc = np.cumsum(keep) - 1
+        ids = [chunk_id for chunk_id, kept in zip(self.ids, keep) if kept]
+
+        # Existing postings as (term, doc, tf) triplets, minus removed documents
+        posting_terms = np.repeat(np.arange(len(self.terms), dtype=np.int64), np.diff(self.offsets))
+        live = keep[self.doc_ids] if len(self.doc_ids) else np.zeros(0, dtype=bool)
+        term_parts = [posting_terms[live]]
+        doc_parts = [new_doc[self.doc_ids[live]]]
+        tf_parts = [self.term_freqs[live]]
+        lengths = [self.doc_lengths[keep]]
+
+        new_terms, new_docs, new_tfs, new_lengths = [], [], [], []
+        for chunk_id, counts in self._pending.items():
+            doc = len(ids)
+            ids.append(chunk_id)
+            for term, tf in counts.items():
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = self.vocab[term] = len(self.terms)
+                    self.terms.append(term)
+                new_terms.append(term_id)
+                new_docs.append(doc)
+                new_tfs.append(min(tf, 65535))
+            new_lengths.append(sum(counts.values()))
+        term_parts.append(np.array(new_terms, dtype=np.int64))
+        doc_parts.append(np.array(new_docs, dtype=np.int64))
+        tf_parts.append(np.array(new_tfs, dtype=np.uint16))
+        lengths.append(np.array(new_lengths, dtype=np.int32))
+
+        posting_terms = np.concatenate(term_parts)
+        doc_ids = np.concatenate(doc_parts)
+        order = np.lexsort((doc_ids, posting_terms))
+        self.doc_ids = doc_ids[order].astype(np.int32)
+        self.term_freqs = np.concatenate(tf_parts)[order]
+        self.offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(posting_terms, minlength=len(self.terms)), out=self.offsets[1:])
+        self.doc_lengths = np.concatenate(lengths).astype(np.int32)
+        self.ids = ids
+        self._pending = {}
+        self._deleted = set()
+        self._update_length_norms()
+
+    def _update_length_norms(self):
+        # Per-document BM25 length normalization, precomputed once per merge
+        average_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 1.0
+        self._length_norms = (self.k1 * (1 - self.b + self.b * self.doc_lengths / (average_length or 1.0))).astype(np.float32)
+
+    def search(self, text, top_k=5):
+        """
+        Rank chunks against a query with BM25
+
+        Parameters:
+        text (str): Query text
+        top_k (int): Number of results
+
+        Returns:
+        list: (chunk ID, score) pairs, best first
+        """
+        with self._lock:
+            self._merge()
+            num_docs = len(self.ids)
+            term_ids = sorted({self.vocab[term] for term in tokenize(text) if term in self.vocab})
+            if not num_docs or not term_ids:
+                return []
+
+            doc_parts, score_parts = [], []
+            for term_id in term_ids:
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                if start == end:
+                    continue
+                docs = self.doc_ids[start:end]
+                tf = self.term_freqs[start:end].astype(np.float32)
+                idf = math.log(1 + (num_docs - (end - start) + 0.5) / ((end - start) + 0.5))
+                doc_parts.append(docs)
+                score_parts.append(idf * (self.k1 + 1) * tf / (tf + self._length_norms[docs]))
+            if not doc_parts:
+                return []
+
+            docs = np.concatenate(doc_parts)
+            weights = np.concatenate(score_parts)
+            if len(docs) > num_docs // 16:
+                # Common terms: a dense accumulator is cheaper than sorting the postings
+                scores = np.bincount(docs, weights=weights, minlength=num_docs)
+                docs = np.flatnonzero(scores)
+                scores = scores[docs]
+            else:
+                docs, inverse = np.unique(docs, return_inverse=True)
+                scores = np.bincount(inverse, weights=weights)
+            k = min(top_k, len(docs))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            return [(self.ids[docs[i]], float(scores[i])) for i in best]
+
+    def save(self, path):
+        """
+        Persist the index as a single .npz file, written atomically
+
+        Parameters:
+        path (str or Path): Target file
+        """
+        path = Path(path)
+        path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with self._lock:
+            self._merge()
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    terms=np.array(self.terms, dtype=str),
+                    ids=np.array(self.ids, dtype=str),
+                    doc_lengths=self.doc_lengths,
+                    offsets=self.offsets,
+                    doc_ids=self.doc_ids,
+                    term_freqs=self.term_freqs,
+                    params=np.array([self.k1, self.b]),
+                )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with save()
+
+        Parameters:
+        path (str or Path): File written by save()
+
+        Returns:
+        BM25Index: The index
+        """
+        data = np.load(path)
+        k1, b = data["params"]
+        index = cls(k1=float(k1), b=float(b))
+        index.terms = data["terms"].tolist()
+        index.vocab = {term: term_id for term_id, term in enumerate(index.terms)}
+        index.ids = data["ids"].tolist()
+        index.doc_lengths = data["doc_lengths"]
+        index.offsets = data["offsets"]
+        index.doc_ids = data["doc_ids"]
+        index.term_freqs = data["term_freqs"]
+        index._update_length_norms()
+        return index
+
+
+_lexical_indexes = {}
+_lexical_indexes_lock = threading.Lock()
+
+# Function to get the path of a named lexical index
+def _lexical_index_path(index_name):
+    return Path(LEXICAL_INDEX_DIR) / f"{index_name}.npz"
+
+# Function to get a named lexical index, loading it from disk on first use
+def get_lexical_index(index_name):
+    """
+    Get the process-wide BM25 index for a name
+
+    The index is loaded from LEXICAL_INDEX_DIR/<index_name>.npz if it exists
+    there, otherwise an empty index is created.
+
+    Parameters:
+    index_name (str): Name of the index
+
+    Returns:
+    BM25Index: The index
+    """
+    with _lexical_indexes_lock:
+        if index_name not in _lexical_indexes:
+            path = _lexical_index_path(index_name)
+            _lexical_indexes[index_name] = BM25Index.load(path) if path.exists() else BM25Index()
+        return _lexical_indexes[index_name]
+
+# Function to persist a named lexical index
+def save_lexical_index(index_name):
+    """
+    Save the process-wide BM25 index for a name under LEXICAL_INDEX_DIR
+
+    Parameters:
+    index_name (str): Name of the index
+    """
+    index = get_lexical_index(index_name)
+    index.save(_lexical_index_path(index_name))
+    print(f"Saved lexical index with {len(index)} chunks for '{index_name}'")
@@ -0,0 +1,630 @@
+import os
+import re
+import json
+import mmap
+import zlib
+import time
+import shutil
+import threading
+from pathlib import Path
+import numpy as np
+
+from .document_metadata import DEFAULT_TENANT, UNKNOWN
+
+# Directory holding persisted local indexes, one sub-directory per index name
+LOCAL_INDEX_DIR = os.environ.get("LOCAL_INDEX_DIR", "local_indexes")
+# Dimension of the default hashing embedder
+LOCAL_EMBEDDING_DIM = int(os.environ.get("LOCAL_EMBEDDING_DIM", "768"))
+# Storage type of saved embeddings: "float32" or "float16" (half the size on disk and in the page cache)
+LOCAL_INDEX_DTYPE = os.environ.get("LOCAL_INDEX_DTYPE", "float32")
+
+# Version of the on-disk format written by LocalVectorIndex.save
+INDEX_FORMAT_VERSION = 1
+# File in an index directory naming the version sub-directory that holds the current files
+CURRENT_VERSION_FILE = "CURRENT"
+# Files written directly into the index directory before versioned saves (ivf.npz is the IVF partitions)
+_UNVERSIONED_FILES = ("header.json", "embeddings.npy", "ids.bin", "ids_offsets.npy", "text.bin", "text_offsets.npy",
+                      "metadata.bin", "metadata_offsets.npy", "ivf.npz")
+
+
+# Function to L2-normalize the rows of a matrix
+def normalize_rows(vectors):
+    """
+    Scale each row to unit length so dot products are cosine similarities
+
+    Parameters:
+    vectors (numpy.ndarray): 2-D array of vectors
+
+    Returns:
+    numpy.ndarray: float32 array of unit-length rows (zero rows are left as zeros)
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class HashingEmbedder:
+    """
+    Local embedding function based on feature hashing of words and word bigrams
+
+    Needs no model download or network access, which makes it suitable for offline
+    use and CI. Any callable mapping a list of texts to a 2-D array can be used in
+    its place, e.g. a sentence-transformers model's encode method.
+    """
+
+    _token_pattern = re.compile(r"[a-z0-9]+")
+
+    def __init__(self, dim=LOCAL_EMBEDDING_DIM):
+        """
+        Initialize the embedder
+
+        Parameters:
+        dim (int): Embedding dimension
+        """
+        self.dim = dim
+
+    def __call__(self, texts):
+        """
+        Embed a list of texts
+
+        Parameters:
+        texts (list): Texts to embed
+
+        Returns:
+        numpy.ndarray: float32 array of shape (len(texts), dim) with unit-length rows
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = self._token_pattern.findall(text.lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+            # The top bit picks the sign so collisions tend to cancel rather than accumulate
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        # Sublinear term frequency
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        return normalize_rows(vectors)
+
+
+# Function to compute a top-k over a corpus scored block by block
+def blocked_top_k(score_block, queries, num_rows, deleted, top_k, block_size=65536, query_batch_size=256):
+    """
+    Keep a running top-k while scoring a corpus in blocks of rows
+
+    Parameters:
+    score_block (callable): Maps (query batch, start row, end row) to a (queries, rows) score array
+    queries (numpy.ndarray): 2-D array of query vectors
+    num_rows (int): Number of corpus rows
+    deleted (numpy.ndarray): Boolean mask of rows to skip
+    top_k (int): Number of results per query
+    block_size (int): Corpus rows scored per call
+    query_batch_size (int): Queries scored together
+
+    Returns:
+    list: One list of (row, score) pairs per query, best first
+    """
+    k = min(top_k, num_rows)
+    if k == 0:
+        return [[] for _ in range(len(queries))]
+
+    results = []
+    for q_start in range(0, len(queries), query_batch_size):
+        q = queries[q_start:q_start + query_batch_size]
+        best_scores = np.full((len(q), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(q), 0), dtype=np.int64)
+
+        for start in range(0, num_rows, block_size):
+            end = min(start + block_size, num_rows)
+            scores = score_block(q, start, end)
+            block_deleted = deleted[start:end]
+            if block_deleted.any():
+                scores[:, block_deleted] = -np.inf
+
+            kk = min(k, scores.shape[1])
+            part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+
+            # Keep only the running top-k
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        for rows, scores in zip(best_rows, best_scores):
+            results.append([(int(r), float(s)) for r, s in zip(rows, scores) if s != -np.inf])
+    return results
+
+
+class StringColumn:
+    """
+    Read-only column of strings stored as one UTF-8 buffer plus an offsets table
+
+    Row i is buffer[offsets[i]:offsets[i+1]]. Both parts are memory-mapped, so
+    opening a column costs nothing and rows are decoded only when accessed.
+    """
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.buffer[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class JsonColumn(StringColumn):
+    """
+    Read-only column of JSON values, decoded on access
+    """
+
+    def __getitem__(self, row):
+        return json.loads(super().__getitem__(row))
+
+
+# Function to write a string column
+def _write_column(directory, name, values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    with open(directory / f"{name}.bin", 'wb') as f:
+        for value in encoded:
+            f.write(value)
+    np.save(directory / f"{name}_offsets.npy", offsets)
+
+# Function to find the directory holding the current files of a saved index
+def resolve_index_directory(directory):
+    """
+    Get the version sub-directory an index directory currently points to
+
+    Parameters:
+    directory (str or Path): Directory passed to LocalVectorIndex.save
+
+    Returns:
+    Path: The current version directory, or directory itself for indexes saved before versioning
+    """
+    directory = Path(directory)
+    try:
+        version = (directory / CURRENT_VERSION_FILE).read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return directory
+    return directory / version
+
+# Function to check whether a directory holds a saved index
+def is_saved_index(directory):
+    """
+    Check whether a directory holds an index written by LocalVectorIndex.save
+
+    Parameters:
+    directory (str or Path): Index directory
+
+    Returns:
+    bool: True if the directory holds a saved index
+    """
+    return (resolve_index_directory(directory) / "header.json").exists()
+
+# Function to memory-map a string column
+def _open_column(directory, name, column_class=StringColumn):
+    offsets = np.load(directory / f"{name}_offsets.npy", mmap_mode="r")
+    with open(directory / f"{name}.bin", 'rb') as f:
+        # mmap cannot map an empty file; the mapping stays valid after the file is closed
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if int(offsets[-1]) else b""
+    return column_class(buffer, offsets)
+
+
+class LocalVectorIndex:
+    """
+    In-process vector index with exact cosine top-k over a NumPy embedding matrix
+
+    Scoring is a blocked matrix product, so memory for a search is bounded by the
+    block size rather than the corpus size, and many queries are scored together.
+    Hits use the same {"id", "score", "text", "metadata"} shape as
+    retrieve_relevant_chunks.
+
+    A saved index is opened with memory maps and no copying: the embedding matrix,
+    chunk text and metadata stay in the OS page cache, shared by every worker
+    process that opens the same directory. The first write to an opened index
+    copies it into memory.
+    """
+
+    def __init__(self, embed_fn=None, dim=None):
+        """
+        Initialize an empty index
+
+        Parameters:
+        embed_fn (callable): Maps a list of texts to a 2-D array; defaults to HashingEmbedder
+        dim (int): Embedding dimension; inferred from the first vectors added if omitted
+        """
+        self.embed_fn = embed_fn or HashingEmbedder()
+        self.dim = dim
+        # Row buffers grow geometrically so repeated small adds stay amortised O(1)
+        self._embeddings = np.zeros((0, dim or 0), dtype=np.float32)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._num_rows = 0
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self._id_to_row = {}
+        self._field_cache = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._num_rows - int(np.count_nonzero(self.deleted))
+
+    @property
+    def embeddings(self):
+        return self._embeddings[:self._num_rows]
+
+    @property
+    def deleted(self):
+        return self._deleted[:self._num_rows]
+
+    def _id_map(self):
+        # Built lazily so opening a saved index does not pay for a million-entry dict
+        if self._id_to_row is None:
+            deleted = self.deleted
+            self._id_to_row = {chunk_id: row for row, chunk_id in enumerate(self.ids) if not deleted[row]}
+        return self._id_to_row
+
+    def _materialize(self):
+        # Copy memory-mapped columns into writable in-memory structures
+        if not isinstance(self.ids, list):
+            self.ids = list(self.ids)
+            self.texts = list(self.texts)
+            self.metadatas = list(self.metadatas)
+        if not self._embeddings.flags.writeable or self._embeddings.dtype != np.float32:
+            self._embeddings = np.array(self._embeddings, dtype=np.float32)
+
+    def _reserve(self, extra_rows):
+        needed = self._num_rows + extra_rows
+        capacity = self._embeddings.shape[0]
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        embeddings = np.zeros((capacity, self.dim), dtype=np.float32)
+        embeddings[:self._num_rows] = self.embeddings
+        deleted = np.ones(capacity, dtype=bool)
+        deleted[:self._num_rows] = self.deleted
+        self._embeddings, self._deleted = embeddings, deleted
+
+    def add(self, ids, texts, metadatas=None, embeddings=None):
+        """
+        Add or replace chunks
+
+        Parameters:
+        ids (list): Chunk IDs; an existing ID is replaced
+        texts (list): Chunk texts
+        metadatas (list): Optional metadata dictionaries
+        embeddings (numpy.ndarray): Optional precomputed embeddings; computed with embed_fn if omitted
+        """
+        if not ids:
+            return
+        if metadatas is None:
+            metadatas = [{} for _ in ids]
+        if embeddings is None:
+            embeddings = self.embed_fn(list(texts))
+        embeddings = normalize_rows(embeddings)
+
+        with self._lock:
+            if self._num_rows == 0:
+                self.dim = embeddings.shape[1]
+                self._embeddings = np.zeros((0, self.dim), dtype=np.float32)
+                self._deleted = np.zeros(0, dtype=bool)
+            self._materialize()
+            self.delete(ids)
+
+            start = self._num_rows
+            self._reserve(len(ids))
+            self._embeddings[start:start + len(ids)] = embeddings
+            self._deleted[start:start + len(ids)] = False
+            self._num_rows += len(ids)
+            self.ids.extend(ids)
+            self.texts.extend(texts)
+            self.metadatas.extend(metadatas)
+            self._field_cache = {}
+            id_map = self._id_map()
+            for offset, chunk_id in enumerate(ids):
+                id_map[chunk_id] = start + offset
+
+    def delete(self, ids):
+        """
+        Delete chunks by ID; unknown IDs are ignored
+
+        Parameters:
+        ids (list): Chunk IDs to delete
+        """
+        with self._lock:
+            id_map = self._id_map()
+            for chunk_id in ids:
+                row = id_map.pop(chunk_id, None)
+                if row is not None:
+                    self._deleted[row] = True
+
+    def update_metadata(self, chunk_id, metadata):
+        """
+        Merge fields into a chunk's metadata; unknown IDs are ignored
+
+        Parameters:
+        chunk_id (str): Chunk ID
+        metadata (dict): Fields to set
+        """
+        with self._lock:
+            row = self._id_map().get(chunk_id)
+            if row is None:
+                return
+            if not isinstance(self.metadatas, list):
+                self.metadatas = list(self.metadatas)
+            self.metadatas[row] = {**self.metadatas[row], **metadata}
+            self._field_cache = {}
+
+    def _field_values(self, field):
+        # Per-row values of a metadata field, cached until metadata changes
+        values = self._field_cache.get(field)
+        if values is None:
+            default = DEFAULT_TENANT if field == "tenant" else UNKNOWN
+            values = np.array([str(metadata.get(field) or default) for metadata in self.metadatas], dtype=object)
+            self._field_cache[field] = values
+        return values
+
+    def filter_mask(self, filters):
+        """
+        Get the rows a filtered search must skip
+
+        Parameters:
+        filters (dict): Field -> list of accepted values, as returned by normalize_filters
+
+        Returns:
+        numpy.ndarray: Boolean mask, True for deleted rows and rows whose metadata does not match
+        """
+        with self._lock:
+            excluded = self.deleted.copy()
+            for field, values in (filters or {}).items():
+                excluded |= ~np.isin(self._field_values(field)[:self._num_rows], values)
+            return excluded
+
+    def search(self, query_vectors, top_k=5, block_size=65536, query_batch_size=256, filters=None):
+        """
+        Exact cosine top-k for a batch of query vectors
+
+        Parameters:
+        query_vectors (numpy.ndarray): 2-D array of query embeddings
+        top_k (int): Number of results per query
+        block_size (int): Corpus rows scored per matrix product
+        query_batch_size (int): Queries scored together
+        filters (dict): Optional metadata filters (see filter_mask)
+
+        Returns:
+        list: One list of (row, score) pairs per query, best first
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        with self._lock:
+            matrix = self.embeddings
+            deleted = self.filter_mask(filters) if filters else self.deleted
+
+        def score_block(q, start, end):
+            return q @ matrix[start:end].T.astype(np.float32, copy=False)
+
+        return blocked_top_k(score_block, queries, matrix.shape[0], deleted, top_k, block_size, query_batch_size)
+
+    def get_hit(self, row, score):
+        """
+        Build a hit dictionary for a row
+
+        Returns:
+        dict: {"id", "score", "text", "metadata"}
+        """
+        return {
+            "id": self.ids[row],
+            "score": score,
+            "text": self.texts[row],
+            "metadata": self.metadatas[row],
+        }
+
+    def fetch(self, ids):
+        """
+        Look up chunks by ID
+
+        Parameters:
+        ids (list): Chunk IDs; unknown IDs are skipped
+
+        Returns:
+        dict: Chunk ID -> hit dictionary with a score of None
+        """
+        with self._lock:
+            id_map = self._id_map()
+            rows = [(chunk_id, id_map.get(chunk_id)) for chunk_id in ids]
+        return {chunk_id: self.get_hit(row, None) for chunk_id, row in rows if row is not None}
+
+    def get_embeddings(self, ids):
+        """
+        Look up the stored embeddings of chunks
+
+        Parameters:
+        ids (list): Chunk IDs
+
+        Returns:
+        numpy.ndarray: float32 array with one row per ID, or None if any ID is unknown
+        """
+        with self._lock:
+            id_map = self._id_map()
+            rows = [id_map.get(chunk_id) for chunk_id in ids]
+        if any(row is None for row in rows):
+            return None
+        return np.asarray(self.embeddings[rows], dtype=np.float32)
+
+    def query(self, texts, top_k=5, filters=None):
+        """
+        Search the index with a batch of query texts
+
+        Parameters:
+        texts (list): Query texts
+        top_k (int): Number of results per query
+        filters (dict): Optional metadata filters (see filter_mask)
+
+        Returns:
+        list: One list of hit dictionaries per query
+        """
+        query_vectors = self.embed_fn(list(texts))
+        return [
+            [self.get_hit(row, score) for row, score in hits]
+            for hits in self.search(query_vectors, top_k, filters=filters)
+        ]
+
+    def save(self, directory, dtype=None):
+        """
+        Persist the live rows of the index in the memory-mappable on-disk format
+
+        Each save writes a new version sub-directory holding header.json, the
+        embedding matrix (embeddings.npy), and id, text and metadata columns,
+        each a UTF-8 .bin file plus an _offsets.npy table. The CURRENT file is
+        then atomically replaced to point at it, so the index directory is never
+        missing or half-written for a concurrent load. The previous version is
+        kept for readers that read CURRENT just before the swap; older ones are
+        removed (processes that have them mapped keep reading them on POSIX).
+
+        Parameters:
+        directory (str or Path): Target directory
+        dtype (str): Embedding storage type, "float32" or "float16"; defaults to LOCAL_INDEX_DTYPE
+        """
+        directory = Path(directory)
+        dtype = dtype or LOCAL_INDEX_DTYPE
+        # Zero-padded so versions sort by age
+        version = f"v{time.time_ns():020d}-{os.getpid()}"
+        version_directory = directory / version
+        version_directory.mkdir(parents=True)
+
+        with self._lock:
+            live = np.flatnonzero(~self.deleted)
+            np.save(version_directory / "embeddings.npy", self.embeddings[live].astype(dtype))
+            _write_column(version_directory, "ids", (self.ids[row] for row in live))
+            _write_column(version_directory, "text", (self.texts[row] for row in live))
+            _write_column(version_directory, "metadata", (json.dumps(self.metadatas[row], ensure_ascii=False) for row in live))
+            with open(version_directory / "header.json", 'w', encoding='utf-8') as f:
+                json.dump({
+                    "format_version": INDEX_FORMAT_VERSION,
+                    "count": int(len(live)),
+                    "dim": int(self.dim or 0),
+                    "dtype": dtype,
+                }, f)
+
+        current = resolve_index_directory(directory)
+        previous = current.name if current != directory else None
+        tmp_path = directory / f"{CURRENT_VERSION_FILE}.{os.getpid()}.tmp"
+        tmp_path.write_text(version, encoding='utf-8')
+        os.replace(tmp_path, directory / CURRENT_VERSION_FILE)
+
+        # Unlinking is safe on POSIX: existing mappings keep the old data alive
+        for path in directory.iterdir():
+            if path.is_dir() and path.name.startswith("v") and previous and path.name < previous:
+                shutil.rmtree(path, ignore_errors=True)
+            elif path.name in _UNVERSIONED_FILES:
+                path.unlink(missing_ok=True)
+        print(f"Saved local index with {len(live)} chunks to {version_directory}")
+
+    @classmethod
+    def load(cls, directory, embed_fn=None, use_mmap=True):
+        """
+        Open an index saved with save()
+
+        With use_mmap the embedding matrix and columns are memory-mapped rather
+        than read, so opening takes milliseconds regardless of index size.
+
+        Parameters:
+        directory (str or Path): Directory written by save()
+        embed_fn (callable): Embedding function; must match the one used to build the index
+        use_mmap (bool): Map the files instead of reading them into memory
+
+        Returns:
+        LocalVectorIndex: The opened index
+        """
+        try:
+            return cls._load_version(resolve_index_directory(directory), embed_fn, use_mmap)
+        except FileNotFoundError:
+            # The version was removed by saves that finished while it was being opened
+            return cls._load_version(resolve_index_directory(directory), embed_fn, use_mmap)
+
+    @classmethod
+    def _load_version(cls, directory, embed_fn, use_mmap):
+        with open(directory / "header.json", 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported local index format in {directory}: {header.get('format_version')}")
+
+        index = cls(embed_fn=embed_fn, dim=header["dim"] or None)
+        index._embeddings = np.load(directory / "embeddings.npy", mmap_mode="r" if use_mmap else None)
+        index._num_rows = header["count"]
+        index._deleted = np.zeros(header["count"], dtype=bool)
+        index.ids = _open_column(directory, "ids")
+        index.texts = _open_column(directory, "text")
+        index.metadatas = _open_column(directory, "metadata", JsonColumn)
+        index._id_to_row = None
+        if not use_mmap:
+            index._materialize()
+        return index
+
+
+_local_indexes = {}
+_local_indexes_lock = threading.Lock()
+
+# Function to get a named local index, loading it from disk on first use
+def get_local_index(index_name):
+    """
+    Get the process-wide local index for a name
+
+    The index is loaded from LOCAL_INDEX_DIR/<index_name> if it exists there,
+    otherwise an empty index is created.
+
+    Parameters:
+    index_name (str): Name of the index
+
+    Returns:
+    LocalVectorIndex: The index
+    """
+    with _local_indexes_lock:
+        if index_name not in _local_indexes:
+            directory = Path(LOCAL_INDEX_DIR) / index_name
+            if is_saved_index(directory):
+                _local_indexes[index_name] = LocalVectorIndex.load(directory)
+            else:
+                _local_indexes[index_name] = LocalVectorIndex()
+        return _local_indexes[index_name]
+
+# Function to register an index built in-process under a name
+def register_local_index(index_name, index):
+    """
+    Register a local index so retrieval by name uses it
+
+    Parameters:
+    index_name (str): Name of the index
+    index (LocalVectorIndex): The index
+    """
+    with _local_indexes_lock:
+        _local_indexes[index_name] = index
+
+# Function to list the names of local indexes
+def list_local_indexes():
+    """
+    List the local indexes registered in this process or saved under LOCAL_INDEX_DIR
+
+    Returns:
+    list: Sorted index names
+    """
+    with _local_indexes_lock:
+        names = set(_local_indexes)
+    root = Path(LOCAL_INDEX_DIR)
+    if root.is_dir():
+        names.update(path.name for path in root.iterdir() if is_saved_index(path))
+    return sorted(names)
@@ -0,0 +1,236 @@
+import os
+import time
+import weakref
+import asyncio
+import threading
+
+# Connection pool settings for Pinecone index handles
+PINECONE_POOL_THREADS = int(os.environ.get("PINECONE_POOL_THREADS", "8"))
+PINECONE_CONNECTION_POOL_SIZE = int(os.environ.get("PINECONE_CONNECTION_POOL_SIZE", "16"))
+# Seconds a handle may sit idle before it is health-checked on next use
+PINECONE_HEALTH_CHECK_INTERVAL = float(os.environ.get("PINECONE_HEALTH_CHECK_INTERVAL", "300"))
+# Data plane API version used by the async REST client
+PINECONE_API_VERSION = os.environ.get("PINECONE_API_VERSION", "2025-01")
+
+
+class PineconeRegistry:
+    """
+    Process-wide, thread-safe registry of Pinecone clients and index handles
+
+    One client is kept per API key and one index handle per (API key, index
+    name). Each handle owns a pooled HTTP connection pool, so repeat searches
+    reuse warm TLS connections instead of paying for client setup and a new
+    handshake. A handle idle for longer than the health check interval is
+    probed before reuse and recreated if the probe fails; callers can also
+    invalidate a handle after a connection error.
+
+    Async callers share one httpx.AsyncClient per event loop, which pools
+    connections to the index hosts resolved by get_host. Code that runs a
+    short-lived loop must await aclose_async_client before closing it.
+    """
+
+    def __init__(self, pool_threads=None, connection_pool_size=None, health_check_interval=None):
+        """
+        Initialize an empty registry
+
+        Parameters:
+        pool_threads (int): Threads per index handle; defaults to PINECONE_POOL_THREADS
+        connection_pool_size (int): Pooled HTTP connections per handle; defaults to PINECONE_CONNECTION_POOL_SIZE
+        health_check_interval (float): Idle seconds before a health check; defaults to PINECONE_HEALTH_CHECK_INTERVAL
+        """
+        self.pool_threads = pool_threads or PINECONE_POOL_THREADS
+        self.connection_pool_size = connection_pool_size or PINECONE_CONNECTION_POOL_SIZE
+        self.health_check_interval = PINECONE_HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval
+        self._clients = {}
+        self._indexes = {}  # (api_key, index_name) -> {"index", "last_ok"}
+        self._hosts = {}
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get_client(self, api_key):
+        """
+        Get the shared Pinecone client for an API key
+
+        Parameters:
+        api_key (str): Pinecone API key
+
+        Returns:
+        Pinecone: The client
+        """
+        with self._key_lock(("client", api_key)):
+            client = self._clients.get(api_key)
+            if client is None:
+                from pinecone import Pinecone
+                client = self._clients[api_key] = Pinecone(api_key=api_key, pool_threads=self.pool_threads)
+            return client
+
+    def get_index(self, index_name, api_key):
+        """
+        Get the shared index handle, creating or health-checking it as needed
+
+        Parameters:
+        index_name (str): Name of Pinecone index
+        api_key (str): Pinecone API key
+
+        Returns:
+        Index: The index handle
+        """
+        key = (api_key, index_name)
+        with self._key_lock(key):
+            entry = self._indexes.get(key)
+            if entry is not None and time.monotonic() - entry["last_ok"] > self.health_check_interval:
+                if not self._probe(entry["index"]):
+                    print(f"Pinecone index '{index_name}' failed its health check; reconnecting")
+                    self._close(entry["index"])
+                    entry = None
+                else:
+                    entry["last_ok"] = time.monotonic()
+
+            if entry is None:
+                client = self.get_client(api_key)
+                index = client.Index(
+                    host=self.get_host(index_name, api_key),
+                    pool_threads=self.pool_threads,
+                    connection_pool_maxsize=self.connection_pool_size,
+                )
+                entry = self._indexes[key] = {"index": index, "last_ok": time.monotonic()}
+            return entry["index"]
+
+    def get_host(self, index_name, api_key):
+        """
+        Get the data plane host of an index, resolved once with describe_index
+
+        Parameters:
+        index_name (str): Name of Pinecone index
+        api_key (str): Pinecone API key
+
+        Returns:
+        str: Host name of the index
+        """
+        key = (api_key, index_name)
+        host = self._hosts.get(key)
+        if host is None:
+            host = self._hosts[key] = self.get_client(api_key).describe_index(index_name).host
+        return host
+
+    def get_async_client(self):
+        """
+        Get the pooled httpx.AsyncClient for the running event loop
+
+        An AsyncClient cannot be shared between event loops, so each loop gets
+        its own. Its connections stay open until aclose_async_client is awaited
+        on the same loop, which must happen before the loop is closed.
+
+        Returns:
+        httpx.AsyncClient: The client
+        """
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None or client.is_closed:
+                client = self._async_clients[loop] = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=self.connection_pool_size),
+                    timeout=httpx.Timeout(30.0, connect=5.0),
+                )
+            return client
+
+    async def aclose_async_client(self):
+        """
+        Close the running event loop's httpx.AsyncClient, if it has one
+
+        Call this before closing a loop that may have made async requests; a
+        new client is created if the loop is used again afterwards.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.pop(loop, None)
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    def _probe(self, index):
+        try:
+            index.describe_index_stats()
+            return True
+        except Exception as e:
+            print(f"Pinecone health check failed: {e}")
+            return False
+
+    def check_health(self, index_name, api_key):
+        """
+        Probe an index handle with a lightweight stats request
+
+        Parameters:
+        index_name (str): Name of Pinecone index
+        api_key (str): Pinecone API key
+
+        Returns:
+        bool: True if the index answered
+        """
+        healthy = self._probe(self.get_index(index_name, api_key))
+        if healthy:
+            self.mark_healthy(index_name, api_key)
+        else:
+            self.invalidate(index_name, api_key)
+        return healthy
+
+    def mark_healthy(self, index_name, api_key):
+        """
+        Record a successful request so the next use skips the health check
+        """
+        entry = self._indexes.get((api_key, index_name))
+        if entry is not None:
+            entry["last_ok"] = time.monotonic()
+
+    def invalidate(self, index_name, api_key):
+        """
+        Drop an index handle, e.g. after a connection error; the next use reconnects
+        """
+        key = (api_key, index_name)
+        with self._key_lock(key):
+            entry = self._indexes.pop(key, None)
+        if entry is not None:
+            self._close(entry["index"])
+
+    @staticmethod
+    def _close(index):
+        try:
+            index.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """
+        Close every index handle and forget all clients
+        """
+        with self._lock:
+            entries = list(self._indexes.values())
+            self._indexes = {}
+            self._clients = {}
+            self._hosts = {}
+        for entry in entries:
+            self._close(entry["index"])
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+# Function to get the process-wide Pinecone registry
+def get_pinecone_registry():
+    """
+    Get the process-wide Pinecone registry, created on first use
+
+    Returns:
+    PineconeRegistry: Registry configured from the PINECONE_* environment variables
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PineconeRegistry()
+        return _registry
@@ -10,8 +10,11 @@ import time
 # Import your RAG functionality
 import sys
 sys.path.append(".")  # Ensure local imports work
-from .ai_agent import answer_question, retrieve_relevant_chunks, get_system_prompt
+from .ai_agent import RetrievalContext, answer_question, get_system_prompt
+from .answer_cache import get_answer_cache
+from .document_metadata import DOC_TYPE_KEYWORDS, JURISDICTION_ALIASES
 from .session_manager import SessionManager
+from .vector_store import DEFAULT_INDEX_NAME
 
 # Set page configuration
 st.set_page_config(
@@ -29,10 +32,14 @@ load_dotenv()
 # In a more secure setup, store this in an environment variable:
 # ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN", "default_token_for_development")
 ACCESS_TOKEN = os.environ.get("ACCESS_TOKEN") # Change this to your desired token
+# Access token that also allows admin commands such as /purgecache; unset means nobody is an admin
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
 
 # Initialize ALL session state variables - make this comprehensive
 if "authenticated" not in st.session_state:
     st.session_state.authenticated = False
+if "is_admin" not in st.session_state:
+    st.session_state.is_admin = False
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "session_manager" not in st.session_state:
@@ -41,6 +48,8 @@ if "current_session_id" not in st.session_state:
     st.session_state.current_session_id = st.session_state.session_manager.get_current_session_id()
 if "retrieved_chunks" not in st.session_state:
     st.session_state.retrieved_chunks = []
+if "cached_citations" not in st.session_state:
+    st.session_state.cached_citations = []
 if "current_query" not in st.session_state:
     st.session_state.current_query = ""
 if "needs_processing" not in st.session_state:
@@ -49,7 +58,7 @@ if "user_input" not in st.session_state:
     st.session_state.user_input = ""
 
 # Pinecone configuration (in production, use environment variables)
-index_name = "policypulse"  # Your Pinecone index name
+index_name = DEFAULT_INDEX_NAME  # Your Pinecone index name (PINECONE_INDEX_NAME)
 api_key = os.environ.get("PINECONE_API_KEY")  # Your Pinecone API key
 
 # Authentication page
@@ -62,8 +71,13 @@ def show_auth_page():
     
     # Use a button outside the form (simpler approach)
     if st.button("Login", key="auth_submit_button"):
-        if token == ACCESS_TOKEN:
+        if ADMIN_TOKEN and token == ADMIN_TOKEN:
             st.session_state.authenticated = True
+            st.session_state.is_admin = True
+            st.rerun()
+        elif token == ACCESS_TOKEN:
+            st.session_state.authenticated = True
+            st.session_state.is_admin = False
             st.rerun()
         else:
             st.error("Invalid token. Please try again.")
@@ -114,6 +128,7 @@ def process_input(user_input):
             st.session_state.current_session_id = st.session_state.session_manager.get_current_session_id()
             st.session_state.messages = []
             st.session_state.retrieved_chunks = []
+            st.session_state.cached_citations = []
             st.info(f"Started new conversation. Session ID: {st.session_state.current_session_id}")
             st.rerun()
         
@@ -152,10 +167,22 @@ def process_input(user_input):
                 "/save [name] - Save current conversation with optional name\n"
                 "/load [id|name] - Load a specific conversation\n"
                 "/list - Show available saved conversations\n"
-                "/help - Show this help message"
+                + ("/purgecache [text] - Purge cached answers, optionally only questions containing text\n"
+                   if st.session_state.is_admin else "")
+                + "/help - Show this help message"
             )
             st.info(help_text)
         
+        elif command == "purgecache":
+            answer_cache = get_answer_cache()
+            if not st.session_state.is_admin:
+                st.error("Only admins can purge cached answers.")
+            elif answer_cache is None:
+                st.info("The answer cache is disabled.")
+            else:
+                removed = answer_cache.purge(question_contains=args.strip() or None)
+                st.success(f"Purged {removed} cached answers.")
+        
         elif command == "list":
             sessions = st.session_state.session_manager.list_sessions()
             if not sessions:
@@ -183,27 +210,32 @@ def process_input(user_input):
             thinking_placeholder = st.empty()
             thinking_placeholder.text("Thinking...")
             
-            # Process the question
-            # 1. Retrieve chunks
+            # Process the question; the evidence panel and the prompt share one search
+            retrieval_context = RetrievalContext(user_input, index_name, filters=st.session_state.get("search_filters"))
             try:
+                # 1. Check the answer cache, or retrieve chunks and start generating
+                conversation_history = st.session_state.session_manager.get_conversation_history()
                 with st.spinner("Searching for relevant information..."):
-                    retrieved_chunks = retrieve_relevant_chunks(user_input, index_name, api_key, top_k=5)
-                    st.session_state.retrieved_chunks = retrieved_chunks
-                
-                # 2. Generate answer
-                with st.spinner("Generating response..."):
-                    conversation_history = st.session_state.session_manager.get_conversation_history()
-                    response = answer_question(
+                    answer_stream, retrieval_context = answer_question(
                         user_input, 
                         index_name, 
                         api_key, 
-                        conversation_history=conversation_history
+                        conversation_history=conversation_history,
+                        retrieval_context=retrieval_context,
+                        return_context=True,
+                        stream=True
                     )
+                # The packed chunks are numbered like the prompt's DOC N citations; a cached
+                # answer skips the search, so its stored citations are shown instead
+                st.session_state.retrieved_chunks = retrieval_context.chunks or []
+                st.session_state.cached_citations = retrieval_context.cached_citations or []
                 
-                # Add assistant message
+                # 2. Show the answer as it streams in
                 thinking_placeholder.empty()
+                response = st.write_stream(answer_stream)
+                
+                # Add assistant message
                 st.session_state.messages.append({"role": "assistant", "content": response})
-                thinking_placeholder.markdown(response)  # Use markdown instead of write for better formatting
                 
                 # Save the conversation
                 st.session_state.session_manager.add_message(user_input, response)
@@ -234,6 +266,7 @@ def show_chat_interface():
             st.session_state.current_session_id = st.session_state.session_manager.get_current_session_id()
             st.session_state.messages = []
             st.session_state.retrieved_chunks = []
+            st.session_state.cached_citations = []
             st.rerun()
         
         # Name and save session
@@ -268,6 +301,12 @@ def show_chat_interface():
             else:
                 st.info("No saved conversations found.")
         
+        # Restrict retrieval to some jurisdictions or document types (empty means any)
+        with st.expander("Search Filters"):
+            jurisdictions = st.multiselect("Jurisdiction:", sorted(set(JURISDICTION_ALIASES.values())))
+            doc_types = st.multiselect("Document type:", list(DOC_TYPE_KEYWORDS))
+            st.session_state.search_filters = {"jurisdiction": jurisdictions, "doc_type": doc_types}
+        
         # Help section
         with st.expander("Help"):
             st.markdown("""
@@ -278,10 +317,13 @@ def show_chat_interface():
             - `/list` - Show available saved conversations
             - `/help` - Show help message
             """)
+            if st.session_state.is_admin:
+                st.markdown("- `/purgecache [text]` - Purge cached answers (admin)")
         
         # Logout option
         if st.button("Logout"):
             st.session_state.authenticated = False
+            st.session_state.is_admin = False
             st.rerun()
     
     # Main chat area - Create a 2-column layout
@@ -313,6 +355,11 @@ def show_chat_interface():
                 with st.expander(f"Document {i+1}: {chunk['id'][:30]}..."):
                     st.markdown(f"**Score:** {chunk['score']:.4f}")
                     st.markdown(f"**Content:**\n{chunk['text']}")
+        elif st.session_state.cached_citations:
+            st.caption("This answer was served from the answer cache; these are the sources it was based on.")
+            for i, citation in enumerate(st.session_state.cached_citations):
+                with st.expander(f"Document {i+1}: {citation['id'][:30]}..."):
+                    st.markdown("**Source files:**\n" + "\n".join(f"- {source}" for source in citation["source_files"]))
         else:
             st.info("Ask a question to see supporting evidence from our knowledge base.")
 
@@ -0,0 +1,359 @@
+import os
+import time
+import threading
+import numpy as np
+
+from .local_index import normalize_rows, blocked_top_k
+
+# Quantized storage mode for local retrieval: "none", "int8" or "pq"
+LOCAL_INDEX_QUANTIZATION = os.environ.get("LOCAL_INDEX_QUANTIZATION", "none")
+# Candidates re-scored with full-precision vectors, as a multiple of top_k
+QUANTIZATION_RERANK_FACTOR = int(os.environ.get("QUANTIZATION_RERANK_FACTOR", "4"))
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantizer with a per-dimension offset and scale
+
+    Each component is mapped linearly from the training range [min, max] of its
+    dimension onto the 256 int8 levels, which is 4x smaller than float32.
+    """
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+
+    @property
+    def trained(self):
+        return self.scale is not None
+
+    def train(self, vectors):
+        """
+        Fit the per-dimension ranges
+
+        Parameters:
+        vectors (numpy.ndarray): 2-D float array of training vectors
+        """
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        self.scale = np.maximum(high - low, 1e-12) / 255.0
+        self.offset = low
+        return self
+
+    def encode(self, vectors):
+        """
+        Quantize vectors
+
+        Parameters:
+        vectors (numpy.ndarray): 2-D float array
+
+        Returns:
+        numpy.ndarray: int8 codes of the same shape
+        """
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes):
+        """
+        Reconstruct approximate vectors from codes
+        """
+        return (codes.astype(np.float32) + 128) * self.scale + self.offset
+
+    def score_fn(self, codes):
+        """
+        Build a block scorer for blocked_top_k
+
+        Dot products are taken against the codes directly: q.x = q.offset +
+        (q*scale).(code + 128), so vectors are never fully decoded.
+        """
+        def score_block(q, start, end):
+            scaled = q * self.scale
+            bias = q @ self.offset + 128 * scaled.sum(axis=1)
+            return scaled @ codes[start:end].T.astype(np.float32) + bias[:, None]
+        return score_block
+
+    def nbytes(self):
+        return self.offset.nbytes + self.scale.nbytes
+
+
+class ProductQuantizer:
+    """
+    Product quantizer: each vector is split into sub-vectors and every sub-vector
+    is replaced by the index of its nearest centroid in a per-subspace codebook
+
+    With 8-dimensional sub-vectors and 256 centroids a 768-dimensional float32
+    vector (3072 bytes) is stored in 96 bytes. Scores are computed with lookup
+    tables of query/centroid dot products (asymmetric distance computation).
+    """
+
+    def __init__(self, num_subvectors=None, num_centroids=256, iterations=12, sample_size=20000, seed=0):
+        """
+        Initialize the quantizer
+
+        Parameters:
+        num_subvectors (int): Sub-vectors per vector; defaults to dim // 8
+        num_centroids (int): Centroids per subspace, at most 256
+        iterations (int): k-means iterations
+        sample_size (int): Maximum number of training vectors
+        seed (int): Seed for sampling and centroid initialization
+        """
+        self.num_subvectors = num_subvectors
+        self.num_centroids = min(num_centroids, 256)
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        self.codebooks = None  # (num_subvectors, num_centroids, sub_dim)
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def _split(self, vectors):
+        n, dim = vectors.shape
+        return vectors.reshape(n, self.num_subvectors, dim // self.num_subvectors)
+
+    def train(self, vectors):
+        """
+        Learn the codebooks with k-means in every subspace
+
+        Parameters:
+        vectors (numpy.ndarray): 2-D float array of training vectors
+        """
+        dim = vectors.shape[1]
+        if self.num_subvectors is None:
+            self.num_subvectors = max(1, dim // 8)
+        if dim % self.num_subvectors:
+            raise ValueError(f"Dimension {dim} is not divisible by {self.num_subvectors} sub-vectors")
+
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[np.sort(rng.choice(len(vectors), self.sample_size, replace=False))]
+        subvectors = self._split(np.asarray(vectors, dtype=np.float32))
+        k = min(self.num_centroids, len(vectors))
+
+        codebooks = []
+        for j in range(self.num_subvectors):
+            x = subvectors[:, j, :]
+            centroids = x[rng.choice(len(x), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(x, centroids)
+                counts = np.bincount(assignment, minlength=k)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, x)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+            codebooks.append(centroids)
+        self.codebooks = np.stack(codebooks)
+        return self
+
+    @staticmethod
+    def _nearest(x, centroids):
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * x @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors, batch_size=65536):
+        """
+        Quantize vectors
+
+        Parameters:
+        vectors (numpy.ndarray): 2-D float array
+
+        Returns:
+        numpy.ndarray: uint8 codes of shape (len(vectors), num_subvectors)
+        """
+        codes = np.zeros((len(vectors), self.num_subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_size):
+            subvectors = self._split(np.asarray(vectors[start:start + batch_size], dtype=np.float32))
+            for j in range(self.num_subvectors):
+                codes[start:start + len(subvectors), j] = self._nearest(subvectors[:, j, :], self.codebooks[j])
+        return codes
+
+    def decode(self, codes):
+        """
+        Reconstruct approximate vectors from codes
+        """
+        parts = self.codebooks[np.arange(self.num_subvectors)[None, :], codes]
+        return parts.reshape(len(codes), -1)
+
+    def score_fn(self, codes):
+        """
+        Build a block scorer for blocked_top_k using per-query lookup tables
+        """
+        def score_block(q, start, end):
+            # tables[i, j, c] = dot(query i's sub-vector j, centroid c of subspace j)
+            tables = np.einsum("qjd,jcd->qjc", self._split(q), self.codebooks)
+            block = codes[start:end]
+            scores = np.zeros((len(q), len(block)), dtype=np.float32)
+            for j in range(self.num_subvectors):
+                scores += tables[:, j, block[:, j]]
+            return scores
+        return score_block
+
+    def nbytes(self):
+        return self.codebooks.nbytes
+
+
+QUANTIZERS = {
+    "int8": ScalarQuantizer,
+    "pq": ProductQuantizer,
+}
+
+
+class QuantizedIndex:
+    """
+    Quantized search over a LocalVectorIndex with exact re-scoring
+
+    Candidates are found by scanning compact codes held in memory, then the best
+    top_k * rerank_factor candidates are re-scored with the full-precision vectors.
+    When the index was opened from disk those vectors stay memory-mapped, so only
+    the candidate rows are ever paged in. Rows added to the index after the
+    quantizer was trained are encoded on the next search.
+    """
+
+    def __init__(self, index, mode="int8", rerank_factor=None, quantizer=None):
+        """
+        Build codes for every row of an index
+
+        Parameters:
+        index (LocalVectorIndex): Index holding the full-precision vectors
+        mode (str): "int8" or "pq"
+        rerank_factor (int): Candidates re-scored per result; defaults to QUANTIZATION_RERANK_FACTOR
+        quantizer: Optional pre-configured quantizer; trained on the index's vectors if untrained
+        """
+        if mode not in QUANTIZERS:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+        self.index = index
+        self.mode = mode
+        self.rerank_factor = rerank_factor or QUANTIZATION_RERANK_FACTOR
+        self.quantizer = quantizer or QUANTIZERS[mode]()
+        self._lock = threading.Lock()
+
+        self.codes = None
+        self._sync()
+
+    def _sync(self):
+        # Train on first use and encode rows appended to the index since the last search
+        with self._lock:
+            vectors = self.index.embeddings
+            num_codes = 0 if self.codes is None else len(self.codes)
+            if len(vectors) > num_codes:
+                if not self.quantizer.trained:
+                    live = np.flatnonzero(~self.index.deleted)
+                    if not len(live):
+                        return self.codes
+                    self.quantizer.train(np.asarray(vectors[live], dtype=np.float32))
+                new_codes = self.quantizer.encode(vectors[num_codes:])
+                self.codes = new_codes if self.codes is None else np.concatenate([self.codes, new_codes])
+            return self.codes
+
+    def search(self, query_vectors, top_k=5, rerank=True, block_size=16384):
+        """
+        Approximate top-k for a batch of query vectors
+
+        Parameters:
+        query_vectors (numpy.ndarray): 2-D array of query embeddings
+        top_k (int): Number of results per query
+        rerank (bool): Re-score candidates with full-precision vectors
+        block_size (int): Rows scored per block
+
+        Returns:
+        list: One list of (row, score) pairs per query, best first
+        """
+        queries = normalize_rows(np.atleast_2d(query_vectors))
+        codes = self._sync()
+        if codes is None:
+            return [[] for _ in range(len(queries))]
+
+        num_candidates = top_k * self.rerank_factor if rerank else top_k
+        candidates = blocked_top_k(
+            self.quantizer.score_fn(codes), queries, len(codes), self.index.deleted[:len(codes)],
+            num_candidates, block_size, query_batch_size=64,
+        )
+        if not rerank:
+            return candidates
+
+        results = []
+        for q, hits in zip(queries, candidates):
+            if not hits:
+                results.append([])
+                continue
+            rows = np.array(sorted(row for row, _ in hits))
+            scores = np.asarray(self.index.embeddings[rows], dtype=np.float32) @ q
+            order = np.argsort(-scores)[:top_k]
+            results.append([(int(rows[i]), float(scores[i])) for i in order])
+        return results
+
+    def query(self, texts, top_k=5):
+        """
+        Search with a batch of query texts
+
+        Parameters:
+        texts (list): Query texts
+        top_k (int): Number of results per query
+
+        Returns:
+        list: One list of {"id", "score", "text", "metadata"} hits per query
+        """
+        query_vectors = self.index.embed_fn(list(texts))
+        return [
+            [self.index.get_hit(row, score) for row, score in hits]
+            for hits in self.search(query_vectors, top_k)
+        ]
+
+    def memory_report(self):
+        """
+        Compare the in-memory size of the codes with full-precision float32 vectors
+
+        Returns:
+        dict: Bytes for float32 vectors and for codes plus codebooks, and the fraction saved
+        """
+        codes = self._sync()
+        num_rows = 0 if codes is None else len(codes)
+        float_bytes = num_rows * (self.index.dim or 0) * 4
+        quantized_bytes = 0 if codes is None else codes.nbytes + self.quantizer.nbytes()
+        return {
+            "mode": self.mode,
+            "rows": num_rows,
+            "float32_bytes": float_bytes,
+            "quantized_bytes": quantized_bytes,
+            "memory_saved": 1 - quantized_bytes / float_bytes if float_bytes else 0.0,
+        }
+
+
+# Function to measure what quantization costs in recall
+def evaluate_quantization(index, queries, top_k=5, modes=("int8", "pq"), rerank_factor=None):
+    """
+    Report memory saved, recall@k and latency of each quantization mode against exact search
+
+    Parameters:
+    index (LocalVectorIndex): Index to evaluate
+    queries (list): Query texts, ideally a sample of real user questions
+    top_k (int): k for recall@k
+    modes (tuple): Quantization modes to evaluate
+    rerank_factor (int): Candidates re-scored per result
+
+    Returns:
+    dict: Per-mode memory report extended with recall_at_k, recall_at_k_no_rerank and mean_query_ms
+    """
+    query_vectors = index.embed_fn(list(queries))
+    exact = [{row for row, _ in hits} for hits in index.search(query_vectors, top_k)]
+
+    def recall(results):
+        found = sum(len(truth & {row for row, _ in hits}) for truth, hits in zip(exact, results))
+        total = sum(len(truth) for truth in exact)
+        return found / total if total else 1.0
+
+    report = {}
+    for mode in modes:
+        quantized = QuantizedIndex(index, mode=mode, rerank_factor=rerank_factor)
+        start = time.perf_counter()
+        reranked = quantized.search(query_vectors, top_k)
+        elapsed = time.perf_counter() - start
+        report[mode] = {
+            **quantized.memory_report(),
+            "recall_at_k": recall(reranked),
+            "recall_at_k_no_rerank": recall(quantized.search(query_vectors, top_k, rerank=False)),
+            "mean_query_ms": elapsed * 1000 / max(1, len(queries)),
+        }
+        print(f"{mode}: {report[mode]}")
+    return report
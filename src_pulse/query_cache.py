@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .dedup import normalize_chunk_text
+
+# Retrieval result cache: "memory" (per process), "redis" (shared by all workers) or "none"
+QUERY_CACHE_BACKEND = os.environ.get("QUERY_CACHE_BACKEND", "memory")
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "600"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", "2048"))
+QUERY_CACHE_REDIS_URL = os.environ.get("QUERY_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+# Function to normalize a query for cache lookups
+def normalize_query(text):
+    """
+    Normalize query text so trivially different phrasings share a cache entry
+
+    Parameters:
+    text (str): Query text
+
+    Returns:
+    str: Lower-cased text with collapsed whitespace and no trailing punctuation
+    """
+    return normalize_chunk_text(text).rstrip("?!. ")
+
+
+class QueryCache:
+    """
+    Base class for retrieval result caches
+
+    Entries are keyed by normalized query text, index name, top_k and any other
+    retrieval options, plus a per-index generation number. Ingestion bumps the
+    generation with invalidate_index, which makes every older entry for that
+    index unreachable; they then age out through TTL or LRU eviction.
+    """
+
+    def __init__(self, ttl=QUERY_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def make_key(self, text, index_name, top_k, **options):
+        """
+        Build the cache key for a retrieval call
+
+        Parameters:
+        text (str): Query text
+        index_name (str): Name of the index
+        top_k (int): Number of results
+        **options: Other retrieval options that change the results (profile, hybrid, ...)
+
+        Returns:
+        str: Cache key
+        """
+        payload = json.dumps([normalize_query(text), top_k, sorted(options.items())], default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{index_name}:{self.generation(index_name)}:{digest}"
+
+    def get(self, key):
+        """
+        Look up cached hits
+
+        Returns:
+        list: Cached hits, or None on a miss or expired entry
+        """
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def stats(self):
+        """
+        Get hit/miss counters
+
+        Returns:
+        dict: Hits, misses, hit rate and backend-specific counters
+        """
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def put(self, key, hits):
+        """
+        Store hits under a key
+        """
+        raise NotImplementedError
+
+    def generation(self, index_name):
+        """
+        Get the current generation number of an index
+        """
+        raise NotImplementedError
+
+    def invalidate_index(self, index_name):
+        """
+        Invalidate every cached result for an index, e.g. after ingestion
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        raise NotImplementedError
+
+
+class MemoryQueryCache(QueryCache):
+    """
+    In-process cache with per-entry TTL and size-bounded LRU eviction
+    """
+
+    def __init__(self, ttl=QUERY_CACHE_TTL, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Parameters:
+        ttl (float): Seconds an entry stays valid
+        max_entries (int): Maximum number of entries before the least recently used is evicted
+        """
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (expiry time, hits)
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, hits = entry
+            if time.monotonic() > expires:
+                del self._entries[key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return hits
+
+    def put(self, key, hits):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def generation(self, index_name):
+        with self._lock:
+            return self._generations.get(index_name, 0)
+
+    def invalidate_index(self, index_name):
+        with self._lock:
+            self._generations[index_name] = self._generations.get(index_name, 0) + 1
+            # Entries are cheap to drop eagerly in process
+            prefix = f"{index_name}:"
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update(size=len(self._entries), evictions=self.evictions, expirations=self.expirations)
+        return stats
+
+
+class RedisQueryCache(QueryCache):
+    """
+    Cache shared by all app workers through a Redis-compatible server
+
+    Entries expire with the server's TTL; size is bounded by the server's
+    maxmemory policy (configure allkeys-lru for LRU eviction). Generation
+    numbers live on the server, so an ingestion run invalidates every worker.
+    """
+
+    def __init__(self, url=QUERY_CACHE_REDIS_URL, ttl=QUERY_CACHE_TTL, prefix="policypulse:query_cache"):
+        """
+        Initialize the cache
+
+        Parameters:
+        url (str): Redis connection URL
+        ttl (float): Seconds an entry stays valid
+        prefix (str): Key prefix for entries and generation counters
+        """
+        super().__init__(ttl)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key):
+        try:
+            value = self.client.get(f"{self.prefix}:entry:{key}")
+        except Exception as e:
+            print(f"Error reading query cache: {e}")
+            return None
+        return None if value is None else json.loads(value)
+
+    def put(self, key, hits):
+        try:
+            self.client.set(f"{self.prefix}:entry:{key}", json.dumps(hits), ex=max(1, int(self.ttl)))
+        except Exception as e:
+            print(f"Error writing query cache: {e}")
+
+    def generation(self, index_name):
+        try:
+            return int(self.client.get(f"{self.prefix}:generation:{index_name}") or 0)
+        except Exception as e:
+            print(f"Error reading query cache generation: {e}")
+            return 0
+
+    def invalidate_index(self, index_name):
+        try:
+            self.client.incr(f"{self.prefix}:generation:{index_name}")
+        except Exception as e:
+            print(f"Error invalidating query cache: {e}")
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:entry:*"):
+            self.client.delete(key)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+# Function to get the process-wide query cache
+def get_query_cache():
+    """
+    Get the process-wide retrieval result cache, created on first use
+
+    Returns:
+    QueryCache: Cache for QUERY_CACHE_BACKEND, or None when caching is disabled
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None and QUERY_CACHE_BACKEND != "none":
+            if QUERY_CACHE_BACKEND == "redis":
+                _default_cache = RedisQueryCache()
+            elif QUERY_CACHE_BACKEND == "memory":
+                _default_cache = MemoryQueryCache()
+            else:
+                raise ValueError(f"Unknown query cache backend: {QUERY_CACHE_BACKEND}")
+        return _default_cache
+
+# Function to invalidate cached results after an index changes
+def invalidate_query_cache(index_name):
+    """
+    Invalidate cached retrieval results for an index
+
+    Parameters:
+    index_name (str): Name of the index that changed
+    """
+    cache = get_query_cache()
+    if cache is not None:
+        cache.invalidate_index(index_name)
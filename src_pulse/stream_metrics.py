@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+# Number of recent responses kept per source for latency statistics
+STREAM_METRICS_WINDOW = int(os.environ.get("STREAM_METRICS_WINDOW", "500"))
+
+
+class LatencyRecorder:
+    """
+    Rolling record of streamed response latencies
+
+    For every response the time to the first text chunk and the total time
+    are kept, grouped by source (e.g. "sonar" or "agent"), so percentiles can
+    be shown to admins and compared across releases.
+    """
+
+    def __init__(self, window=STREAM_METRICS_WINDOW):
+        """
+        Initialize an empty recorder
+
+        Parameters:
+        window (int): Responses kept per source; older ones are dropped
+        """
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, source, time_to_first_token, total):
+        """
+        Record one response
+
+        Parameters:
+        source (str): Name of the response source
+        time_to_first_token (float): Seconds until the first chunk, or None if nothing was streamed
+        total (float): Seconds until the response was complete
+        """
+        with self._lock:
+            samples = self._samples.get(source)
+            if samples is None:
+                samples = self._samples[source] = deque(maxlen=self.window)
+            samples.append((time_to_first_token, total))
+
+    def stats(self):
+        """
+        Get latency percentiles per source
+
+        Returns:
+        dict: Source -> count and p50/p95 time to first token and total, in milliseconds
+        """
+        with self._lock:
+            snapshot = {source: list(samples) for source, samples in self._samples.items()}
+        stats = {}
+        for source, samples in snapshot.items():
+            first = np.array([ttft for ttft, _ in samples if ttft is not None]) * 1000
+            total = np.array([total for _, total in samples]) * 1000
+            stats[source] = {
+                "responses": len(samples),
+                "ttft_p50_ms": round(float(np.percentile(first, 50))) if len(first) else None,
+                "ttft_p95_ms": round(float(np.percentile(first, 95))) if len(first) else None,
+                "total_p50_ms": round(float(np.percentile(total, 50))),
+                "total_p95_ms": round(float(np.percentile(total, 95))),
+            }
+        return stats
+
+
+_default_recorder = None
+_default_recorder_lock = threading.Lock()
+
+# Function to get the process-wide latency recorder
+def get_latency_recorder():
+    """
+    Get the process-wide latency recorder, created on first use
+
+    Returns:
+    LatencyRecorder: The recorder
+    """
+    global _default_recorder
+    with _default_recorder_lock:
+        if _default_recorder is None:
+            _default_recorder = LatencyRecorder()
+        return _default_recorder
+
+# Function to record the latency of a finished stream
+def _finish_stream(source, metrics, start, first):
+    metrics["time_to_first_token"] = None if first is None else first - start
+    metrics["total"] = time.perf_counter() - start
+    get_latency_recorder().record(source, metrics["time_to_first_token"], metrics["total"])
+    first_label = "no output" if first is None else f"first token {metrics['time_to_first_token'] * 1000:.0f} ms"
+    print(f"Streamed {source} response: {first_label}, total {metrics['total'] * 1000:.0f} ms")
+
+# Generator that times a stream of text chunks
+def timed_stream(chunks, source, metrics=None):
+    """
+    Pass text chunks through while measuring time to first token and total latency
+
+    The clock starts when the first chunk is requested, so any work done by the
+    underlying generator before its first chunk (retrieval, the HTTP request)
+    counts towards the time to first token. The measurements are written to
+    metrics and to the process-wide recorder when the stream ends, including
+    when the consumer stops early.
+
+    Parameters:
+    chunks (iterable): Text chunks
+    source (str): Name recorded with the measurements
+    metrics (dict): Optional dictionary receiving "time_to_first_token" and "total" in seconds
+
+    Yields:
+    str: The chunks, unchanged
+    """
+    metrics = {} if metrics is None else metrics
+    start, first = time.perf_counter(), None
+    try:
+        for chunk in chunks:
+            if first is None and chunk:
+                first = time.perf_counter()
+            yield chunk
+    finally:
+        _finish_stream(source, metrics, start, first)
+
+# Async generator that times a stream of text chunks
+async def atimed_stream(chunks, source, metrics=None):
+    """
+    Async version of timed_stream for async iterables
+
+    Parameters and yielded values are the same as timed_stream.
+    """
+    metrics = {} if metrics is None else metrics
+    start, first = time.perf_counter(), None
+    try:
+        async for chunk in chunks:
+            if first is None and chunk:
+                first = time.perf_counter()
+            yield chunk
+    finally:
+        _finish_stream(source, metrics, start, first)
@@ -0,0 +1,215 @@
+import os
+import time
+import random
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Number of upsert batches sent concurrently
+UPSERT_MAX_IN_FLIGHT = int(os.environ.get("UPSERT_MAX_IN_FLIGHT", "4"))
+# Retries per batch before the upload is aborted
+UPSERT_MAX_RETRIES = int(os.environ.get("UPSERT_MAX_RETRIES", "5"))
+
+# HTTP status codes worth retrying: timeouts, rate limiting and server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+# Function to decide whether an upsert error is transient
+def is_retryable_error(error):
+    """
+    Check whether an error raised by an upsert is worth retrying
+
+    Parameters:
+    error (Exception): The error raised by the index client
+
+    Returns:
+    bool: True for rate limiting, server errors and connection problems
+    """
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if status is not None:
+        try:
+            return int(status) in RETRYABLE_STATUS_CODES
+        except (TypeError, ValueError):
+            pass
+
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+
+    # urllib3 connection errors (used by the Pinecone client) are not builtin ConnectionErrors
+    try:
+        from urllib3.exceptions import HTTPError as Urllib3HTTPError
+        return isinstance(error, Urllib3HTTPError)
+    except ImportError:
+        return False
+
+# Function to split an iterable of records into numbered batches
+def iter_record_batches(records, batch_size):
+    """
+    Group records into batches, each tagged with the offset of its first record
+
+    Parameters:
+    records (iterable): Records to upsert; may be a generator
+    batch_size (int): Records per batch
+
+    Yields:
+    tuple: (offset, list of records)
+    """
+    batch = []
+    offset = 0
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield offset, batch
+            offset += len(batch)
+            batch = []
+    if batch:
+        yield offset, batch
+
+
+class UpsertCheckpoint:
+    """
+    Records which batch offsets of an upload have completed so it can be resumed
+
+    The checkpoint file is append-only with one offset per line, so recording a
+    batch costs the same however many batches have completed before it.
+    """
+
+    def __init__(self, checkpoint_path):
+        """
+        Initialize the checkpoint, loading completed offsets if the file exists
+
+        Parameters:
+        checkpoint_path (str or Path): Path of the checkpoint file
+        """
+        self.checkpoint_path = Path(checkpoint_path)
+        self._lock = threading.Lock()
+        self.completed = set()
+
+        if self.checkpoint_path.exists():
+            try:
+                text = self.checkpoint_path.read_text(encoding='utf-8')
+                lines = text.split("\n")
+                # A line cut short by a crash has no newline; drop it so the next offset starts on a new line
+                torn = lines.pop()
+                if torn:
+                    os.truncate(self.checkpoint_path, len(text.encode('utf-8')) - len(torn.encode('utf-8')))
+                self.completed = {int(line) for line in lines if line.strip().isdigit()}
+                print(f"Resuming upload: {len(self.completed)} batches already completed")
+            except Exception as e:
+                print(f"Error loading upsert checkpoint, starting fresh: {e}")
+
+    def is_done(self, offset):
+        """
+        Check whether the batch at an offset has already been uploaded
+        """
+        with self._lock:
+            return offset in self.completed
+
+    def mark_done(self, offset):
+        """
+        Record a completed batch by appending its offset to the checkpoint file
+        """
+        with self._lock:
+            if offset in self.completed:
+                return
+            self.completed.add(offset)
+            self.checkpoint_path.parent.mkdir(exist_ok=True, parents=True)
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(f"{offset}\n")
+
+    def clear(self):
+        """
+        Remove the checkpoint once the whole upload has succeeded
+        """
+        with self._lock:
+            self.completed = set()
+            if self.checkpoint_path.exists():
+                self.checkpoint_path.unlink()
+
+
+# Function to upsert a single batch with exponential backoff
+def upsert_with_retry(index, batch, namespace="", max_retries=None, base_delay=0.5, max_delay=30.0):
+    """
+    Upsert one batch, retrying transient errors with exponential backoff and full jitter
+
+    Parameters:
+    index: Index handle exposing upsert_records(namespace, records)
+    batch (list): Records to upsert
+    namespace (str): Target namespace
+    max_retries (int): Retries before giving up; defaults to UPSERT_MAX_RETRIES
+    base_delay (float): Delay in seconds before the first retry
+    max_delay (float): Upper bound on any single delay
+    """
+    if max_retries is None:
+        max_retries = UPSERT_MAX_RETRIES
+
+    attempt = 0
+    while True:
+        try:
+            return index.upsert_records(namespace, batch)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            attempt += 1
+            print(f"Upsert failed ({e}); retry {attempt}/{max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+# Function to upsert many batches with bounded concurrency
+def upsert_batches(index, batches, namespace="", max_in_flight=None, max_retries=None, checkpoint=None, progress=None):
+    """
+    Upsert batches concurrently with at most max_in_flight requests outstanding
+
+    Batches are pulled lazily from the iterable, so a generator that is still
+    extracting documents overlaps with the upload and only max_in_flight batches
+    are held in memory. Works with any object exposing upsert_records, which makes
+    it easy to run against a local fake index.
+
+    Parameters:
+    index: Index handle exposing upsert_records(namespace, records)
+    batches (iterable): (offset, records) pairs, e.g. from iter_record_batches
+    namespace (str): Target namespace; None lets a vector store route each record by its metadata
+    max_in_flight (int): Concurrent requests; defaults to UPSERT_MAX_IN_FLIGHT
+    max_retries (int): Retries per batch; defaults to UPSERT_MAX_RETRIES
+    checkpoint (UpsertCheckpoint): Optional checkpoint used to skip and record completed batches
+    progress (callable): Optional callback receiving the number of records in each completed batch,
+                         and in each batch skipped via the checkpoint, so it counts towards the total
+
+    Returns:
+    int: Number of records upserted (excluding batches skipped via the checkpoint)
+    """
+    if max_in_flight is None:
+        max_in_flight = UPSERT_MAX_IN_FLIGHT
+
+    def _run(offset, batch):
+        upsert_with_retry(index, batch, namespace=namespace, max_retries=max_retries)
+        if checkpoint is not None:
+            checkpoint.mark_done(offset)
+        if progress is not None:
+            progress(len(batch))
+        return len(batch)
+
+    upserted = 0
+    in_flight = set()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        try:
+            for offset, batch in batches:
+                if checkpoint is not None and checkpoint.is_done(offset):
+                    if progress is not None:
+                        progress(len(batch))
+                    continue
+
+                # Wait for a slot; a permanent failure surfaces here and stops the upload
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        upserted += future.result()
+
+                in_flight.add(executor.submit(_run, offset, batch))
+        finally:
+            done, _ = wait(in_flight)
+
+        for future in done:
+            upserted += future.result()
+
+    return upserted
@@ -0,0 +1,513 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import quote
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .local_index import LOCAL_INDEX_DIR, get_local_index, list_local_indexes
+from .quantization import LOCAL_INDEX_QUANTIZATION, QuantizedIndex
+from .ivf_index import LOCAL_INDEX_ANN, IVFIndex
+from .pinecone_registry import PINECONE_API_VERSION, get_pinecone_registry
+from .upsert_engine import RETRYABLE_STATUS_CODES, is_retryable_error
+from .query_cache import invalidate_query_cache
+from .document_metadata import build_namespace, to_pinecone_filter
+
+# Name of the index shared by ingestion, the agents and the Streamlit apps
+DEFAULT_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "policypulse")
+# Vector store backend: "pinecone" (hosted) or "local" (in-process NumPy index)
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE_BACKEND", "pinecone")
+
+# Record fields returned by Pinecone searches ("metadata" is the JSON string written by older ingestion runs)
+RECORD_FIELDS = ["text", "metadata", "filename", "file_type", "chunk_id", "preview", "source_files",
+                 "tenant", "jurisdiction", "doc_type"]
+
+
+# Function to turn a record's fields into a metadata dictionary
+def _record_metadata(fields):
+    """
+    Collect the non-text fields of a record as metadata, decoding the JSON
+    metadata string written by format_pinecone_record
+    """
+    metadata = {}
+    for key, value in fields.items():
+        if key in ("id", "_id", "text"):
+            continue
+        if key == "metadata" and isinstance(value, str):
+            try:
+                metadata.update(json.loads(value))
+                continue
+            except ValueError:
+                pass
+        metadata[key] = value
+    return metadata
+
+# Function to turn a Pinecone search response into hit dictionaries
+def _search_hits(response):
+    return [
+        {
+            "id":       hit.get("_id", "unknown"),
+            "score":    hit.get("_score", 0),
+            "text":     hit.get("fields", {}).get("text", ""),
+            "metadata": _record_metadata(hit.get("fields", {})),
+        }
+        for hit in response.get("result", {}).get("hits", [])
+    ]
+
+
+class VectorStore:
+    """
+    Common interface for the vector stores used by ingestion and retrieval
+
+    Records are dictionaries with "id" and "text" plus any metadata fields, as
+    produced by format_pinecone_record. Query results are lists of
+    {"id", "score", "text", "metadata"} hits.
+    """
+
+    backend = None
+
+    def upsert(self, records, namespace=""):
+        """
+        Insert or replace records
+
+        Parameters:
+        records (list): Records with id, text and metadata fields
+        namespace (str): Target namespace
+        """
+        raise NotImplementedError
+
+    def delete(self, ids, namespace=""):
+        """
+        Delete records by ID
+
+        Parameters:
+        ids (list): IDs to delete
+        namespace (str): Target namespace
+        """
+        raise NotImplementedError
+
+    def update_metadata(self, record_id, metadata, namespace=""):
+        """
+        Set metadata fields on an existing record
+
+        Parameters:
+        record_id (str): ID of the record
+        metadata (dict): Fields to set
+        namespace (str): Target namespace
+        """
+        raise NotImplementedError
+
+    def query(self, text, top_k=5, namespace="", profile=None, filters=None):
+        """
+        Search with a single query text
+
+        Parameters:
+        text (str): Query text
+        top_k (int): Number of hits
+        namespace (str): Namespace to search
+        profile (str): Search breadth profile ("faq", "report", ...) for backends with approximate search
+        filters (dict): Metadata filters from normalize_filters, applied by the backend
+
+        Returns:
+        list: Hit dictionaries, best first
+        """
+        return self.query_batch([text], top_k=top_k, namespace=namespace, profile=profile, filters=filters)[0]
+
+    def query_batch(self, texts, top_k=5, namespace="", profile=None, filters=None):
+        """
+        Search with many query texts
+
+        Parameters:
+        texts (list): Query texts
+        top_k (int): Number of hits per query
+        namespace (str): Namespace to search
+        profile (str): Search breadth profile ("faq", "report", ...) for backends with approximate search
+        filters (dict): Metadata filters from normalize_filters, applied by the backend
+
+        Returns:
+        list: One list of hit dictionaries per query
+        """
+        raise NotImplementedError
+
+    async def aquery(self, text, top_k=5, namespace="", profile=None, filters=None):
+        """
+        Search with a single query text without blocking the event loop
+
+        The default runs query in a worker thread; backends with a native
+        async client override it.
+
+        Parameters:
+        text (str): Query text
+        top_k (int): Number of hits
+        namespace (str): Namespace to search
+        profile (str): Search breadth profile ("faq", "report", ...) for backends with approximate search
+        filters (dict): Metadata filters from normalize_filters, applied by the backend
+
+        Returns:
+        list: Hit dictionaries, best first
+        """
+        return await asyncio.to_thread(self.query, text, top_k, namespace, profile, filters)
+
+    async def afetch(self, ids, namespace=""):
+        """
+        Look up records by ID without blocking the event loop
+
+        Returns:
+        dict: ID -> hit dictionary with a score of None
+        """
+        return await asyncio.to_thread(self.fetch, ids, namespace)
+
+    def fetch(self, ids, namespace=""):
+        """
+        Look up records by ID
+
+        Parameters:
+        ids (list): IDs to look up; missing IDs are skipped
+        namespace (str): Namespace to read
+
+        Returns:
+        dict: ID -> hit dictionary with a score of None
+        """
+        raise NotImplementedError
+
+    def list_namespaces(self):
+        """
+        List the namespaces holding records
+
+        Returns:
+        list: Namespace names
+        """
+        return [""]
+
+    def get_embeddings(self, ids, namespace=""):
+        """
+        Look up the stored embeddings of records, where the backend keeps them
+
+        Parameters:
+        ids (list): IDs to look up
+        namespace (str): Namespace to read
+
+        Returns:
+        numpy.ndarray: One row per ID, or None if unavailable (e.g. integrated-embedding indexes)
+        """
+        return None
+
+    def flush(self):
+        """
+        Persist pending writes and invalidate cached retrieval results for the index
+
+        Hosted backends have nothing to persist, but every ingestion path ends
+        with a flush, which makes it the point where cached results go stale.
+        """
+        invalidate_query_cache(self.index_name)
+
+    def upsert_records(self, namespace, records):
+        # Adapter so a store can be handed to the upsert engine like a Pinecone index;
+        # a namespace of None routes each record by its metadata (see build_namespace)
+        if namespace is not None:
+            return self.upsert(records, namespace=namespace)
+        groups = {}
+        for record in records:
+            groups.setdefault(build_namespace(record), []).append(record)
+        for record_namespace, group in groups.items():
+            self.upsert(group, namespace=record_namespace)
+
+
+class PineconeVectorStore(VectorStore):
+    """
+    Vector store backed by a hosted Pinecone index with integrated embedding
+    """
+
+    backend = "pinecone"
+
+    def __init__(self, index_name, api_key, query_workers=8):
+        """
+        Initialize the store; the client and index handle come from the shared registry
+
+        Parameters:
+        index_name (str): Name of Pinecone index
+        api_key (str): Pinecone API key
+        query_workers (int): Concurrent searches used by query_batch
+        """
+        self.index_name = index_name
+        self.api_key = api_key
+        self.registry = get_pinecone_registry()
+        self.query_workers = query_workers
+
+    @property
+    def index(self):
+        return self.registry.get_index(self.index_name, self.api_key)
+
+    def upsert(self, records, namespace=""):
+        self.index.upsert_records(namespace, records)
+
+    def delete(self, ids, namespace=""):
+        # Pinecone accepts at most 1000 IDs per delete request
+        for i in range(0, len(ids), 1000):
+            self.index.delete(ids=ids[i:i+1000], namespace=namespace)
+
+    def update_metadata(self, record_id, metadata, namespace=""):
+        self.index.update(id=record_id, set_metadata=metadata, namespace=namespace)
+
+    def query(self, text, top_k=5, namespace="", profile=None, filters=None):
+        # Search breadth is managed by Pinecone, so the profile is ignored
+        query = {
+            "inputs": {"text": text},
+            "top_k": top_k
+        }
+        pinecone_filter = to_pinecone_filter(filters)
+        if pinecone_filter:
+            query["filter"] = pinecone_filter
+
+        def _search():
+            return self.index.search(
+                namespace=namespace,
+                query=query,
+                fields=RECORD_FIELDS,  # Specify the fields you want to retrieve
+            )
+
+        try:
+            response = _search()
+        except Exception as e:
+            if not is_retryable_error(e):
+                raise
+            # A dropped pooled connection: reconnect once before giving up
+            self.registry.invalidate(self.index_name, self.api_key)
+            response = _search()
+        self.registry.mark_healthy(self.index_name, self.api_key)
+
+        # Force it into a dict if needed
+        if not isinstance(response, dict) and hasattr(response, "to_dict"):
+            response = response.to_dict()
+
+        return _search_hits(response)
+
+    async def aquery(self, text, top_k=5, namespace="", profile=None, filters=None):
+        # Calls the records search REST endpoint directly with the registry's pooled
+        # httpx.AsyncClient, so concurrent searches overlap on one event loop
+        import httpx
+
+        # The host is resolved once per process; only that first lookup needs a thread
+        host = await asyncio.to_thread(self.registry.get_host, self.index_name, self.api_key)
+        url = f"https://{host}/records/namespaces/{quote(namespace or '__default__', safe='')}/search"
+        headers = {
+            "Api-Key": self.api_key,
+            "X-Pinecone-API-Version": PINECONE_API_VERSION,
+        }
+        body = {
+            "query": {"inputs": {"text": text}, "top_k": top_k},
+            "fields": RECORD_FIELDS,
+        }
+        pinecone_filter = to_pinecone_filter(filters)
+        if pinecone_filter:
+            body["query"]["filter"] = pinecone_filter
+
+        client = self.registry.get_async_client()
+        for attempt in range(2):
+            try:
+                response = await client.post(url, json=body, headers=headers)
+            except httpx.TransportError:
+                # A dropped pooled connection: retry once before giving up
+                if attempt:
+                    raise
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES and not attempt:
+                continue
+            response.raise_for_status()
+            break
+        self.registry.mark_healthy(self.index_name, self.api_key)
+        return _search_hits(response.json())
+
+    def fetch(self, ids, namespace=""):
+        hits = {}
+        # Pinecone accepts at most 1000 IDs per fetch request
+        for i in range(0, len(ids), 1000):
+            response = self.index.fetch(ids=ids[i:i+1000], namespace=namespace)
+            vectors = response.get("vectors", {}) if isinstance(response, dict) else response.vectors
+            for record_id, vector in vectors.items():
+                fields = (vector.get("metadata") if isinstance(vector, dict) else vector.metadata) or {}
+                hits[record_id] = {
+                    "id": record_id,
+                    "score": None,
+                    "text": fields.get("text", ""),
+                    "metadata": _record_metadata(fields),
+                }
+        return hits
+
+    def query_batch(self, texts, top_k=5, namespace="", profile=None, filters=None):
+        # Integrated-embedding search takes one query per request, so run them concurrently
+        if len(texts) == 1:
+            return [self.query(texts[0], top_k, namespace, filters=filters)]
+        with ThreadPoolExecutor(max_workers=min(self.query_workers, len(texts))) as executor:
+            return list(executor.map(lambda text: self.query(text, top_k, namespace, filters=filters), texts))
+
+    def list_namespaces(self):
+        stats = self.index.describe_index_stats()
+        namespaces = stats.get("namespaces", {}) if isinstance(stats, dict) else stats.namespaces
+        return list(namespaces) or [""]
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store backed by an in-process LocalVectorIndex; each namespace is a
+    separate local index persisted under LOCAL_INDEX_DIR
+    """
+
+    backend = "local"
+
+    def __init__(self, index_name, quantization=None, ann=None):
+        """
+        Initialize the store
+
+        Parameters:
+        index_name (str): Name of the local index
+        quantization (str): "none", "int8" or "pq"; defaults to LOCAL_INDEX_QUANTIZATION
+        ann (str): "none" or "ivf"; defaults to LOCAL_INDEX_ANN. Takes precedence over quantization
+        """
+        self.index_name = index_name
+        self.quantization = quantization or LOCAL_INDEX_QUANTIZATION
+        self.ann = ann or LOCAL_INDEX_ANN
+        self._dirty = set()
+        self._quantized = {}
+        self._ivf = {}
+
+    def _index_key(self, namespace):
+        return f"{self.index_name}__{namespace}" if namespace else self.index_name
+
+    def _index_dir(self, namespace):
+        return Path(LOCAL_INDEX_DIR) / self._index_key(namespace)
+
+    def get_index(self, namespace=""):
+        """
+        Get the LocalVectorIndex holding a namespace
+        """
+        return get_local_index(self._index_key(namespace))
+
+    def get_ivf(self, namespace=""):
+        """
+        Get the IVF index over a namespace, loading or building it on first use
+        """
+        index = self.get_index(namespace)
+        ivf = self._ivf.get(namespace)
+        # Reload if the namespace's index object was replaced
+        if ivf is None or ivf.index is not index:
+            ivf = self._ivf[namespace] = IVFIndex.load(self._index_dir(namespace), index)
+        return ivf
+
+    def upsert(self, records, namespace=""):
+        self.get_index(namespace).add(
+            [record["id"] for record in records],
+            [record["text"] for record in records],
+            [_record_metadata(record) for record in records],
+        )
+        self._dirty.add(namespace)
+
+    def delete(self, ids, namespace=""):
+        self.get_index(namespace).delete(ids)
+        self._dirty.add(namespace)
+
+    def update_metadata(self, record_id, metadata, namespace=""):
+        self.get_index(namespace).update_metadata(record_id, metadata)
+        self._dirty.add(namespace)
+
+    def query_batch(self, texts, top_k=5, namespace="", profile=None, filters=None):
+        if self.ann == "ivf":
+            return self.get_ivf(namespace).query(texts, top_k, profile=profile, filters=filters)
+        index = self.get_index(namespace)
+        # Quantized codes have no metadata, so filtered searches use the exact index
+        if self.quantization == "none" or filters:
+            return index.query(texts, top_k, filters=filters)
+        # Rebuild the codes if the namespace's index object was replaced
+        quantized = self._quantized.get(namespace)
+        if quantized is None or quantized.index is not index:
+            quantized = self._quantized[namespace] = QuantizedIndex(index, mode=self.quantization)
+        return quantized.query(texts, top_k)
+
+    def fetch(self, ids, namespace=""):
+        return self.get_index(namespace).fetch(ids)
+
+    def list_namespaces(self):
+        prefix = f"{self.index_name}__"
+        namespaces = [name[len(prefix):] for name in list_local_indexes() if name.startswith(prefix)]
+        return [""] + namespaces
+
+    def get_embeddings(self, ids, namespace=""):
+        return self.get_index(namespace).get_embeddings(ids)
+
+    def flush(self):
+        for namespace in sorted(self._dirty):
+            self.get_index(namespace).save(self._index_dir(namespace))
+            if self.ann == "ivf":
+                self.get_ivf(namespace).save(self._index_dir(namespace))
+        self._dirty = set()
+        super().flush()
+
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+# Function to create the configured vector store
+def get_vector_store(index_name=DEFAULT_INDEX_NAME, api_key=None, backend=None):
+    """
+    Create a vector store for the configured backend
+
+    Parameters:
+    index_name (str): Name of the index
+    api_key (str): Pinecone API key (defaults to PINECONE_API_KEY; unused by the local backend)
+    backend (str): "pinecone" or "local"; defaults to VECTOR_STORE_BACKEND
+
+    Returns:
+    VectorStore: The vector store
+    """
+    backend = backend or VECTOR_STORE_BACKEND
+    if backend == "local":
+        # Shared per index so derived structures (quantized codes, IVF partitions) are built once
+        with _local_stores_lock:
+            if index_name not in _local_stores:
+                _local_stores[index_name] = LocalVectorStore(index_name)
+            return _local_stores[index_name]
+    if backend == "pinecone":
+        return PineconeVectorStore(index_name, api_key or os.environ.get("PINECONE_API_KEY"))
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+# Function to compare query latency across vector stores
+def benchmark_vector_stores(stores, queries, top_k=5, repeats=3):
+    """
+    Measure query latency of several vector stores on the same queries
+
+    Parameters:
+    stores (dict): Mapping of a label to a VectorStore
+    queries (list): Query texts
+    top_k (int): Number of hits per query
+    repeats (int): Number of passes over the queries per store
+
+    Returns:
+    dict: Per-store latency statistics in milliseconds and batch throughput
+    """
+    results = {}
+    for label, store in stores.items():
+        store.query(queries[0], top_k)  # Warm up connections and caches
+
+        latencies = []
+        for _ in range(repeats):
+            for query in queries:
+                start = time.perf_counter()
+                store.query(query, top_k)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        store.query_batch(queries, top_k)
+        batch_seconds = time.perf_counter() - start
+
+        latencies = np.array(latencies)
+        results[label] = {
+            "mean_ms": float(latencies.mean()),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "batch_qps": len(queries) / batch_seconds if batch_seconds else float("inf"),
+        }
+        print(f"{label}: {results[label]}")
+    return results
@@ -0,0 +1,20 @@
+import uuid
+
+import pytest
+
+from src_pulse import lexical_index, local_index, vector_store
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    """
+    Point the local vector store and lexical index at a temporary directory
+
+    Returns:
+    str: A fresh index name
+    """
+    monkeypatch.setattr(local_index, "LOCAL_INDEX_DIR", str(tmp_path / "local_indexes"))
+    monkeypatch.setattr(vector_store, "LOCAL_INDEX_DIR", str(tmp_path / "local_indexes"))
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path / "lexical_indexes"))
+    monkeypatch.setattr(vector_store, "VECTOR_STORE_BACKEND", "local")
+    return f"test-{uuid.uuid4().hex[:8]}"
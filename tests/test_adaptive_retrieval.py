@@ -0,0 +1,102 @@
+import pytest
+
+from src_pulse import ai_agent
+from src_pulse.ai_agent import ADAPTIVE_INITIAL_K, ADAPTIVE_MAX_K, ADAPTIVE_MIN_K, retrieve_relevant_chunks_batch
+
+
+def _hits(*scores):
+    return [{"id": f"c{i}", "text": f"text {i}", "score": score} for i, score in enumerate(scores)]
+
+
+def _fused(*vector_scores):
+    # Hybrid hits: "score" is the reciprocal rank fusion score, "vector_score" the similarity (None if lexical-only)
+    return [{"id": f"c{i}", "text": f"text {i}", "score": 1 / (61 + i), "vector_score": score}
+            for i, score in enumerate(vector_scores)]
+
+
+def test_clear_winner_is_not_widened():
+    assert not ai_agent._needs_widening(_hits(0.92, 0.71, 0.64, 0.6))
+
+
+def test_low_top_score_is_widened():
+    assert ai_agent._needs_widening(_hits(0.42, 0.4, 0.31, 0.3))
+
+
+def test_short_result_is_not_widened():
+    assert not ai_agent._needs_widening(_hits(0.3, 0.2))
+
+
+def test_flat_spread_only_widens_when_enabled(monkeypatch):
+    # Typical multilingual-e5-large similarities for the first stage
+    flat = _hits(0.86, 0.85, 0.84, 0.83)
+    assert ai_agent.ADAPTIVE_FLAT_SPREAD == 0
+    assert not ai_agent._needs_widening(flat)
+
+    monkeypatch.setattr(ai_agent, "ADAPTIVE_FLAT_SPREAD", 0.05)
+    assert ai_agent._needs_widening(flat)
+    assert not ai_agent._needs_widening(_hits(0.9, 0.8, 0.75, 0.7))
+
+
+def test_cut_at_gap():
+    hits = _hits(0.9, 0.88, 0.86, 0.5, 0.48)
+
+    assert ai_agent._cut_at_gap(hits) == hits[:3]
+    assert ai_agent._cut_at_gap(_hits(0.9, 0.85, 0.8, 0.78)) == _hits(0.9, 0.85, 0.8, 0.78)
+
+
+def test_cut_keeps_at_least_min_k():
+    hits = _hits(0.9, 0.3, 0.1, 0.08)
+
+    assert ADAPTIVE_MIN_K == 2
+    assert ai_agent._cut_at_gap(hits) == hits[:ADAPTIVE_MIN_K]
+
+
+def test_hybrid_hits_are_judged_by_vector_scores():
+    # Fused scores (about 0.016) are far below the threshold; the similarities are not
+    confident = _fused(0.9, 0.7, None, 0.6)
+    assert ai_agent._relevance_scores(confident) == [0.9, 0.7, 0.7, 0.6]
+    assert not ai_agent._needs_widening(confident)
+    assert ai_agent._needs_widening(_fused(0.45, 0.4, None, 0.3))
+
+
+def test_hybrid_cut_never_drops_a_more_similar_chunk():
+    # Lexical evidence ranked a weak vector match third; cutting before it would drop the 0.86 chunk
+    hits = _fused(0.9, 0.88, 0.5, 0.86)
+    assert ai_agent._cut_at_gap(hits) == hits
+    hits = _fused(0.9, 0.4, 0.85, 0.2)
+    assert ai_agent._cut_at_gap(hits) == hits[:3]
+
+    assert ai_agent._cut_at_gap(_fused(0.9, 0.88, None, 0.4)) == _fused(0.9, 0.88, None, 0.4)[:3]
+    # A lexical-only first hit has no similarity to judge by
+    hits = [{"id": "lexical", "text": "", "score": 1 / 61, "vector_score": None}] + _fused(0.9, 0.2)
+    assert ai_agent._cut_at_gap(hits) == hits
+
+
+def test_only_uncertain_queries_get_a_second_stage(monkeypatch):
+    first_stage = {"clear": _hits(0.92, 0.9, 0.5, 0.45), "vague": _hits(0.4, 0.38, 0.37, 0.36)}
+    calls = []
+
+    def retrieve_batch(texts, index_name, api_key, top_k, profile, hybrid, use_cache, filters):
+        calls.append((list(texts), top_k))
+        if top_k == ADAPTIVE_INITIAL_K:
+            return [first_stage[text] for text in texts]
+        return [_hits(*[0.4 - 0.01 * i for i in range(top_k)]) for _ in texts]
+
+    monkeypatch.setattr(ai_agent, "_retrieve_batch", retrieve_batch)
+
+    clear, vague = retrieve_relevant_chunks_batch(["clear", "vague"], "policies", None, top_k=None, merge=False,
+                                                  diversify=False)
+
+    assert calls == [(["clear", "vague"], ADAPTIVE_INITIAL_K), (["vague"], ADAPTIVE_MAX_K)]
+    assert [hit["score"] for hit in clear] == [0.92, 0.9]
+    assert len(vague) == ADAPTIVE_MAX_K
+
+
+@pytest.mark.parametrize("top_k", [3, 7])
+def test_fixed_depth_skips_adaptive_stages(monkeypatch, top_k):
+    calls = []
+    monkeypatch.setattr(ai_agent, "_retrieve_batch", lambda texts, *args: calls.append(args[2]) or [_hits(0.1, 0.05)] * len(texts))
+
+    retrieve_relevant_chunks_batch(["q"], "policies", None, top_k=top_k, merge=False, diversify=False)
+
+    assert calls == [top_k]
@@ -0,0 +1,142 @@
+import numpy as np
+
+from src_pulse import answer_cache as answer_cache_module
+from src_pulse.answer_cache import SemanticAnswerCache, answer_cache_scope, get_answer_cache, question_entities
+from src_pulse.local_index import HashingEmbedder
+from src_pulse.query_cache import MemoryQueryCache
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = 0
+        self.embedder = HashingEmbedder()
+
+    def __call__(self, texts):
+        self.calls += 1
+        return self.embedder(texts)
+
+
+class TableEmbedder:
+    """
+    Stand-in for multilingual-e5-large: each question maps to a vector with a
+    given cosine similarity to the first question, in the range that model gives
+    """
+
+    def __init__(self, similarities):
+        self.vectors = {}
+        for axis, (question, similarity) in enumerate(similarities.items()):
+            vector = np.zeros(len(similarities) + 1, dtype=np.float32)
+            vector[0], vector[axis + 1] = similarity, np.sqrt(1 - similarity ** 2)
+            self.vectors[question] = vector
+
+    def __call__(self, texts):
+        return np.array([self.vectors[text] for text in texts])
+
+
+def test_scope_separates_tenants_and_filters():
+    assert answer_cache_scope("app") == answer_cache_scope("app", {"tenant": None, "doc_type": ""})
+    assert answer_cache_scope("app", {"jurisdiction": ["US", "uk"]}) == answer_cache_scope("app", {"jurisdiction": ["uk", "us"]})
+    assert answer_cache_scope("app") != answer_cache_scope("app", {"tenant": "acme"})
+    assert answer_cache_scope("app") != answer_cache_scope("app", {"jurisdiction": "uk"})
+    assert answer_cache_scope("app") != answer_cache_scope("sonar")
+
+
+def test_answers_are_not_shared_across_scopes():
+    cache = SemanticAnswerCache(HashingEmbedder())
+    cache.put("Is fertility leave mandatory?", "Yes", scope=answer_cache_scope("app", {"tenant": "acme"}))
+
+    assert cache.lookup("Is fertility leave mandatory?", scope=answer_cache_scope("app", {"tenant": "acme"}))["answer"] == "Yes"
+    assert cache.lookup("Is fertility leave mandatory?", scope=answer_cache_scope("app")) is None
+
+
+def test_question_vector_is_reused():
+    embedder = CountingEmbedder()
+    cache = SemanticAnswerCache(embed_fn=embedder)
+
+    vector = cache.embed_question("Is fertility leave mandatory?")
+    assert cache.lookup("Is fertility leave mandatory?", vector=vector) is None
+    cache.put("Is fertility leave mandatory?", "Yes", vector=vector)
+
+    assert embedder.calls == 1
+    assert cache.lookup("is fertility leave mandatory")["answer"] == "Yes"
+
+
+def test_reingestion_invalidates_answers(monkeypatch):
+    query_cache = MemoryQueryCache()
+    monkeypatch.setattr(answer_cache_module, "get_query_cache", lambda: query_cache)
+    cache = SemanticAnswerCache(HashingEmbedder())
+    cache.put("Is fertility leave mandatory?", "Yes", index_name="policies")
+
+    query_cache.invalidate_index("policies")
+
+    assert cache.lookup("Is fertility leave mandatory?", index_name="policies") is None
+
+
+def test_expired_answers_are_ignored():
+    cache = SemanticAnswerCache(HashingEmbedder())
+    cache.put("Is fertility leave mandatory?", "Yes", ttl=-1)
+
+    assert cache.lookup("Is fertility leave mandatory?") is None
+
+
+def test_cached_answer_skips_retrieval_and_keeps_citations(local_backend, monkeypatch):
+    from src_pulse import ai_agent
+    from src_pulse.ai_agent import RetrievalContext, answer_question
+    from src_pulse.vector_store import get_vector_store
+
+    get_vector_store(local_backend).upsert_records(None, [
+        {"id": "leave", "text": "Fertility leave is not mandatory in the UK.", "source_files": ["uk/leave.pdf"]},
+    ])
+    cache = SemanticAnswerCache(HashingEmbedder())
+    monkeypatch.setattr(ai_agent, "get_answer_cache", lambda: cache)
+    monkeypatch.setattr(ai_agent, "stream_sonar_with_history", lambda messages: iter(["No, ", "it is not."]))
+
+    answer, first = answer_question("Is fertility leave mandatory?", local_backend, None, top_k=1, return_context=True)
+    assert answer == "No, it is not." and first.hits
+
+    context = RetrievalContext("is fertility leave mandatory", local_backend)
+    answer, context = answer_question(context.query, local_backend, None, retrieval_context=context, return_context=True)
+    assert answer == "No, it is not."
+    assert context.answer_from_cache and context.hits is None
+    assert context.cached_citations == [{"id": "leave", "source_files": ["uk/leave.pdf"]}]
+
+
+def test_paraphrase_hits_but_entity_swaps_miss():
+    # Typical e5 similarities: swapping the jurisdiction, year or employer scores above the paraphrase
+    cache = SemanticAnswerCache(TableEmbedder({
+        "is fertility leave mandatory in the uk": 1.0,
+        "do we have to offer fertility leave in the uk": 0.95,
+        "is fertility leave mandatory in the us": 0.98,
+        "is fertility leave mandatory in the united states": 0.97,
+        "is fertility leave mandatory at acme in the uk": 0.97,
+        "is fertility leave mandatory at globex in the uk": 0.96,
+        "what are the rules on ivf funding": 0.85,
+    }))
+    cache.put("Is fertility leave mandatory in the UK?", "Not in the UK.")
+    cache.put("Is fertility leave mandatory at Acme in the UK?", "Acme offers it.")
+
+    assert cache.lookup("Do we have to offer fertility leave in the UK?")["answer"] == "Not in the UK."
+    assert cache.lookup("Is fertility leave mandatory in the US?") is None
+    assert cache.lookup("Is fertility leave mandatory in the United States?") is None
+    assert cache.lookup("Is fertility leave mandatory at Globex in the UK?") is None
+    assert cache.lookup("What are the rules on IVF funding?") is None
+
+
+def test_question_entities():
+    assert question_entities("Is fertility leave mandatory in the UK?") == ["uk"]
+    assert question_entities("Do we need it in the united kingdom?") == ["uk"]
+    assert question_entities("Does Acme cover IVF in Northern Ireland since 2024?") == ["2024", "acme", "ivf", "uk"]
+    assert question_entities("Does this apply to us?") == []
+
+
+def test_cache_is_disabled_without_a_semantic_embedder(monkeypatch):
+    monkeypatch.setattr(answer_cache_module, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(answer_cache_module, "_default_cache", None)
+    monkeypatch.delenv("PINECONE_API_KEY", raising=False)
+
+    assert get_answer_cache() is None
+    assert get_answer_cache() is None
+
+    monkeypatch.setattr(answer_cache_module, "_default_cache", None)
+    monkeypatch.setenv("PINECONE_API_KEY", "key")
+    assert isinstance(get_answer_cache(), SemanticAnswerCache)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src_pulse.pinecone_registry import PINECONE_API_VERSION, PineconeRegistry
+from src_pulse.vector_store import PineconeVectorStore
+
+
+def _search_response(request):
+    body = json.loads(request.content)
+    text = body["query"]["inputs"]["text"]
+    return httpx.Response(200, json={"result": {"hits": [
+        {"_id": f"{text}-{i}", "_score": 0.9 - 0.1 * i,
+         "fields": {"text": f"About {text}", "metadata": json.dumps({"filename": f"{text}.pdf"}), "jurisdiction": "uk"}}
+        for i in range(body["query"]["top_k"])
+    ]}})
+
+
+@pytest.fixture
+def mock_pinecone(monkeypatch):
+    """
+    A store whose registry sends async searches to an in-memory transport
+
+    Returns:
+    tuple: (store, list of requests received, dict mapping request number -> response or exception to return instead)
+    """
+    requests, failures = [], {}
+
+    def handler(request):
+        requests.append(request)
+        failure = failures.get(len(requests))
+        if isinstance(failure, Exception):
+            raise failure
+        return failure or _search_response(request)
+
+    registry = PineconeRegistry()
+    registry._hosts[("test-key", "policies")] = "policies-abc.svc.pinecone.io"
+    monkeypatch.setattr(registry, "get_async_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    store = PineconeVectorStore("policies", "test-key")
+    store.registry = registry
+    return store, requests, failures
+
+
+def test_concurrent_searches_hit_the_records_endpoint(mock_pinecone):
+    store, requests, _ = mock_pinecone
+
+    async def _search():
+        return await asyncio.gather(
+            store.aquery("fertility leave", top_k=2, namespace="uk/act", filters={"doc_type": ["act"]}),
+            store.aquery("adoption", top_k=1),
+        )
+
+    leave, adoption = asyncio.run(_search())
+
+    assert [hit["id"] for hit in leave] == ["fertility leave-0", "fertility leave-1"]
+    assert leave[0] == {"id": "fertility leave-0", "score": 0.9, "text": "About fertility leave",
+                        "metadata": {"filename": "fertility leave.pdf", "jurisdiction": "uk"}}
+    assert [hit["id"] for hit in adoption] == ["adoption-0"]
+
+    by_text = {json.loads(request.content)["query"]["inputs"]["text"]: request for request in requests}
+    request = by_text["fertility leave"]
+    assert str(request.url) == "https://policies-abc.svc.pinecone.io/records/namespaces/uk%2Fact/search"
+    assert request.headers["Api-Key"] == "test-key"
+    assert request.headers["X-Pinecone-API-Version"] == PINECONE_API_VERSION
+    assert json.loads(request.content)["query"]["filter"] == {"doc_type": {"$eq": "act"}}
+    # The default namespace has its own path segment, and an empty filter is left out
+    assert by_text["adoption"].url.path == "/records/namespaces/__default__/search"
+    assert "filter" not in json.loads(by_text["adoption"].content)["query"]
+
+
+@pytest.mark.parametrize("failure", [httpx.Response(503), httpx.ConnectError("connection reset")])
+def test_one_transient_failure_is_retried(mock_pinecone, failure):
+    store, requests, failures = mock_pinecone
+    failures[1] = failure
+
+    hits = asyncio.run(store.aquery("fertility leave", top_k=1))
+
+    assert len(requests) == 2 and [hit["id"] for hit in hits] == ["fertility leave-0"]
+
+
+def test_repeated_failures_are_raised(mock_pinecone):
+    store, requests, failures = mock_pinecone
+    failures[1] = failures[2] = httpx.Response(503)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(store.aquery("fertility leave", top_k=1))
+
+    failures[3] = failures[4] = httpx.ConnectError("connection reset")
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(store.aquery("fertility leave", top_k=1))
+    assert len(requests) == 4
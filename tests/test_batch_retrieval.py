@@ -0,0 +1,44 @@
+import pytest
+
+from src_pulse import ai_agent
+from src_pulse.ai_agent import merge_retrieved_chunks, retrieve_relevant_chunks_batch
+
+
+def _hit(chunk_id, text, score=0.8):
+    return {"id": chunk_id, "text": text, "score": score}
+
+
+# Two related queries; "overlap" is found by both, and "copy" repeats "gp-note" up to case and whitespace
+ELIGIBILITY = [
+    _hit("act-s4", "Section 4: employees with six months of service are eligible."),
+    _hit("overlap", "Fertility leave is paid at the statutory rate."),
+    _hit("gp-note", "A GP note is required for each absence."),
+]
+PAY = [
+    _hit("overlap", "Fertility leave is paid at the statutory rate."),
+    _hit("copy", "A GP  note is required for each\nabsence. "),
+    _hit("pay-guide", "Employers may top up statutory pay."),
+]
+
+
+def test_merge_fuses_ranks_and_drops_duplicate_text():
+    merged = merge_retrieved_chunks([ELIGIBILITY, PAY])
+
+    # "overlap" is found by both queries; the duplicate text keeps its better ranked copy
+    assert [chunk["id"] for chunk in merged] == ["overlap", "act-s4", "copy", "pay-guide"]
+    assert [chunk["score"] for chunk in merged] == pytest.approx([1 / 62 + 1 / 61, 1 / 61, 1 / 62, 1 / 63])
+    assert merged[0]["text"] == "Fertility leave is paid at the statutory rate."
+
+
+def test_single_query_is_not_fused():
+    assert merge_retrieved_chunks([ELIGIBILITY]) == ELIGIBILITY
+
+
+def test_batch_retrieval_searches_once_and_merges(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ai_agent, "_retrieve_batch", lambda texts, *args: calls.append(list(texts)) or [ELIGIBILITY, PAY])
+
+    merged = retrieve_relevant_chunks_batch(["who is eligible", "how is it paid"], "policies", None, top_k=3, diversify=False)
+
+    assert calls == [["who is eligible", "how is it paid"]]
+    assert [chunk["id"] for chunk in merged] == ["overlap", "act-s4", "copy", "pay-guide"]
@@ -0,0 +1,120 @@
+import pytest
+
+from src_pulse import context_packer
+from src_pulse.context_packer import MIN_PARTIAL_TOKENS, count_tokens, pack_context
+from src_pulse.mmr import mmr_rerank
+
+SHARED = "The employer must grant up to ten days of fertility leave in any twelve month period. "
+
+
+@pytest.fixture(autouse=True)
+def character_tokens(monkeypatch):
+    # Deterministic token counts whether or not tiktoken is installed
+    monkeypatch.setattr(context_packer, "_encoding", False)
+
+
+def _sentence(n):
+    return f"Sentence number {n} describes a separate obligation placed on the employer. "
+
+
+def test_count_tokens_estimates_from_characters():
+    assert count_tokens("") == 0
+    assert count_tokens("abcd") == 1
+    assert count_tokens("abcde") == 2
+
+
+def test_chunks_are_packed_best_score_first():
+    chunks = [
+        {"id": "low", "text": _sentence(1), "score": 0.2},
+        {"id": "high", "text": _sentence(2), "score": 0.9},
+    ]
+
+    packed, stats = pack_context(chunks, token_budget=1000)
+
+    assert [chunk["id"] for chunk in packed] == ["high", "low"]
+    assert packed[0]["text"] == _sentence(2)
+    assert packed[0]["tokens"] == count_tokens(_sentence(2))
+    assert stats["chunks_in"] == stats["chunks_out"] == 2
+    assert stats["tokens_saved"] == 0
+
+
+def test_overlapping_sentences_are_removed():
+    chunks = [
+        {"id": "first", "text": _sentence(1) + SHARED, "score": 0.9},
+        {"id": "second", "text": SHARED + _sentence(2), "score": 0.8},
+        {"id": "duplicate", "text": SHARED.upper(), "score": 0.7},
+    ]
+
+    packed, stats = pack_context(chunks, token_budget=1000)
+
+    assert [chunk["id"] for chunk in packed] == ["first", "second"]
+    assert packed[1]["text"] == _sentence(2).strip()
+    assert stats["tokens_saved"] > 0
+
+
+def test_short_sentences_are_never_deduplicated():
+    chunks = [
+        {"id": "a", "text": "Yes.\n" + _sentence(1), "score": 0.9},
+        {"id": "b", "text": "Yes.\n" + _sentence(2), "score": 0.8},
+    ]
+
+    packed, _ = pack_context(chunks, token_budget=1000)
+
+    assert packed[1]["text"] == "Yes.\n" + _sentence(2)
+
+
+def test_chunk_crossing_the_budget_is_cut_at_a_sentence():
+    long_text = "".join(_sentence(n) for n in range(20))
+    first = {"id": "first", "text": "".join(_sentence(n) for n in range(100, 110)), "score": 0.9}
+    budget = count_tokens(first["text"]) + 4 * count_tokens(_sentence(1))
+    chunks = [first, {"id": "long", "text": long_text, "score": 0.8}, {"id": "rest", "text": _sentence(99), "score": 0.1}]
+
+    packed, stats = pack_context(chunks, token_budget=budget)
+
+    assert [chunk["id"] for chunk in packed] == ["first", "long"]
+    assert long_text.startswith(packed[1]["text"])
+    assert packed[1]["text"].endswith(".")
+    assert stats["tokens_out"] <= budget
+    assert stats["tokens_in"] == sum(count_tokens(chunk["text"]) for chunk in chunks)
+
+
+def test_small_remainder_spends_the_budget():
+    first = {"id": "first", "text": "".join(_sentence(n) for n in range(10)), "score": 0.9}
+    budget = count_tokens(first["text"]) + MIN_PARTIAL_TOKENS - 1
+    chunks = [
+        first,
+        {"id": "long", "text": "".join(_sentence(n) for n in range(50, 60)), "score": 0.8},
+        {"id": "tiny", "text": "Short.", "score": 0.5},
+    ]
+
+    packed, _ = pack_context(chunks, token_budget=budget)
+
+    assert [chunk["id"] for chunk in packed] == ["first"]
+
+
+def test_default_budget(monkeypatch):
+    monkeypatch.setattr(context_packer, "CONTEXT_TOKEN_BUDGET", 25)
+    chunks = [{"id": str(n), "text": _sentence(n), "score": 1.0 - n / 10} for n in range(5)]
+
+    packed, stats = pack_context(chunks)
+
+    assert stats["token_budget"] == 25
+    assert len(packed) == 1
+
+
+def test_presorted_chunks_keep_the_mmr_order():
+    hits = [
+        {"id": "act", "text": _sentence(1), "score": 0.9},
+        {"id": "act-copy", "text": _sentence(2), "score": 0.88},
+        {"id": "act-near", "text": _sentence(3), "score": 0.86},
+        {"id": "guidance", "text": _sentence(4), "score": 0.5},
+    ]
+    reranked = mmr_rerank(hits, 3, embeddings=[[1, 0], [1, 0.01], [1, 0.02], [0, 1]], lambda_mult=0.5)
+    budget = 2 * count_tokens(_sentence(1))
+
+    packed, _ = pack_context(reranked, token_budget=budget, presorted=True)
+
+    assert [hit["id"] for hit in reranked] == ["act", "guidance", "act-copy"]
+    # The diverse chunk MMR promoted keeps its place instead of losing it to the higher-scored copy
+    assert [chunk["id"] for chunk in packed] == ["act", "guidance"]
+    assert [chunk["id"] for chunk in pack_context(reranked, token_budget=budget)[0]] == ["act", "act-copy"]
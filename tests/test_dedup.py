@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src_pulse.dedup import ChunkDeduplicator, MinHasher, chunk_content_id, normalize_chunk_text
+
+TEXT = (
+    "An employee who has completed twenty six weeks of continuous service is entitled to take "
+    "up to ten days of paid fertility leave in any twelve month period for appointments related "
+    "to assisted conception, and the employer may ask for reasonable evidence of each appointment "
+    "before the leave is granted, provided the request is made in writing within fourteen days."
+)
+OTHER = (
+    "Appeals against a decision of the employment tribunal must be lodged with the appeal "
+    "tribunal within forty two days of the date on which written reasons were sent to the parties."
+)
+
+
+def _doc(text, path):
+    return {"id": chunk_content_id(text), "text": text, "metadata": {"file_path": path}}
+
+
+def test_content_id_ignores_case_and_whitespace():
+    assert normalize_chunk_text("  Fertility\n\tLEAVE  ") == "fertility leave"
+    assert chunk_content_id("Fertility  leave") == chunk_content_id("fertility\nleave")
+    assert chunk_content_id("fertility leave") != chunk_content_id("parental leave")
+
+
+def test_minhash_is_deterministic_and_estimates_similarity():
+    signature = MinHasher().signature(TEXT)
+
+    assert signature.dtype == np.uint32 and len(signature) == 128
+    assert np.array_equal(signature, MinHasher().signature(TEXT.upper()))
+    assert np.mean(signature == MinHasher().signature(OTHER)) < 0.1
+
+
+def test_exact_duplicate_adds_its_source():
+    dedup = ChunkDeduplicator()
+    first = _doc(TEXT, "a.pdf")
+
+    assert dedup.add(first) == (first["id"], True)
+    assert dedup.add(_doc(TEXT, "b.pdf")) == (first["id"], False)
+    assert dedup.add(_doc(TEXT, "b.pdf")) == (first["id"], False)
+    assert first["metadata"]["source_files"] == ["a.pdf", "b.pdf"]
+    assert dedup.updated_ids == {first["id"]}
+
+
+def test_near_duplicate_is_merged_into_the_first_copy():
+    dedup = ChunkDeduplicator()
+    first = _doc(TEXT, "a.pdf")
+    near = _doc(TEXT.replace("fourteen days.", "fourteen days"), "b.pdf")
+    dedup.add(first)
+
+    assert dedup.add(near) == (first["id"], False)
+    assert dedup.add(_doc(OTHER, "c.pdf"))[1]
+    assert first["metadata"]["source_files"] == ["a.pdf", "b.pdf"]
+    assert dedup.summary() == {"unique": 2, "exact_duplicates": 0, "near_duplicates": 1}
+
+
+def test_seeded_chunk_is_uploaded_with_stored_sources():
+    dedup = ChunkDeduplicator()
+    dedup.add(_doc(TEXT, "a.pdf"))
+    stored = _doc(TEXT.replace("fourteen days.", "fourteen days"), "c.pdf")
+    dedup.seed(stored["id"], ["b.pdf", "c.pdf"])
+
+    # Near-identical to a chunk of this run, but already stored: kept as its own record
+    assert dedup.add(stored) == (stored["id"], True)
+    assert stored["metadata"]["source_files"] == ["b.pdf", "c.pdf"]
+    assert dedup.summary()["near_duplicates"] == 0
+
+
+def test_seed_does_not_override_a_chunk_already_seen():
+    dedup = ChunkDeduplicator()
+    first = _doc(TEXT, "a.pdf")
+    dedup.add(first)
+    dedup.seed(first["id"], ["old.pdf"])
+
+    assert dedup.add(_doc(TEXT, "b.pdf")) == (first["id"], False)
+    assert first["metadata"]["source_files"] == ["a.pdf", "b.pdf"]
+
+
+def test_bands_must_divide_signature_length():
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(num_perm=100, bands=16)
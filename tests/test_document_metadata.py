@@ -0,0 +1,153 @@
+import json
+
+import pytest
+
+from src_pulse import document_metadata
+from src_pulse.document_metadata import (
+    DEFAULT_TENANT,
+    UNKNOWN,
+    build_namespace,
+    infer_document_metadata,
+    matches_filters,
+    normalize_filters,
+    parse_namespace,
+    residual_filters,
+    select_namespaces,
+    to_pinecone_filter,
+)
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return path
+
+
+def test_infers_fields_from_path_below_root(tmp_path):
+    corpus = tmp_path / "docs"
+    document = _touch(corpus / "UK" / "guidance" / "leave.pdf")
+
+    assert infer_document_metadata(document, corpus) == {
+        "tenant": DEFAULT_TENANT,
+        "jurisdiction": "uk",
+        "doc_type": "guidance",
+    }
+
+
+@pytest.mark.parametrize("parent, relative", [
+    ("srv/policy_pulse_app_g_adk/docs", "fertility_leave.pdf"),
+    ("home/bill/legislation/docs", "uk/guidance/leave.pdf"),
+    ("Users/ca/docs", "us/research.pdf"),
+])
+def test_directories_above_root_do_not_affect_labels(tmp_path, parent, relative):
+    corpus = tmp_path / parent
+    neutral_corpus = tmp_path / "corpus"
+
+    assert (infer_document_metadata(_touch(corpus / relative), corpus)
+            == infer_document_metadata(_touch(neutral_corpus / relative), neutral_corpus))
+
+
+def test_labels_for_reported_paths(tmp_path):
+    corpus = tmp_path / "srv" / "policy_pulse_app_g_adk" / "docs"
+    assert infer_document_metadata(_touch(corpus / "fertility_leave.pdf"), corpus)["doc_type"] == UNKNOWN
+
+    corpus = tmp_path / "home" / "bill" / "act" / "docs"
+    assert infer_document_metadata(_touch(corpus / "uk" / "guidance" / "leave.pdf"), corpus)["doc_type"] == "guidance"
+
+    corpus = tmp_path / "Users" / "ca" / "docs"
+    assert infer_document_metadata(_touch(corpus / "us" / "research.pdf"), corpus) == {
+        "tenant": DEFAULT_TENANT,
+        "jurisdiction": "us",
+        "doc_type": "research",
+    }
+
+
+def test_metadata_files_are_read_from_root_down_and_sidecar_wins(tmp_path):
+    corpus = tmp_path / "docs"
+    document = _touch(corpus / "acme" / "uk" / "report.pdf")
+    (tmp_path / "metadata.json").write_text(json.dumps({"tenant": "outside"}))
+    (corpus / "metadata.json").write_text(json.dumps({"jurisdiction": "EU"}))
+    (corpus / "acme" / "metadata.json").write_text(json.dumps({"tenant": "Acme", "doc_type": "policy"}))
+    (corpus / "acme" / "uk" / "report.pdf.meta.json").write_text(json.dumps({"doc_type": "case law"}))
+
+    assert infer_document_metadata(document, corpus) == {
+        "tenant": "acme",
+        "jurisdiction": "eu",
+        "doc_type": "case-law",
+    }
+
+
+def test_without_root_only_the_documents_directory_counts(tmp_path):
+    document = _touch(tmp_path / "uk" / "legislation" / "notes.pdf")
+    (tmp_path / "uk" / "metadata.json").write_text(json.dumps({"tenant": "acme"}))
+
+    assert infer_document_metadata(document) == {
+        "tenant": DEFAULT_TENANT,
+        "jurisdiction": UNKNOWN,
+        "doc_type": UNKNOWN,
+    }
+
+
+def test_invalid_metadata_file_is_ignored(tmp_path):
+    document = _touch(tmp_path / "us" / "policy.pdf")
+    (tmp_path / "metadata.json").write_text("{not json")
+
+    assert infer_document_metadata(document, tmp_path)["jurisdiction"] == "us"
+
+
+def test_namespace_round_trip(monkeypatch):
+    monkeypatch.setattr(document_metadata, "NAMESPACE_FIELDS", ("tenant", "jurisdiction"))
+
+    assert build_namespace({"tenant": DEFAULT_TENANT, "jurisdiction": "United Kingdom"}) == "jurisdiction-uk"
+    assert build_namespace({"tenant": "acme", "jurisdiction": "us"}) == "tenant-acme.jurisdiction-us"
+    assert parse_namespace("tenant-acme.jurisdiction-us") == {"tenant": "acme", "jurisdiction": "us"}
+    assert parse_namespace("something-else") is None
+    # Written before jurisdiction became a namespace field, so it cannot be matched on it
+    assert parse_namespace("") is None
+
+
+def test_default_tenant_keeps_default_namespace():
+    assert build_namespace({"tenant": DEFAULT_TENANT, "jurisdiction": "uk"}) == ""
+    assert build_namespace({"tenant": "acme"}) == "tenant-acme"
+
+
+def test_normalize_filters():
+    assert normalize_filters({"jurisdiction": ["England", "usa"], "doc_type": ""}) == {
+        "jurisdiction": ["uk", "us"],
+        "tenant": [DEFAULT_TENANT],
+    }
+    with pytest.raises(ValueError):
+        normalize_filters({"colour": "red"})
+    with pytest.raises(ValueError):
+        normalize_filters({"tenant": ["a", "b"]})
+
+
+def test_matches_filters_defaults_missing_fields():
+    filters = normalize_filters({"jurisdiction": "uk"})
+
+    assert matches_filters({"jurisdiction": "uk"}, filters)
+    assert not matches_filters({"jurisdiction": "us"}, filters)
+    assert not matches_filters({}, filters)
+    assert not matches_filters({"jurisdiction": "uk", "tenant": "acme"}, filters)
+
+
+def test_residual_and_pinecone_filters():
+    filters = normalize_filters({"jurisdiction": ["uk", "us"], "doc_type": "guidance"})
+
+    assert residual_filters(filters) == {"jurisdiction": ["uk", "us"], "doc_type": ["guidance"]}
+    assert to_pinecone_filter(residual_filters(filters)) == {
+        "jurisdiction": {"$in": ["uk", "us"]},
+        "doc_type": {"$eq": "guidance"},
+    }
+    assert residual_filters(normalize_filters({})) is None
+    assert to_pinecone_filter(None) is None
+
+
+def test_select_namespaces(monkeypatch):
+    assert select_namespaces(normalize_filters({"tenant": "acme"})) == ["tenant-acme"]
+
+    monkeypatch.setattr(document_metadata, "NAMESPACE_FIELDS", ("tenant", "jurisdiction"))
+    filters = normalize_filters({"jurisdiction": ["uk", "us"]})
+    assert select_namespaces(filters) is None
+    available = ["", "jurisdiction-uk", "jurisdiction-us", "jurisdiction-eu", "tenant-acme.jurisdiction-uk", "other"]
+    assert select_namespaces(filters, available) == ["jurisdiction-uk", "jurisdiction-us"]
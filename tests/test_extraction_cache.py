@@ -0,0 +1,113 @@
+import os
+
+import fitz
+import pytest
+
+from src_pulse import embedding_utils, extraction_cache
+from src_pulse.extraction_cache import ExtractionCache
+
+
+def _entry_size(cache, key):
+    return cache._entry_path(key).stat().st_size
+
+
+def _write_pdf(path, text):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), text)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    (tmp_path / "a" / "doc.pdf").write_bytes(b"same content")
+    (tmp_path / "b" / "renamed.pdf").write_bytes(b"same content")
+    key = cache.make_key(tmp_path / "a" / "doc.pdf", "2")
+
+    assert cache.get(key) is None
+    cache.put(key, "extracted text")
+    assert cache.get(key) == "extracted text"
+    # Keyed by content, so a moved or renamed copy hits
+    assert cache.make_key(tmp_path / "b" / "renamed.pdf", "2") == key
+    assert cache.make_key(tmp_path / "a" / "doc.pdf", "3") != key
+
+
+def test_rewriting_an_entry_keeps_the_size_accurate(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache", max_bytes=10_000)
+    cache.put("aa01", "x" * 100)
+    cache.put("bb02", "y" * 100)
+    for _ in range(20):
+        cache.put("bb02", "z" * 300)
+
+    assert cache._size == cache.size() == 400
+    assert len(list((tmp_path / "cache").glob("*/*.txt"))) == 2
+
+
+def test_least_recently_used_entries_are_evicted_to_90_percent(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache", max_bytes=1000)
+    for age, key in enumerate(["aa01", "bb02", "cc03"]):
+        cache.put(key, "x" * 300)
+        os.utime(cache._entry_path(key), (1000 + age, 1000 + age))
+    # Reading refreshes an entry, so the oldest write is no longer the least recently used
+    assert cache.get("aa01") is not None
+
+    cache.put("dd04", "x" * 300)
+
+    assert cache.get("bb02") is None
+    assert all(cache.get(key) for key in ["aa01", "cc03", "dd04"])
+    assert cache._size == cache.size() == 900 <= 0.9 * cache.max_bytes
+
+
+def test_clear(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    cache.put("aa01", "text")
+
+    cache.clear()
+
+    assert cache.get("aa01") is None and cache.size() == 0
+
+
+@pytest.fixture
+def counted_pdf_extraction(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction_cache, "_default_cache", ExtractionCache(tmp_path / "cache"))
+    calls = []
+    extract_text_from_pdf = embedding_utils.extract_text_from_pdf
+    monkeypatch.setattr(embedding_utils, "extract_text_from_pdf",
+                        lambda file_path: calls.append(file_path) or extract_text_from_pdf(file_path))
+    return calls
+
+
+def test_extract_text_reuses_cached_text(tmp_path, counted_pdf_extraction):
+    pdf = _write_pdf(tmp_path / "leave.pdf", "Fertility leave policy for all employees")
+
+    first = embedding_utils.extract_text(pdf)
+    second = embedding_utils.extract_text(pdf)
+
+    assert "Fertility leave policy" in first and second == first
+    assert len(counted_pdf_extraction) == 1
+    assert embedding_utils.extract_text(pdf, use_cache=False) == first
+    assert len(counted_pdf_extraction) == 2
+
+
+@pytest.mark.parametrize("setting, value", [("EXTRACTOR_VERSION", "next"), ("OCR_DPI", 300)])
+def test_extraction_settings_invalidate_cached_text(tmp_path, counted_pdf_extraction, monkeypatch, setting, value):
+    pdf = _write_pdf(tmp_path / "leave.pdf", "Fertility leave policy for all employees")
+    embedding_utils.extract_text(pdf)
+
+    monkeypatch.setattr(embedding_utils, setting, value)
+    embedding_utils.extract_text(pdf)
+    embedding_utils.extract_text(pdf)
+
+    assert len(counted_pdf_extraction) == 2
+
+
+def test_removed_cache_directory_is_recreated(tmp_path):
+    cache = ExtractionCache(tmp_path / "cache")
+    (tmp_path / "cache").rmdir()
+
+    cache.put("aa01", "text")
+
+    assert cache.get("aa01") == "text"
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+from src_pulse.ai_agent import aretrieve_relevant_chunks, retrieve_relevant_chunks
+from src_pulse.lexical_index import get_lexical_index
+from src_pulse.vector_store import get_vector_store
+
+
+def _record(chunk_id, text, tenant="default", jurisdiction="uk", doc_type="guidance"):
+    return {
+        "id": chunk_id,
+        "text": text,
+        "metadata": json.dumps({"filename": f"{chunk_id}.pdf"}),
+        "source_files": [f"{chunk_id}.pdf"],
+        "tenant": tenant,
+        "jurisdiction": jurisdiction,
+        "doc_type": doc_type,
+    }
+
+
+def _build_corpus(index_name):
+    # US chunks dominate BM25 for "zebra"; only UK chunks pass a jurisdiction filter
+    records = [_record(f"us{i}", "zebra " * 8 + f"statute {i}", jurisdiction="us") for i in range(10)]
+    records += [_record(f"uk{i}", f"zebra clause about fertility leave policy number {i}") for i in range(6)]
+    records += [_record(f"acme{i}", "zebra " * 8 + f"acme handbook {i}", tenant="acme") for i in range(4)]
+    store = get_vector_store(index_name)
+    store.upsert_records(None, records)
+    get_lexical_index(index_name).add([r["id"] for r in records], [r["text"] for r in records])
+
+
+def test_filtered_hybrid_search_fills_top_k(local_backend):
+    _build_corpus(local_backend)
+
+    hits = retrieve_relevant_chunks("zebra statute", local_backend, None, top_k=5, hybrid=True,
+                                    use_cache=False, filters={"jurisdiction": "UK"})
+
+    assert len(hits) == 5
+    assert all(hit["id"].startswith("uk") for hit in hits)
+
+
+def test_filtered_hybrid_search_async_fills_top_k(local_backend):
+    _build_corpus(local_backend)
+
+    hits = asyncio.run(aretrieve_relevant_chunks("zebra statute", local_backend, None, top_k=5, hybrid=True,
+                                                 use_cache=False, filters={"jurisdiction": "uk"}))
+
+    assert len(hits) == 5
+    assert all(hit["id"].startswith("uk") for hit in hits)
+
+
+def test_lexical_hits_never_cross_tenants(local_backend):
+    _build_corpus(local_backend)
+
+    default_hits = retrieve_relevant_chunks("zebra acme handbook", local_backend, None, top_k=8, hybrid=True, use_cache=False)
+    acme_hits = retrieve_relevant_chunks("zebra statute", local_backend, None, top_k=8, hybrid=True, use_cache=False,
+                                         filters={"tenant": "acme"})
+
+    assert default_hits and not any(hit["id"].startswith("acme") for hit in default_hits)
+    assert acme_hits and all(hit["id"].startswith("acme") for hit in acme_hits)
+
+
+def test_doc_type_filter_applies_to_vector_hits(local_backend):
+    store = get_vector_store(local_backend)
+    store.upsert_records(None, [
+        _record("g", "fertility leave guidance", doc_type="guidance"),
+        _record("l", "fertility leave legislation", doc_type="legislation"),
+    ])
+
+    hits = retrieve_relevant_chunks("fertility leave", local_backend, None, top_k=5, hybrid=False, use_cache=False,
+                                    filters={"doc_type": "legislation"})
+
+    assert [hit["id"] for hit in hits] == ["l"]
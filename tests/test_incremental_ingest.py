@@ -0,0 +1,85 @@
+import pytest
+from tqdm import tqdm
+
+from src_pulse import embedding_utils
+from src_pulse.dedup import chunk_content_id
+from src_pulse.embedding_utils import stream_directory_to_pinecone
+from src_pulse.vector_store import get_vector_store
+
+SHARED = "Employees may take up to twelve weeks of leave after the birth of a child."
+
+
+class ParagraphSplitter:
+    _chunk_size = 1000
+    _chunk_overlap = 0
+
+    def split_text(self, text):
+        return [paragraph for paragraph in text.split("\n\n") if paragraph.strip()]
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    # Plain-text documents, and a console progress bar since tests do not run in a notebook
+    monkeypatch.setattr(embedding_utils, "extract_text", lambda file_path, use_cache=True: file_path.read_text())
+    monkeypatch.setattr(embedding_utils, "tqdm", tqdm)
+    corpus = tmp_path / "docs"
+    corpus.mkdir()
+    return corpus
+
+
+def _write(path, *paragraphs):
+    path.write_text("\n\n".join(paragraphs))
+    return path
+
+
+def _source_files(index_name, chunk_id):
+    hit = get_vector_store(index_name).fetch([chunk_id]).get(chunk_id)
+    return None if hit is None else sorted(hit["metadata"]["source_files"])
+
+
+def _ingest(corpus, index_name, manifest_path):
+    return stream_directory_to_pinecone(corpus, ParagraphSplitter(), index_name, None, num_workers=1,
+                                        manifest_path=manifest_path)
+
+
+def test_changed_file_keeps_sources_of_unchanged_files(local_backend, corpus, tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    first = _write(corpus / "a.docx", SHARED, "Policy A covers adoption.")
+    second = _write(corpus / "b.docx", SHARED, "Policy B covers surrogacy.")
+
+    _ingest(corpus, local_backend, manifest_path)
+    shared_id = chunk_content_id(SHARED)
+    assert _source_files(local_backend, shared_id) == [str(first), str(second)]
+
+    # Only b.docx changes, so a.docx is not re-processed
+    _write(second, SHARED, "Policy B now also covers fostering.")
+    _ingest(corpus, local_backend, manifest_path)
+    assert _source_files(local_backend, shared_id) == [str(first), str(second)]
+
+
+def test_released_file_is_dropped_from_shared_sources(local_backend, corpus, tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    first = _write(corpus / "a.docx", SHARED, "Policy A covers adoption.")
+    second = _write(corpus / "b.docx", SHARED, "Policy B covers surrogacy.")
+    _ingest(corpus, local_backend, manifest_path)
+
+    # b.docx no longer contains the shared paragraph and a.docx is deleted
+    _write(second, "Policy B covers surrogacy.")
+    first.unlink()
+    result = _ingest(corpus, local_backend, manifest_path)
+
+    assert _source_files(local_backend, chunk_content_id(SHARED)) is None
+    assert _source_files(local_backend, chunk_content_id("Policy A covers adoption.")) is None
+    assert result["deleted"] == 2
+
+
+def test_removed_file_is_dropped_from_sources_of_remaining_files(local_backend, corpus, tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    first = _write(corpus / "a.docx", SHARED)
+    second = _write(corpus / "b.docx", SHARED, "Policy B covers surrogacy.")
+    _ingest(corpus, local_backend, manifest_path)
+
+    first.unlink()
+    _ingest(corpus, local_backend, manifest_path)
+
+    assert _source_files(local_backend, chunk_content_id(SHARED)) == [str(second)]
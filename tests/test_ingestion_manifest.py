@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+from src_pulse.ingestion_manifest import IngestionManifest, get_splitter_settings, hash_file
+
+SETTINGS = {"splitter": "RecursiveCharacterTextSplitter", "chunk_size": 1000, "chunk_overlap": 200}
+
+
+def test_hash_file_reads_in_blocks(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"x" * 10)
+
+    original = hash_file(path)
+    assert hash_file(path, block_size=3) == original
+    path.write_bytes(b"x" * 9 + b"y")
+    assert hash_file(path, block_size=3) != original
+
+
+def test_splitter_settings():
+    splitter = SimpleNamespace(_chunk_size=500, _chunk_overlap=50)
+
+    assert get_splitter_settings(splitter) == {"splitter": "SimpleNamespace", "chunk_size": 500, "chunk_overlap": 50}
+
+
+def test_needs_processing(tmp_path):
+    manifest = IngestionManifest(tmp_path / "manifest.json")
+    assert manifest.needs_processing("a.pdf", "h1", SETTINGS)
+
+    manifest.update_file("a.pdf", "h1", ["c1"], SETTINGS, namespace="tenant-acme")
+
+    assert not manifest.needs_processing("a.pdf", "h1", SETTINGS)
+    assert not manifest.needs_processing("a.pdf", "h1", SETTINGS, namespace="tenant-acme")
+    assert manifest.needs_processing("a.pdf", "h2", SETTINGS)
+    assert manifest.needs_processing("a.pdf", "h1", {**SETTINGS, "chunk_size": 500})
+    assert manifest.needs_processing("a.pdf", "h1", SETTINGS, namespace="")
+
+
+def test_released_ids_shared_with_other_files_are_not_stale(tmp_path):
+    manifest = IngestionManifest(tmp_path / "manifest.json")
+    manifest.update_file("a.pdf", "h1", ["shared", "a-only", "a-old"], SETTINGS)
+    manifest.update_file("b.pdf", "h1", ["shared", "b-only"], SETTINGS)
+    manifest.save()
+
+    manifest.update_file("a.pdf", "h2", ["a-only", "a-new"], SETTINGS)
+    manifest.update_file("b.pdf", "h2", ["shared"], SETTINGS)
+
+    assert manifest.get_stale_ids() == ["a-old", "b-only"]
+    assert manifest.get_stale_ids_by_namespace() == {"": ["a-old", "b-only"]}
+    assert manifest.get_released_sources_by_namespace() == {"": {"shared": ["b.pdf"]}}
+
+
+def test_namespace_move_releases_ids_from_the_old_namespace(tmp_path):
+    manifest = IngestionManifest(tmp_path / "manifest.json")
+    manifest.update_file("a.pdf", "h1", ["c1", "c2"], SETTINGS, namespace="jurisdiction-uk")
+    manifest.update_file("b.pdf", "h1", ["c2"], SETTINGS, namespace="jurisdiction-uk")
+    manifest.save()
+
+    manifest.update_file("a.pdf", "h1", ["c1", "c2"], SETTINGS, namespace="jurisdiction-us")
+
+    # Still produced in another namespace, so not stale for unnamespaced stores
+    assert manifest.get_stale_ids() == []
+    assert manifest.get_stale_ids_by_namespace() == {"jurisdiction-uk": ["c1"]}
+    assert manifest.get_released_sources_by_namespace() == {"jurisdiction-uk": {"c2": ["b.pdf"]}}
+
+
+def test_remove_missing(tmp_path):
+    manifest = IngestionManifest(tmp_path / "manifest.json")
+    manifest.update_file("a.pdf", "h1", ["shared", "a-only"], SETTINGS)
+    manifest.update_file("b.pdf", "h1", ["shared"], SETTINGS)
+    manifest.save()
+
+    assert manifest.remove_missing(["b.pdf"]) == ["a.pdf"]
+    assert manifest.get_stale_ids() == ["a-only"]
+    assert manifest.get_released_sources_by_namespace() == {"": {"shared": ["b.pdf"]}}
+
+
+def test_chunk_sources_can_exclude_files(tmp_path):
+    manifest = IngestionManifest(tmp_path / "manifest.json")
+    manifest.update_file("a.pdf", "h1", ["shared", "a-only"], SETTINGS)
+    manifest.update_file("b.pdf", "h1", ["shared"], SETTINGS, namespace="tenant-acme")
+    manifest.update_file("c.pdf", "h1", ["shared"], SETTINGS)
+
+    assert manifest.get_chunk_sources() == {
+        "": {"shared": ["a.pdf", "c.pdf"], "a-only": ["a.pdf"]},
+        "tenant-acme": {"shared": ["b.pdf"]},
+    }
+    assert manifest.get_chunk_sources(exclude=["a.pdf"]) == {
+        "": {"shared": ["c.pdf"]},
+        "tenant-acme": {"shared": ["b.pdf"]},
+    }
+
+
+def test_save_and_reload(tmp_path):
+    path = tmp_path / "nested" / "manifest.json"
+    manifest = IngestionManifest(path)
+    manifest.update_file("a.pdf", "h1", ["c1"], SETTINGS)
+    manifest.update_file("a.pdf", "h2", ["c2"], SETTINGS)
+    manifest.save()
+
+    assert manifest.get_stale_ids() == []
+    assert not (tmp_path / "nested" / "manifest.json.tmp").exists()
+    reloaded = IngestionManifest(path)
+    assert reloaded.files["a.pdf"]["chunk_ids"] == ["c2"]
+    assert not reloaded.needs_processing("a.pdf", "h2", SETTINGS)
+
+
+def test_corrupt_manifest_starts_fresh(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_text("{not json")
+
+    assert IngestionManifest(path).files == {}
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from src_pulse.ivf_index import IVF_FILE_NAME, IVFIndex
+from src_pulse.local_index import LocalVectorIndex, normalize_rows, resolve_index_directory
+
+
+def _clustered_index(num_rows=500, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(10, dim))
+    vectors = normalize_rows(centres[rng.integers(0, 10, num_rows)] + 0.2 * rng.normal(size=(num_rows, dim)))
+    index = LocalVectorIndex()
+    index.add([f"c{i}" for i in range(num_rows)], [f"text {i}" for i in range(num_rows)],
+              [{"jurisdiction": "uk" if i % 2 else "us"} for i in range(num_rows)], embeddings=vectors)
+    return index, vectors
+
+
+def test_partitions_cover_every_live_row():
+    index, _ = _clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+    ivf.build()
+
+    rows = np.sort(np.concatenate(ivf.lists))
+    assert list(rows) == list(range(len(index)))
+    assert ivf.centroids.shape == (16, 32)
+
+
+def test_exact_profile_matches_exact_search():
+    index, vectors = _clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+
+    approximate = ivf.search(vectors[:5], top_k=10, profile="exact")
+    exact = index.search(vectors[:5], top_k=10)
+
+    assert [[row for row, _ in hits] for hits in approximate] == [[row for row, _ in hits] for hits in exact]
+
+
+def test_narrow_search_still_finds_the_query_vector():
+    index, vectors = _clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+
+    for row in (0, 99, 321):
+        assert ivf.search(vectors[[row]], top_k=3, nprobe=2)[0][0][0] == row
+
+
+def test_filters_and_updates():
+    index, vectors = _clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+    ivf.build()
+
+    hits = ivf.search(vectors[:3], top_k=5, profile="exact", filters={"jurisdiction": ["uk"]})
+    assert all(index.metadatas[row]["jurisdiction"] == "uk" for query_hits in hits for row, _ in query_hits)
+
+    index.add(["extra"], ["extra"], embeddings=vectors[[4]] * -1)
+    index.delete(["c4"])
+    assert ivf.search(-vectors[[4]], top_k=1, profile="exact")[0][0][0] == index.ids.index("extra")
+    assert all(row != 4 for row, _ in ivf.search(vectors[[4]], top_k=5, profile="exact")[0])
+
+
+def test_grown_index_is_rebuilt():
+    index, vectors = _clustered_index(num_rows=50)
+    ivf = IVFIndex(index, rebuild_factor=2)
+    ivf.build()
+
+    index.add([f"n{i}" for i in range(100)], ["new"] * 100, embeddings=np.repeat(vectors[:1], 100, axis=0))
+    ivf.search(vectors[:1], top_k=1)
+
+    assert ivf.trained_rows == 150
+
+
+def test_save_and_load_after_compaction(tmp_path):
+    index, vectors = _clustered_index()
+    ivf = IVFIndex(index, nlist=16)
+    ivf.build()
+    index.delete(["c0", "c1"])
+    index.save(tmp_path)
+    ivf.save(tmp_path)
+
+    loaded_index = LocalVectorIndex.load(tmp_path)
+    loaded = IVFIndex.load(tmp_path, loaded_index)
+
+    assert (resolve_index_directory(tmp_path) / IVF_FILE_NAME).exists()
+    assert sorted(np.concatenate(loaded.lists)) == list(range(len(loaded_index)))
+    row = loaded.search(vectors[[10]], top_k=1, nprobe=4)[0][0][0]
+    assert loaded_index.ids[row] == "c10"
+
+
+def test_out_of_date_partitions_are_rebuilt(tmp_path):
+    index, _ = _clustered_index(num_rows=40)
+    ivf = IVFIndex(index)
+    ivf.build()
+    index.save(tmp_path)
+    ivf.save(tmp_path)
+    index.add(["extra"], ["extra"], embeddings=np.ones((1, 32)))
+    index.save(tmp_path)
+
+    loaded = IVFIndex.load(tmp_path, LocalVectorIndex.load(tmp_path))
+
+    assert loaded.num_indexed == 41
+
+
+def test_empty_index_returns_no_hits():
+    assert IVFIndex(LocalVectorIndex()).search(np.ones((2, 4)), top_k=3) == [[], []]
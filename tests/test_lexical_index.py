@@ -0,0 +1,91 @@
+import math
+from collections import Counter
+
+import pytest
+
+from src_pulse import lexical_index
+from src_pulse.lexical_index import BM25Index, get_lexical_index, reciprocal_rank_fusion, save_lexical_index, tokenize
+
+CORPUS = {
+    "a": "Fertility leave gives employees paid time off for fertility treatment.",
+    "b": "Parental leave is available to both parents after the birth of a child.",
+    "c": "The menopause policy covers flexible working and occupational health support.",
+    "d": "Employees undergoing IVF treatment may request flexible working.",
+    "e": "Fertility fertility fertility.",
+}
+
+
+def _bm25(query, corpus, k1=1.2, b=0.75):
+    # Reference implementation over plain dictionaries
+    docs = {chunk_id: Counter(tokenize(text)) for chunk_id, text in corpus.items()}
+    average_length = sum(sum(counts.values()) for counts in docs.values()) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        containing = [chunk_id for chunk_id, counts in docs.items() if term in counts]
+        idf = math.log(1 + (len(docs) - len(containing) + 0.5) / (len(containing) + 0.5))
+        for chunk_id in containing:
+            tf = docs[chunk_id][term]
+            norm = k1 * (1 - b + b * sum(docs[chunk_id].values()) / average_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * (k1 + 1) * tf / (tf + norm)
+    return scores
+
+
+def _index(corpus=CORPUS):
+    index = BM25Index()
+    index.add(list(corpus), list(corpus.values()))
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("The IVF policy, for employees!") == ["ivf", "policy", "employees"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+
+    assert fused[0][0] == "b"
+    assert dict(fused)["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert {chunk_id for chunk_id, _ in fused} == {"a", "b", "c", "d"}
+
+
+@pytest.mark.parametrize("query", ["fertility treatment", "flexible working", "parental leave birth", "ivf"])
+def test_scores_match_reference_bm25(query):
+    expected = _bm25(query, CORPUS)
+
+    hits = _index().search(query, top_k=10)
+
+    assert {chunk_id for chunk_id, _ in hits} == set(expected)
+    for chunk_id, score in hits:
+        assert score == pytest.approx(expected[chunk_id], rel=1e-5)
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_unknown_terms_and_empty_index():
+    assert _index().search("zebra") == []
+    assert BM25Index().search("fertility") == []
+
+
+def test_add_replaces_and_delete_removes():
+    index = _index()
+    index.add(["a"], ["Menopause support for staff."])
+    index.delete(["e", "unknown"])
+
+    corpus = {**CORPUS, "a": "Menopause support for staff."}
+    del corpus["e"]
+    assert len(index) == 4
+    assert "a" not in {chunk_id for chunk_id, _ in index.search("fertility treatment", top_k=10)}
+    assert dict(index.search("menopause support", top_k=10)) == pytest.approx(_bm25("menopause support", corpus))
+
+
+def test_save_load_and_named_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(lexical_index, "_lexical_indexes", {})
+    index = get_lexical_index("policies")
+    index.add(list(CORPUS), list(CORPUS.values()))
+    save_lexical_index("policies")
+
+    loaded = BM25Index.load(tmp_path / "policies.npz")
+
+    assert loaded.search("flexible working", top_k=3) == index.search("flexible working", top_k=3)
+    loaded.add(["f"], ["Flexible working request form."])
+    assert "f" in dict(loaded.search("flexible working", top_k=3))
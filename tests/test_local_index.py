@@ -0,0 +1,191 @@
+import numpy as np
+import pytest
+
+from src_pulse import local_index
+from src_pulse.local_index import (
+    CURRENT_VERSION_FILE,
+    HashingEmbedder,
+    LocalVectorIndex,
+    blocked_top_k,
+    get_local_index,
+    normalize_rows,
+    resolve_index_directory,
+)
+
+
+def _random_index(num_rows=300, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(num_rows, dim)).astype(np.float32)
+    index = LocalVectorIndex()
+    index.add([f"c{i}" for i in range(num_rows)], [f"text {i}" for i in range(num_rows)],
+              [{"jurisdiction": "uk" if i % 2 else "us"} for i in range(num_rows)], embeddings=vectors)
+    return index, normalize_rows(vectors), rng
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder(["Fertility leave policy", "fertility leave policy", ""])
+
+    assert vectors.shape == (3, 64)
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 65536])
+def test_blocked_top_k_matches_full_sort(block_size):
+    index, vectors, rng = _random_index()
+    queries = normalize_rows(rng.normal(size=(5, vectors.shape[1])))
+    deleted = np.zeros(len(vectors), dtype=bool)
+    deleted[::10] = True
+
+    results = blocked_top_k(lambda q, start, end: q @ vectors[start:end].T, queries, len(vectors), deleted, 8,
+                            block_size, query_batch_size=2)
+
+    for query, hits in zip(queries, results):
+        scores = vectors @ query
+        scores[deleted] = -np.inf
+        assert [row for row, _ in hits] == list(np.argsort(-scores)[:8])
+
+
+def test_search_finds_the_query_vector_itself():
+    index, vectors, _ = _random_index()
+
+    hits = index.search(vectors[[3, 42]], top_k=3)
+
+    assert [row for row, _ in hits[0]][0] == 3
+    assert [row for row, _ in hits[1]][0] == 42
+    assert hits[0][0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_add_replaces_and_delete_hides_rows():
+    index = LocalVectorIndex()
+    index.add(["a", "b"], ["fertility leave", "parental leave"])
+    index.add(["a"], ["menopause support"])
+    index.delete(["b", "unknown"])
+
+    assert len(index) == 1
+    assert index.fetch(["a", "b"])["a"]["text"] == "menopause support"
+    assert [hit["id"] for hit in index.query(["parental leave"], top_k=5)[0]] == ["a"]
+
+
+def test_filters_skip_rows_that_do_not_match():
+    index, vectors, _ = _random_index()
+
+    hits = index.search(vectors[:4], top_k=10, filters={"jurisdiction": ["uk"]})
+
+    assert all(index.metadatas[row]["jurisdiction"] == "uk" for query_hits in hits for row, _ in query_hits)
+    assert all(len(query_hits) == 10 for query_hits in hits)
+
+
+def test_missing_tenant_counts_as_default_tenant():
+    index = LocalVectorIndex()
+    index.add(["a", "b"], ["one", "two"], [{}, {"tenant": "acme"}])
+
+    assert list(index.filter_mask({"tenant": ["default"]})) == [False, True]
+
+
+def test_update_metadata_invalidates_filter_cache():
+    index = LocalVectorIndex()
+    index.add(["a"], ["fertility leave"], [{"jurisdiction": "uk"}])
+    assert index.query(["fertility leave"], filters={"jurisdiction": ["us"]}) == [[]]
+
+    index.update_metadata("a", {"jurisdiction": "us"})
+
+    assert [hit["id"] for hit in index.query(["fertility leave"], filters={"jurisdiction": ["us"]})[0]] == ["a"]
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_save_and_load_round_trip(tmp_path, use_mmap):
+    index, vectors, _ = _random_index(num_rows=50)
+    index.delete(["c0"])
+    index.save(tmp_path / "idx", dtype="float32")
+
+    loaded = LocalVectorIndex.load(tmp_path / "idx", use_mmap=use_mmap)
+
+    assert len(loaded) == 49
+    assert loaded.fetch(["c0"]) == {}
+    assert loaded.fetch(["c7"])["c7"]["metadata"] == {"jurisdiction": "uk"}
+    assert np.allclose(loaded.get_embeddings(["c7"])[0], vectors[7], atol=1e-6)
+    row, score = loaded.search(vectors[[7]], top_k=1)[0][0]
+    assert loaded.ids[row] == "c7" and score == pytest.approx(1.0, abs=1e-5)
+
+    # A loaded index can be written to
+    loaded.add(["new"], ["new text"], embeddings=vectors[[0]])
+    assert loaded.fetch(["new"])["new"]["text"] == "new text"
+
+
+def test_float16_storage_keeps_ranking(tmp_path):
+    index, vectors, _ = _random_index(num_rows=50)
+    index.save(tmp_path / "idx", dtype="float16")
+
+    loaded = LocalVectorIndex.load(tmp_path / "idx")
+
+    assert loaded.embeddings.dtype == np.float16
+    assert loaded.search(vectors[[5]], top_k=1)[0][0][0] == 5
+
+
+def test_load_rejects_unknown_format(tmp_path):
+    index, _, _ = _random_index(num_rows=5)
+    index.save(tmp_path / "idx")
+    (resolve_index_directory(tmp_path / "idx") / "header.json").write_text('{"format_version": 99}')
+
+    with pytest.raises(ValueError):
+        LocalVectorIndex.load(tmp_path / "idx")
+
+
+def test_save_swaps_versions_and_keeps_the_previous_one(tmp_path):
+    index, _, _ = _random_index(num_rows=5)
+    directory = tmp_path / "idx"
+    versions = []
+    for _ in range(3):
+        index.save(directory)
+        versions.append(resolve_index_directory(directory))
+
+    assert (directory / CURRENT_VERSION_FILE).read_text() == versions[-1].name
+    assert sorted(path.name for path in directory.iterdir() if path.is_dir()) == [versions[1].name, versions[2].name]
+    assert len(LocalVectorIndex.load(directory)) == 5
+
+
+def test_unversioned_index_is_loaded_and_replaced(tmp_path):
+    index, _, _ = _random_index(num_rows=5)
+    index.save(tmp_path / "idx")
+    # Layout written before versioned saves: the files directly in the index directory
+    legacy = tmp_path / "legacy"
+    resolve_index_directory(tmp_path / "idx").rename(legacy)
+
+    assert len(LocalVectorIndex.load(legacy)) == 5
+
+    index.delete(["c0"])
+    index.save(legacy)
+    assert not (legacy / "header.json").exists()
+    assert len(LocalVectorIndex.load(legacy)) == 4
+
+
+def test_index_can_be_loaded_at_every_step_of_a_save(tmp_path, monkeypatch):
+    index, _, _ = _random_index(num_rows=20)
+    directory = tmp_path / "idx"
+    index.save(directory)
+    replace, loaded = local_index.os.replace, []
+
+    def replace_then_load(source, target):
+        replace(source, target)
+        # What a concurrent reader sees right after each rename of the save
+        loaded.append(len(LocalVectorIndex.load(directory)))
+
+    monkeypatch.setattr(local_index.os, "replace", replace_then_load)
+    index.delete(["c0"])
+    index.save(directory)
+
+    assert loaded == [19]
+
+
+def test_get_local_index_loads_saved_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(local_index, "LOCAL_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(local_index, "_local_indexes", {})
+    index, _, _ = _random_index(num_rows=5)
+    index.save(tmp_path / "saved")
+
+    assert len(get_local_index("saved")) == 5
+    assert len(get_local_index("fresh")) == 0
+    assert local_index.list_local_indexes() == ["fresh", "saved"]
@@ -0,0 +1,78 @@
+import numpy as np
+
+from src_pulse.mmr import mmr_rerank, mmr_select
+
+
+def _unit(*rows):
+    rows = np.array(rows, dtype=np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def _reference_mmr(relevance, embeddings, top_k, lambda_mult):
+    selected, remaining = [], list(range(len(relevance)))
+    while remaining and len(selected) < top_k:
+        def score(i):
+            redundancy = max((float(embeddings[i] @ embeddings[j]) for j in selected), default=0.0)
+            return lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy if selected else relevance[i]
+        best = max(remaining, key=score)
+        selected.append(best)
+        remaining.remove(best)
+    return selected
+
+
+def test_lambda_one_ranks_by_relevance():
+    relevance = np.array([0.2, 0.9, 0.5, 0.7])
+    embeddings = _unit([1, 0], [1, 0.01], [0, 1], [1, 0.02])
+
+    assert mmr_select(relevance, embeddings, 3, lambda_mult=1.0) == [1, 3, 2]
+
+
+def test_near_duplicate_is_skipped_for_a_diverse_candidate():
+    relevance = np.array([1.0, 0.95, 0.6])
+    embeddings = _unit([1, 0], [1, 0.01], [0, 1])
+
+    assert mmr_select(relevance, embeddings, 2, lambda_mult=0.5) == [0, 2]
+
+
+def test_matches_reference_implementation():
+    rng = np.random.default_rng(3)
+    embeddings = _unit(*rng.normal(size=(40, 16)))
+    relevance = rng.random(40)
+
+    for lambda_mult in (0.0, 0.3, 0.7, 1.0):
+        assert mmr_select(relevance, embeddings, 10, lambda_mult) == _reference_mmr(relevance, embeddings, 10, lambda_mult)
+
+
+def test_select_handles_small_inputs():
+    embeddings = _unit([1, 0], [0, 1])
+
+    assert mmr_select(np.array([0.1, 0.4]), embeddings, 5) == [1, 0]
+    assert mmr_select(np.array([]), np.zeros((0, 2), dtype=np.float32), 3) == []
+
+
+def test_rerank_returns_hits_unchanged_when_few():
+    hits = [{"text": "a", "score": 0.9}, {"text": "b", "score": 0.5}]
+
+    assert mmr_rerank(hits, 2) == hits
+
+
+def test_rerank_uses_given_embeddings():
+    hits = [
+        {"id": "a", "text": "", "score": 0.9},
+        {"id": "a-copy", "text": "", "score": 0.88},
+        {"id": "b", "text": "", "score": 0.5},
+    ]
+    embeddings = [[1, 0], [1, 0.01], [0, 1]]
+
+    assert [hit["id"] for hit in mmr_rerank(hits, 2, embeddings, lambda_mult=0.5)] == ["a", "b"]
+
+
+def test_rerank_embeds_texts_when_no_embeddings():
+    statute = "The employer must grant fertility leave of up to ten days per year."
+    hits = [
+        {"id": "first", "text": statute, "score": 0.9},
+        {"id": "copy", "text": statute, "score": 0.89},
+        {"id": "other", "text": "Appeals are heard by the employment tribunal within six weeks.", "score": 0.6},
+    ]
+
+    assert [hit["id"] for hit in mmr_rerank(hits, 2, lambda_mult=0.5)] == ["first", "other"]
@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import docx
+import pytest
+from tqdm import tqdm
+
+from src_pulse import embedding_utils, extraction_cache
+from src_pulse.embedding_utils import iter_processed_files, process_directory
+from src_pulse.extraction_cache import ExtractionCache
+
+
+class LineSplitter:
+    _chunk_size = 1000
+    _chunk_overlap = 0
+
+    def split_text(self, text):
+        return [line for line in text.splitlines() if line.strip()]
+
+
+class CountingExecutor(ProcessPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        CountingExecutor.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def _write_docx(path, paragraphs):
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+    return path
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    # Forked workers inherit this cache, so no test reuses text extracted by another
+    monkeypatch.setattr(extraction_cache, "_default_cache", ExtractionCache(tmp_path / "cache"))
+    monkeypatch.setattr(embedding_utils, "tqdm", tqdm)
+    corpus = tmp_path / "docs"
+    corpus.mkdir()
+    # The first file is much larger, so later files finish first
+    _write_docx(corpus / "a_handbook.docx", [f"Handbook paragraph {i} on leave." for i in range(3000)])
+    for i in range(1, 9):
+        _write_docx(corpus / f"policy_{i}.docx", [f"Policy {i} covers fertility leave.", f"Policy {i} covers adoption."])
+    (corpus / "policy_5_corrupt.docx").write_bytes(b"not a zip archive")
+    return corpus
+
+
+def test_parallel_results_match_sequential_order(corpus):
+    sequential = process_directory(corpus, LineSplitter(), num_workers=1, deduplicate=False)
+    parallel = process_directory(corpus, LineSplitter(), num_workers=2, deduplicate=False)
+
+    assert [doc["id"] for doc in parallel] == [doc["id"] for doc in sequential]
+    assert [doc["metadata"]["file_path"] for doc in parallel] == [doc["metadata"]["file_path"] for doc in sequential]
+    assert len(parallel) == 3000 + 8 * 2
+
+
+def test_failing_file_is_isolated(corpus):
+    files = embedding_utils.find_supported_files(corpus)
+
+    results = dict(iter_processed_files(files, LineSplitter(), num_workers=2))
+
+    assert results[corpus / "policy_5_corrupt.docx"] == []
+    assert [doc["text"] for doc in results[corpus / "policy_6.docx"]] == ["Policy 6 covers fertility leave.",
+                                                                           "Policy 6 covers adoption."]
+    assert all(results[path] for path in files if path.name != "policy_5_corrupt.docx")
+
+
+def test_files_in_flight_are_bounded(corpus, monkeypatch):
+    monkeypatch.setattr(embedding_utils, "ProcessPoolExecutor", CountingExecutor)
+    monkeypatch.setattr(CountingExecutor, "submitted", 0)
+    files = embedding_utils.find_supported_files(corpus)
+
+    in_flight = []
+    for consumed, _ in enumerate(iter_processed_files(files, LineSplitter(), num_workers=2), start=1):
+        in_flight.append(CountingExecutor.submitted - consumed)
+
+    # Two workers keep at most 2 x 2 files submitted ahead of the consumer
+    assert CountingExecutor.submitted == len(files)
+    assert max(in_flight) == 2 * 2 and len(files) > 4
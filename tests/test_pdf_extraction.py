@@ -0,0 +1,117 @@
+import threading
+import time
+
+import fitz
+import pytest
+
+from src_pulse import embedding_utils
+from src_pulse.embedding_utils import extract_text_from_pdf
+
+
+def _write_pdf(path, pages):
+    """
+    Build a PDF from page specs: a string is a text page, an int a scanned page
+    whose image has that gray level, None a blank page
+    """
+    doc = fitz.open()
+    for spec in pages:
+        page = doc.new_page()
+        if isinstance(spec, str):
+            page.insert_text((72, 72), spec)
+        elif spec is not None:
+            pixmap = fitz.Pixmap(fitz.csGRAY, fitz.IRect(0, 0, 8, 8), False)
+            pixmap.set_rect(pixmap.irect, (spec,))
+            page.insert_image(fitz.Rect(72, 72, 272, 272), pixmap=pixmap)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def fake_ocr(monkeypatch):
+    """
+    Replace tesseract with a recognizer that reads back the gray level of the scanned image
+    """
+    calls = []
+
+    def image_to_string(image):
+        calls.append(image.size)
+        return f"scanned page {image.getextrema()[0]}"
+
+    monkeypatch.setattr(embedding_utils.pytesseract, "image_to_string", image_to_string)
+    return calls
+
+
+def test_rendered_pages_in_memory_are_bounded_by_workers(tmp_path, fake_ocr, monkeypatch):
+    pdf = _write_pdf(tmp_path / "handbook.pdf", [10 + i for i in range(12)])
+    get_pixmap, ocr = fitz.Page.get_pixmap, embedding_utils._ocr_pixmap_samples
+    lock, counts = threading.Lock(), {"rendered": 0, "done": 0, "peak": 0}
+
+    def counted_get_pixmap(page, *args, **kwargs):
+        with lock:
+            counts["rendered"] += 1
+            counts["peak"] = max(counts["peak"], counts["rendered"] - counts["done"])
+        return get_pixmap(page, *args, **kwargs)
+
+    def slow_ocr(width, height, samples):
+        time.sleep(0.01)
+        text = ocr(width, height, samples)
+        with lock:
+            counts["done"] += 1
+        return text
+
+    monkeypatch.setattr(fitz.Page, "get_pixmap", counted_get_pixmap)
+    monkeypatch.setattr(embedding_utils, "_ocr_pixmap_samples", slow_ocr)
+
+    text = extract_text_from_pdf(pdf, dpi=50, max_workers=2)
+
+    assert len(fake_ocr) == 12 and text.count("scanned page") == 12
+    # Peak memory depends on the number of workers, not on the 12 pages
+    assert counts["peak"] == 2
+
+
+def test_render_resolution_follows_dpi(tmp_path, fake_ocr):
+    pdf = _write_pdf(tmp_path / "scan.pdf", [40])
+
+    extract_text_from_pdf(pdf, dpi=72)
+    extract_text_from_pdf(pdf, dpi=144)
+
+    (width, height), (double_width, double_height) = fake_ocr
+    assert (double_width, double_height) == (2 * width, 2 * height)
+
+
+def test_only_scanned_pages_are_ocred_and_page_order_is_kept(tmp_path, fake_ocr, monkeypatch):
+    pdf = _write_pdf(tmp_path / "mixed.pdf", [
+        "Section 1 sets out the fertility leave entitlement.",
+        30,
+        None,
+        "Section 2 covers appeals.",
+        "p. 5",
+        60,
+    ])
+    ocr = embedding_utils._ocr_pixmap_samples
+
+    def out_of_order_ocr(width, height, samples):
+        # The first scanned page finishes last
+        text = ocr(width, height, samples)
+        time.sleep(0.05 if text.endswith(" 30") else 0)
+        return text
+
+    monkeypatch.setattr(embedding_utils, "_ocr_pixmap_samples", out_of_order_ocr)
+
+    text = extract_text_from_pdf(pdf, dpi=50, max_workers=2)
+
+    assert len(fake_ocr) == 2
+    assert [line for line in text.splitlines() if line.strip()] == [
+        "Section 1 sets out the fertility leave entitlement.",
+        "scanned page 30",
+        "Section 2 covers appeals.",
+        "scanned page 60",
+    ]
+
+
+def test_text_only_pdf_skips_ocr(tmp_path, fake_ocr):
+    pdf = _write_pdf(tmp_path / "act.pdf", ["Section 1 sets out the fertility leave entitlement."] * 3)
+
+    assert extract_text_from_pdf(pdf).count("Section 1") == 3
+    assert fake_ocr == []
@@ -0,0 +1,31 @@
+import asyncio
+
+from src_pulse.pinecone_registry import PineconeRegistry
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.is_closed = False
+
+    async def aclose(self):
+        self.is_closed = True
+
+
+def test_aclose_async_client_closes_only_the_running_loops_client():
+    registry = PineconeRegistry()
+    other_loop = asyncio.new_event_loop()
+    other_client = registry._async_clients[other_loop] = FakeAsyncClient()
+    client = FakeAsyncClient()
+
+    async def _use_and_close():
+        registry._async_clients[asyncio.get_running_loop()] = client
+        await registry.aclose_async_client()
+        # Closing again, or a loop that never made a request, is a no-op
+        await registry.aclose_async_client()
+
+    asyncio.run(_use_and_close())
+
+    assert client.is_closed
+    assert not other_client.is_closed
+    assert list(registry._async_clients.keys()) == [other_loop]
+    other_loop.close()
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from src_pulse.local_index import HashingEmbedder, LocalVectorIndex, normalize_rows
+from src_pulse.quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer, evaluate_quantization
+
+
+def _clustered_index(num_rows=400, dim=32, seed=0):
+    # Vectors around a few centres, like embeddings of related documents
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(8, dim))
+    vectors = normalize_rows(centres[rng.integers(0, 8, num_rows)] + 0.3 * rng.normal(size=(num_rows, dim)))
+    index = LocalVectorIndex(embed_fn=HashingEmbedder(dim=dim))
+    index.add([f"c{i}" for i in range(num_rows)], [f"text {i}" for i in range(num_rows)], embeddings=vectors)
+    return index, vectors
+
+
+def test_scalar_quantizer_round_trip_and_scores():
+    _, vectors = _clustered_index()
+    quantizer = ScalarQuantizer().train(vectors)
+    codes = quantizer.encode(vectors)
+
+    assert codes.dtype == np.int8
+    assert np.abs(quantizer.decode(codes) - vectors).max() <= quantizer.scale.max()
+    queries = vectors[:3]
+    assert np.allclose(quantizer.score_fn(codes)(queries, 0, len(codes)), queries @ quantizer.decode(codes).T, atol=1e-4)
+
+
+def test_product_quantizer_codes_and_lookup_tables():
+    _, vectors = _clustered_index()
+    quantizer = ProductQuantizer(num_subvectors=4, num_centroids=16, iterations=5).train(vectors)
+    codes = quantizer.encode(vectors)
+
+    assert codes.shape == (len(vectors), 4) and codes.dtype == np.uint8
+    queries = vectors[:3]
+    assert np.allclose(quantizer.score_fn(codes)(queries, 0, len(codes)), queries @ quantizer.decode(codes).T, atol=1e-4)
+
+
+def test_product_quantizer_rejects_indivisible_dimension():
+    with pytest.raises(ValueError):
+        ProductQuantizer(num_subvectors=5).train(np.zeros((10, 32), dtype=np.float32))
+
+
+@pytest.mark.parametrize("mode", ["int8", "pq"])
+def test_reranked_search_matches_exact_top_hit(mode):
+    index, vectors = _clustered_index()
+    quantized = QuantizedIndex(index, mode=mode, rerank_factor=8)
+
+    for row in (0, 17, 250):
+        hits = quantized.search(vectors[[row]], top_k=5)[0]
+        assert hits[0][0] == row
+        assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_new_and_deleted_rows_are_seen_on_next_search():
+    index, vectors = _clustered_index()
+    quantized = QuantizedIndex(index, mode="int8")
+
+    index.add(["extra"], ["extra"], embeddings=-vectors[[0]])
+    index.delete(["c1"])
+
+    assert quantized.search(-vectors[[0]], top_k=1)[0][0][0] == index.ids.index("extra")
+    assert all(row != 1 for row, _ in quantized.search(vectors[[1]], top_k=10)[0])
+
+
+def test_unknown_mode_and_empty_index():
+    with pytest.raises(ValueError):
+        QuantizedIndex(LocalVectorIndex(), mode="binary")
+    assert QuantizedIndex(LocalVectorIndex()).search(np.ones((1, 4)), top_k=3) == [[]]
+
+
+def test_memory_report_and_evaluation():
+    index, _ = _clustered_index()
+
+    report = evaluate_quantization(index, ["text 1", "text 2"], top_k=5, modes=("int8",))
+
+    assert report["int8"]["memory_saved"] > 0.7
+    assert 0.0 <= report["int8"]["recall_at_k_no_rerank"] <= report["int8"]["recall_at_k"] <= 1.0
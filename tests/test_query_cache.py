@@ -0,0 +1,84 @@
+import pytest
+
+from src_pulse import query_cache
+from src_pulse.query_cache import MemoryQueryCache, get_query_cache, invalidate_query_cache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_normalize_query():
+    assert normalize_query("  What is Fertility\nLeave?? ") == "what is fertility leave"
+
+
+def test_key_depends_on_query_options_and_index():
+    cache = MemoryQueryCache()
+    key = cache.make_key("Fertility leave?", "docs", 5, profile="fast", hybrid=True)
+
+    assert key == cache.make_key("fertility   LEAVE", "docs", 5, hybrid=True, profile="fast")
+    assert key != cache.make_key("fertility leave", "docs", 10, profile="fast", hybrid=True)
+    assert key != cache.make_key("fertility leave", "docs", 5, profile="exact", hybrid=True)
+    assert key != cache.make_key("fertility leave", "other", 5, profile="fast", hybrid=True)
+    assert key.startswith("docs:0:")
+
+
+def test_hits_misses_and_expiry(clock):
+    cache = MemoryQueryCache(ttl=10)
+    key = cache.make_key("q", "docs", 5)
+
+    assert cache.get(key) is None
+    cache.put(key, [{"id": "a"}])
+    assert cache.get(key) == [{"id": "a"}]
+    clock[0] += 11
+    assert cache.get(key) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3, "size": 0, "evictions": 0, "expirations": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoryQueryCache(max_entries=2)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    cache.get("a")
+    cache.put("c", [3])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1] and cache.get("c") == [3]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_index_only_affects_that_index():
+    cache = MemoryQueryCache()
+    docs_key = cache.make_key("q", "docs", 5)
+    other_key = cache.make_key("q", "other", 5)
+    cache.put(docs_key, [1])
+    cache.put(other_key, [2])
+
+    cache.invalidate_index("docs")
+
+    assert cache.generation("docs") == 1
+    assert cache.get(docs_key) is None
+    assert cache.make_key("q", "docs", 5) != docs_key
+    assert cache.get(other_key) == [2]
+
+
+def test_process_wide_cache(monkeypatch):
+    monkeypatch.setattr(query_cache, "_default_cache", None)
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_BACKEND", "memory")
+
+    cache = get_query_cache()
+    assert isinstance(cache, MemoryQueryCache) and get_query_cache() is cache
+    invalidate_query_cache("docs")
+    assert cache.generation("docs") == 1
+
+    monkeypatch.setattr(query_cache, "_default_cache", None)
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_BACKEND", "none")
+    assert get_query_cache() is None
+    invalidate_query_cache("docs")
+
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_BACKEND", "memcached")
+    with pytest.raises(ValueError):
+        get_query_cache()
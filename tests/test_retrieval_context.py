@@ -0,0 +1,32 @@
+import re
+
+from src_pulse import ai_agent, context_packer
+from src_pulse.ai_agent import RetrievalContext, answer_question
+
+SHARED = "The employer must grant up to ten days of fertility leave in any twelve month period. "
+
+
+def _prompt_documents(system_prompt):
+    documents = system_prompt.split("===== REFERENCE DOCUMENTS =====")[1]
+    return {int(number): text for number, text in re.findall(r"DOC (\d+): \[ID: [^\]]*\]\n(.*?)\n\n", documents, re.S)}
+
+
+def test_evidence_numbering_matches_prompt_when_a_chunk_is_dropped(monkeypatch):
+    monkeypatch.setattr(context_packer, "_encoding", False)
+    sent = []
+    monkeypatch.setattr(ai_agent, "stream_sonar_with_history", lambda messages: sent.append(messages) or iter(["Yes [DOC 2]."]))
+    context = RetrievalContext("Is fertility leave mandatory?", "policies")
+    context.hits = [
+        {"id": "uk-act", "text": "Section 4 of the act covers leave. " + SHARED, "score": 0.9},
+        {"id": "uk-act-overlap", "text": SHARED, "score": 0.8},
+        {"id": "us-guidance", "text": "US employers may offer unpaid leave under the FMLA.", "score": 0.7},
+    ]
+
+    answer, context = answer_question(context.query, "policies", None, retrieval_context=context, return_context=True,
+                                      use_answer_cache=False)
+
+    # The evidence panel lists context.chunks; DOC N in the prompt must be its Nth entry
+    documents = _prompt_documents(sent[0][0]["content"])
+    assert [chunk["id"] for chunk in context.chunks] == ["uk-act", "us-guidance"]
+    assert documents == {i + 1: chunk["text"] for i, chunk in enumerate(context.chunks)}
+    assert answer == "Yes [DOC 2]." and "FMLA" in documents[2]
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from src_pulse import stream_metrics
+from src_pulse.stream_metrics import LatencyRecorder, atimed_stream, get_latency_recorder, timed_stream
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    recorder = LatencyRecorder()
+    monkeypatch.setattr(stream_metrics, "_default_recorder", recorder)
+    return recorder
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(stream_metrics.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def _chunks(clock, steps):
+    for delay, chunk in steps:
+        clock[0] += delay
+        yield chunk
+
+
+def test_recorder_percentiles_and_window():
+    recorder = LatencyRecorder(window=100)
+    for i in range(150):
+        recorder.record("sonar", None if i % 2 else i / 1000, 2 * i / 1000)
+
+    stats = recorder.stats()["sonar"]
+
+    assert stats["responses"] == 100
+    assert stats["ttft_p50_ms"] == 99
+    assert stats["total_p50_ms"] == 199
+    assert stats["total_p95_ms"] == 288
+
+
+def test_recorder_without_first_tokens():
+    recorder = LatencyRecorder()
+    recorder.record("agent", None, 0.5)
+
+    assert recorder.stats() == {"agent": {
+        "responses": 1, "ttft_p50_ms": None, "ttft_p95_ms": None, "total_p50_ms": 500, "total_p95_ms": 500,
+    }}
+
+
+def test_process_wide_recorder(monkeypatch):
+    monkeypatch.setattr(stream_metrics, "_default_recorder", None)
+
+    assert get_latency_recorder() is get_latency_recorder()
+
+
+def test_timed_stream_measures_first_non_empty_chunk(recorder, clock):
+    metrics = {}
+    chunks = _chunks(clock, [(0.2, ""), (0.3, "Hello"), (0.5, " world")])
+
+    assert list(timed_stream(chunks, "sonar", metrics)) == ["", "Hello", " world"]
+    assert metrics["time_to_first_token"] == pytest.approx(0.5)
+    assert metrics["total"] == pytest.approx(1.0)
+    assert recorder.stats()["sonar"]["ttft_p50_ms"] == 500
+
+
+def test_timed_stream_records_when_consumer_stops_early(recorder, clock):
+    metrics = {}
+    stream = timed_stream(_chunks(clock, [(0.1, "a"), (0.1, "b"), (0.1, "c")]), "agent", metrics)
+
+    assert next(stream) == "a"
+    clock[0] += 0.4
+    stream.close()
+
+    assert metrics["time_to_first_token"] == pytest.approx(0.1)
+    assert metrics["total"] == pytest.approx(0.5)
+    assert recorder.stats()["agent"]["responses"] == 1
+
+
+def test_timed_stream_records_empty_stream(recorder, clock):
+    metrics = {}
+
+    assert list(timed_stream(iter([]), "sonar", metrics)) == []
+    assert metrics == {"time_to_first_token": None, "total": 0.0}
+
+
+def test_atimed_stream(recorder, clock):
+    async def chunks():
+        for chunk in _chunks(clock, [(0.25, "Hi"), (0.25, "!")]):
+            yield chunk
+
+    async def consume(metrics):
+        return [chunk async for chunk in atimed_stream(chunks(), "agent", metrics)]
+
+    metrics = {}
+
+    assert asyncio.run(consume(metrics)) == ["Hi", "!"]
+    assert metrics["time_to_first_token"] == pytest.approx(0.25)
+    assert metrics["total"] == pytest.approx(0.5)
+    assert recorder.stats()["agent"]["total_p50_ms"] == 500
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from src_pulse.upsert_engine import UpsertCheckpoint, iter_record_batches, upsert_batches, upsert_with_retry
+
+
+class FakeIndex:
+    def __init__(self, failures=None):
+        self.batches = []
+        self.failures = list(failures or [])
+        self._lock = threading.Lock()
+
+    def upsert_records(self, namespace, records):
+        with self._lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.batches.append((namespace, [record["id"] for record in records]))
+
+
+class StatusError(Exception):
+    def __init__(self, status):
+        super().__init__(f"status {status}")
+        self.status = status
+
+
+def _records(count):
+    return [{"id": f"r{i}"} for i in range(count)]
+
+
+def test_iter_record_batches_tags_offsets():
+    assert [(offset, len(batch)) for offset, batch in iter_record_batches(_records(7), 3)] == [(0, 3), (3, 3), (6, 1)]
+
+
+def test_retries_transient_errors_only():
+    index = FakeIndex([StatusError(429), ConnectionError("reset")])
+    upsert_with_retry(index, _records(2), namespace="ns", base_delay=0)
+    assert index.batches == [("ns", ["r0", "r1"])]
+
+    with pytest.raises(StatusError):
+        upsert_with_retry(FakeIndex([StatusError(400)]), _records(1), base_delay=0)
+    with pytest.raises(StatusError):
+        upsert_with_retry(FakeIndex([StatusError(503)] * 3), _records(1), max_retries=2, base_delay=0)
+
+
+def test_upserts_every_batch_with_bounded_concurrency():
+    index = FakeIndex()
+    progress = []
+
+    upserted = upsert_batches(index, iter_record_batches(_records(25), 4), max_in_flight=3, progress=progress.append)
+
+    assert upserted == 25
+    assert sorted(record_id for _, ids in index.batches for record_id in ids) == sorted(f"r{i}" for i in range(25))
+    assert sum(progress) == 25
+
+
+def test_checkpoint_is_append_only_and_resumes(tmp_path):
+    path = tmp_path / "upload.checkpoint"
+    checkpoint = UpsertCheckpoint(path)
+    checkpoint.mark_done(0)
+    checkpoint.mark_done(8)
+    checkpoint.mark_done(8)
+    assert path.read_text() == "0\n8\n"
+
+    # A crash in the middle of a write leaves a line without its newline
+    with open(path, "a") as f:
+        f.write("1")
+    resumed = UpsertCheckpoint(path)
+    assert resumed.completed == {0, 8}
+
+    index = FakeIndex()
+    progress = []
+    upserted = upsert_batches(index, iter_record_batches(_records(10), 4), max_in_flight=2, checkpoint=resumed,
+                              progress=progress.append)
+
+    assert upserted == 4
+    assert index.batches == [("", ["r4", "r5", "r6", "r7"])]
+    assert sum(progress) == 10
+    assert path.read_text() == "0\n8\n4\n"
+
+    resumed.clear()
+    assert not path.exists()